@@ -0,0 +1,121 @@
+"""
+Benchmark de desactivación masiva de usuarios (CU10/CU11).
+
+Compara el enfoque anterior (una transacción por usuario + write_to_historial)
+contra el UPDATE set-based de db.bulk_updates sobre N cuentas temporales.
+
+Uso (desde old_python/, con la base de datos configurada):
+    python -m benchmarks.bench_bulk_users --n 10000
+
+Las cuentas y filas de historial creadas se eliminan al terminar.
+"""
+
+import argparse
+import time
+import uuid
+
+from sqlalchemy import text
+from db.database import Database
+from db.models import Usuario
+from db.bulk_updates import bulk_deactivate_users
+from utils.history_logger import write_to_historial
+import db.lookup_cache as lookup
+
+
+def _seed_users(session, n, prefix):
+    """Crea N usuarios activos con un único INSERT y retorna sus ids"""
+    result = session.execute(
+        text("""
+            INSERT INTO usuarios
+                (nombres, apellidos, correo_electronico, hash_contraseña, estado)
+            SELECT 'Bench', 'User ' || g, :prefix || g || '@bench.local', 'x', TRUE
+            FROM generate_series(1, :n) AS g
+            RETURNING id
+            """),
+        {"prefix": prefix, "n": n},
+    )
+    ids = [row.id for row in result]
+    session.commit()
+    return ids
+
+
+def _cleanup(session, ids):
+    session.rollback()
+    session.execute(
+        text(
+            "DELETE FROM historial "
+            "WHERE target_type_id = :tt AND target_id = ANY(:ids)"
+        ),
+        {"tt": lookup.tt_usuario.id, "ids": ids},
+    )
+    session.execute(text("DELETE FROM usuarios WHERE id = ANY(:ids)"), {"ids": ids})
+    session.commit()
+
+
+def run_per_user(session, actor_id, ids):
+    """Enfoque anterior: get + update + commit + historial por cada usuario"""
+    start = time.perf_counter()
+    for user_id in ids:
+        usuario = session.query(Usuario).get(user_id)
+        usuario.estado = False
+        session.commit()
+        write_to_historial(
+            inserted_usuario_id=actor_id,
+            inserted_accion_id=lookup.accion_modificar.id,
+            inserted_target_type_id=lookup.tt_usuario.id,
+            inserted_target_id=user_id,
+        )
+    return time.perf_counter() - start
+
+
+def run_set_based(session, actor_id, ids):
+    """Enfoque nuevo: un UPDATE ... WHERE id = ANY(:ids) + historial en bloque"""
+    start = time.perf_counter()
+    bulk_deactivate_users(session, actor_id, ids)
+    session.commit()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=10000, help="cuentas a desactivar")
+    parser.add_argument(
+        "--actor-id", type=int, default=1, help="usuario que firma el historial"
+    )
+    parser.add_argument(
+        "--skip-per-user",
+        action="store_true",
+        help="omite el enfoque por usuario (lento con N grande)",
+    )
+    args = parser.parse_args()
+
+    session = Database().get_session()
+    prefix = f"bench-{uuid.uuid4().hex[:8]}-"
+
+    try:
+        if not args.skip_per_user:
+            ids = _seed_users(session, args.n, prefix + "a-")
+            try:
+                elapsed = run_per_user(session, args.actor_id, ids)
+                print(
+                    f"Por usuario : {args.n} cuentas en {elapsed:8.3f} s "
+                    f"({elapsed / args.n * 1000:.3f} ms/cuenta)"
+                )
+            finally:
+                _cleanup(session, ids)
+
+        ids = _seed_users(session, args.n, prefix + "b-")
+        try:
+            elapsed = run_set_based(session, args.actor_id, ids)
+            print(
+                f"Set-based   : {args.n} cuentas en {elapsed:8.3f} s "
+                f"({elapsed / args.n * 1000:.3f} ms/cuenta)"
+            )
+        finally:
+            _cleanup(session, ids)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark de las consultas frecuentes: ORM Query vs sentencias precompiladas.
+
+Repite cada consulta como lo haría una ráfaga de clics y reporta, por llamada,
+el tiempo total y el tiempo de CPU del cliente. La CPU del proceso no incluye
+la espera a PostgreSQL, así que aproxima el costo en Python de construir la
+consulta, que es lo que ahorran las sentencias de db.hot_queries.
+
+Uso (desde old_python/, con la base de datos configurada):
+    python -m benchmarks.bench_hot_queries --clicks 5000
+"""
+
+import argparse
+import itertools
+import time
+
+from db.database import Database
+from db.models import Libro, Categoria, EstadoLibro, Usuario
+from db import hot_queries
+
+# Combinaciones de filtros de CU17 que se alternan en cada clic
+BOOK_FILTERS = [
+    {"titulo": "a"},
+    {"autor": "e", "estado_id": 1},
+    {"any_text": "978"},
+    {"titulo": "de", "categoria_id": 1, "estado_id": 2},
+]
+USER_FILTERS = [
+    {"nombres": "a"},
+    {"correo": "@", "estado": True},
+    {"apellidos": "e", "rol_id": 1},
+]
+
+
+def _books_query(session, titulo="", autor="", any_text="", **filters):
+    """Enfoque anterior de CU17: se construye el Query en cada búsqueda"""
+    query = (
+        session.query(Libro, Categoria.nombre, EstadoLibro.nombre)
+        .outerjoin(Categoria, Libro.categoria_id == Categoria.id)
+        .outerjoin(EstadoLibro, Libro.estado_id == EstadoLibro.id)
+    )
+    if titulo:
+        query = query.filter(Libro.titulo.ilike(f"%{titulo}%"))
+    if autor:
+        query = query.filter(Libro.autor.ilike(f"%{autor}%"))
+    if any_text:
+        pattern = f"%{any_text}%"
+        query = query.filter(
+            Libro.titulo.ilike(pattern)
+            | Libro.autor.ilike(pattern)
+            | Libro.isbn.ilike(pattern)
+        )
+    if filters.get("categoria_id"):
+        query = query.filter(Libro.categoria_id == filters["categoria_id"])
+    if filters.get("estado_id"):
+        query = query.filter(Libro.estado_id == filters["estado_id"])
+    return query.order_by(Libro.titulo).all()
+
+
+def _users_query(session, nombres="", apellidos="", correo="", **filters):
+    """Enfoque anterior de CU18"""
+    query = session.query(Usuario)
+    if nombres:
+        query = query.filter(Usuario.nombres.ilike(f"%{nombres}%"))
+    if apellidos:
+        query = query.filter(Usuario.apellidos.ilike(f"%{apellidos}%"))
+    if correo:
+        query = query.filter(Usuario.correo_electronico.ilike(f"%{correo}%"))
+    if filters.get("rol_id") is not None:
+        query = query.filter(Usuario.rol_id == filters["rol_id"])
+    if filters.get("estado") is not None:
+        query = query.filter(Usuario.estado == filters["estado"])
+    return query.all()
+
+
+def _cases(book_id, state_name, email):
+    """[(consulta, antes, después)]; cada función recibe la sesión"""
+    book_filters = itertools.cycle(BOOK_FILTERS)
+    user_filters = itertools.cycle(USER_FILTERS)
+    return [
+        (
+            "Libro por id",
+            lambda s: s.query(Libro).get(book_id),
+            lambda s: hot_queries.get_book(s, book_id),
+        ),
+        (
+            "EstadoLibro por nombre",
+            lambda s: s.query(EstadoLibro).filter_by(nombre=state_name).first(),
+            lambda s: hot_queries.state_by_name(s, state_name),
+        ),
+        (
+            "Usuario por correo",
+            lambda s: s.query(Usuario)
+            .filter_by(correo_electronico=email, estado=True)
+            .first(),
+            lambda s: hot_queries.user_by_email(s, email),
+        ),
+        (
+            "Filtros CU17",
+            lambda s: _books_query(s, **next(book_filters)),
+            lambda s: hot_queries.books_with_names(s, **next(book_filters)),
+        ),
+        (
+            "Filtros CU18",
+            lambda s: _users_query(s, **next(user_filters)),
+            lambda s: hot_queries.search_users(s, **next(user_filters)),
+        ),
+    ]
+
+
+def _measure(session, run, clicks, warmup):
+    for _ in range(warmup):
+        run(session)
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(clicks):
+        run(session)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return wall / clicks * 1e6, cpu / clicks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clicks", type=int, default=5000, help="llamadas por caso")
+    parser.add_argument("--warmup", type=int, default=200, help="llamadas previas")
+    parser.add_argument("--book-id", type=int, default=1)
+    parser.add_argument("--state", default="Registrado")
+    parser.add_argument("--email", default="admin@archibox.com")
+    args = parser.parse_args()
+
+    session = Database().get_session()
+    try:
+        print(f"{'Consulta':<24}{'antes µs (CPU)':>20}{'después µs (CPU)':>22}")
+        for name, before, after in _cases(args.book_id, args.state, args.email):
+            old_wall, old_cpu = _measure(session, before, args.clicks, args.warmup)
+            new_wall, new_cpu = _measure(session, after, args.clicks, args.warmup)
+            print(
+                f"{name:<24}{old_wall:>10.1f} ({old_cpu:>6.1f})"
+                f"{new_wall:>12.1f} ({new_cpu:>6.1f})"
+                f"   CPU {(new_cpu / old_cpu - 1) * 100 if old_cpu else 0:+.0f}%"
+            )
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark de cambio de pantalla: construir cada vez vs utils.screen_pool.
+
+Recorre varias veces una secuencia de pantallas, como un operador que
+alterna entre ellas, y reporta el tiempo medio por cambio en cada enfoque.
+
+Uso (desde old_python/, con la base de datos configurada):
+    python -m benchmarks.bench_screen_switch --rounds 20
+"""
+
+import argparse
+import time
+
+from PyQt5.QtWidgets import QApplication, QStackedWidget
+from db.database import Database
+from db.hot_queries import user_by_email
+from utils.screen_pool import ScreenPool
+from use_cases.CU04_digitize_book_screen import DigitizeBookScreen
+from use_cases.CU05_classify_book_screen import ClassifyBookScreen
+from use_cases.CU09_create_user_screen import CreateUserScreen
+from use_cases.CU17_search_books_screen import SearchBooksScreen
+from use_cases.CU18_search_users_screen import SearchUsersScreen
+from use_cases.CU19_assign_task_screen import AssignTaskScreen
+from use_cases.CU22_query_book_screen import QueryBookScreen
+
+SCREENS = [
+    DigitizeBookScreen,
+    ClassifyBookScreen,
+    CreateUserScreen,
+    SearchBooksScreen,
+    SearchUsersScreen,
+    AssignTaskScreen,
+    QueryBookScreen,
+]
+
+
+def run_construct(app, stack, user, rounds):
+    """Enfoque anterior: una pantalla nueva en cada cambio"""
+    timings = []
+    current = None
+    for _ in range(rounds):
+        for screen_class in SCREENS:
+            start = time.perf_counter()
+            screen = screen_class(user=user)
+            stack.addWidget(screen)
+            stack.setCurrentWidget(screen)
+            if current is not None:
+                stack.removeWidget(current)
+                current.close()
+                current.deleteLater()
+            current = screen
+            app.processEvents()
+            timings.append(time.perf_counter() - start)
+    if current is not None:
+        current.close()
+    return timings
+
+
+def run_pool(app, stack, user, rounds):
+    pool = ScreenPool(stack)
+    timings = []
+    for _ in range(rounds):
+        for screen_class in SCREENS:
+            start = time.perf_counter()
+            pool.acquire(screen_class, user)
+            app.processEvents()
+            timings.append(time.perf_counter() - start)
+    pool.shutdown()
+    return timings
+
+
+def _summary(timings, skip):
+    steady = sorted(timings[skip:]) or sorted(timings)
+    mean = sum(steady) / len(steady) * 1000
+    p95 = steady[int(len(steady) * 0.95) - 1] * 1000
+    return mean, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=20, help="vueltas completas")
+    parser.add_argument("--email", default="admin@archibox.com")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    session = Database().get_session()
+    try:
+        user = user_by_email(session, args.email)
+        if user is None:
+            parser.error(f"No existe un usuario activo con el correo {args.email}")
+
+        stack = QStackedWidget()
+        stack.show()
+        # La primera vuelta del pool construye las pantallas; no se cuenta
+        results = [
+            ("Construir", run_construct(app, stack, user, args.rounds), 0),
+            ("Pool", run_pool(app, stack, user, args.rounds), len(SCREENS)),
+        ]
+        print(f"{'Enfoque':<12}{'media ms':>10}{'p95 ms':>10}")
+        for name, timings, skip in results:
+            mean, p95 = _summary(timings, skip)
+            print(f"{name:<12}{mean:>10.1f}{p95:>10.1f}")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
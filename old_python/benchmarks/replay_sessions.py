@@ -0,0 +1,477 @@
+"""
+Simulador de carga: reproduce sesiones grabadas con N operadores a la vez.
+
+Las sesiones se graban en la aplicación con
+ARCHIBOX_SESSION_RECORD=<archivo.jsonl> (ver utils/session_recorder.py).
+Cada operador simulado es un proceso aparte, sin pantalla
+(QT_QPA_PLATFORM=offscreen), que construye las mismas pantallas con el
+usuario grabado, llena los campos con lo que tenían y llama los mismos
+slots, respetando el tiempo entre acciones (escalado con --speed). Los
+diálogos se responden solos: "Sí" en las preguntas y cancelar en los de
+archivos.
+
+Cada sentencia SQL lleva el comentario `/* replay CUxx.slot */`; así el
+proceso principal atribuye a cada caso de uso las esperas por bloqueos que
+ve en pg_stat_activity. Los interbloqueos (40P01) y los vencimientos de
+lock_timeout (55P03) los cuenta cada operador al recibir el error.
+
+Reporte por caso de uso: llamadas, errores, interbloqueos, latencia
+p50/p95/p99/máxima y segundos esperando bloqueos, más el throughput total.
+
+Usar solo contra la base de datos local: los slots escriben de verdad.
+
+Uso (desde old_python/):
+    python -m benchmarks.replay_sessions --sessions turno_manana.jsonl \\
+        --operators 80 --ramp 30 --duration 600 --report carga.json
+"""
+
+import argparse
+import importlib
+import inspect
+import json
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+
+# Clave que se escribe en los campos de contraseña (no se graban)
+REPLAY_PASSWORD = "replay1234"
+DEADLOCK = "40P01"
+LOCK_NOT_AVAILABLE = "55P03"
+
+_CASE = re.compile(r"(CU\d+)")
+_TAG = re.compile(r"^/\* replay (\S+) \*/")
+
+
+def load_session(path):
+    """Eventos de un archivo grabado, con la pausa previa a cada uno"""
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                events.append(json.loads(line))
+    events.sort(key=lambda e: e["t"])
+    previous = events[0]["t"] if events else 0
+    for e in events:
+        e["think"] = max(0.0, e["t"] - previous)
+        previous = e["t"]
+    return events
+
+
+def case_label(screen, slot):
+    """'use_cases.CU05_classify_book_screen:ClassifyBookScreen' -> 'CU05.slot'"""
+    module = screen.split(":")[0]
+    match = _CASE.search(module)
+    return f"{match.group(1) if match else module.rsplit('.', 1)[-1]}.{slot}"
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+# ---------------------------------------------------------------------------
+# Operador simulado (proceso hijo)
+# ---------------------------------------------------------------------------
+
+
+def _patch_dialogs(dialogs):
+    """Reemplaza los diálogos modales para que no detengan la simulación"""
+    from PyQt5.QtWidgets import QDialog, QFileDialog, QMessageBox
+
+    def message(level, answer):
+        def show(_parent, title, text, *args, **kwargs):
+            dialogs.append((level, f"{title}: {text}"))
+            return answer
+
+        return staticmethod(show)
+
+    QMessageBox.information = message("information", QMessageBox.Ok)
+    QMessageBox.warning = message("warning", QMessageBox.Ok)
+    QMessageBox.critical = message("critical", QMessageBox.Ok)
+    QMessageBox.question = message("question", QMessageBox.Yes)
+    QFileDialog.getSaveFileName = staticmethod(lambda *a, **k: ("", ""))
+    QFileDialog.getOpenFileName = staticmethod(lambda *a, **k: ("", ""))
+    QFileDialog.getExistingDirectory = staticmethod(lambda *a, **k: "")
+    QDialog.exec_ = lambda self: QDialog.Rejected
+
+
+def apply_inputs(screen, inputs):
+    """Deja los campos como estaban al grabar, sin disparar sus señales"""
+    from PyQt5.QtCore import QDate, QItemSelectionModel
+    from PyQt5.QtWidgets import (
+        QAbstractButton,
+        QComboBox,
+        QDateEdit,
+        QDoubleSpinBox,
+        QLineEdit,
+        QListWidget,
+        QPlainTextEdit,
+        QSpinBox,
+        QTableWidget,
+        QTextEdit,
+    )
+    from utils.session_recorder import input_widgets
+
+    widgets = input_widgets(screen)
+    for name, state in inputs.items():
+        widget = widgets.get(name)
+        if widget is None:
+            continue
+        widget.blockSignals(True)
+        try:
+            if isinstance(widget, QLineEdit):
+                if state.get("password"):
+                    widget.setText(REPLAY_PASSWORD)
+                else:
+                    widget.setText(state.get("text", ""))
+            elif isinstance(widget, (QTextEdit, QPlainTextEdit)):
+                widget.setPlainText(state.get("text", ""))
+            elif isinstance(widget, QComboBox):
+                index = widget.findData(state["data"]) if "data" in state else -1
+                if index < 0 and state.get("index", -1) < widget.count():
+                    index = state.get("index", -1)
+                widget.setCurrentIndex(index)
+            elif isinstance(widget, QAbstractButton):
+                widget.setChecked(state.get("checked", False))
+            elif isinstance(widget, QDateEdit):
+                widget.setDate(QDate.fromString(state["date"], "yyyy-MM-dd"))
+            elif isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+                widget.setValue(state["value"])
+            elif isinstance(widget, QListWidget):
+                widget.clearSelection()
+                if 0 <= state.get("row", -1) < widget.count():
+                    widget.setCurrentRow(state["row"])
+                for row in state.get("selected", []):
+                    if row < widget.count():
+                        widget.item(row).setSelected(True)
+            elif isinstance(widget, QTableWidget):
+                widget.clearSelection()
+                if 0 <= state.get("row", -1) < widget.rowCount():
+                    widget.setCurrentCell(state["row"], 0)
+                for row in state.get("selected", []):
+                    if row < widget.rowCount():
+                        widget.selectionModel().select(
+                            widget.model().index(row, 0),
+                            QItemSelectionModel.Select | QItemSelectionModel.Rows,
+                        )
+        finally:
+            widget.blockSignals(False)
+
+
+def _build_screen(screen_key, user):
+    module_name, class_name = screen_key.split(":")
+    screen_class = getattr(importlib.import_module(module_name), class_name)
+    try:
+        accepts_user = "user" in inspect.signature(screen_class).parameters
+    except (TypeError, ValueError):
+        accepts_user = True
+    return screen_class(user=user) if accepts_user else screen_class()
+
+
+def run_operator(index, events, speed, start_at, deadline, results):
+    """Cuerpo de cada proceso: reproduce `events` hasta terminar o `deadline`"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from db.database import Database
+    from db.models import Usuario
+
+    app = QApplication.instance() or QApplication([])
+    dialogs = []
+    _patch_dialogs(dialogs)
+
+    current = {"label": "abrir"}
+    deadlocks = defaultdict(int)
+    lock_timeouts = defaultdict(int)
+
+    def tag_statement(conn, cursor, statement, parameters, context, executemany):
+        return f"/* replay {current['label']} */ {statement}", parameters
+
+    def count_error(context):
+        code = getattr(context.original_exception, "pgcode", None)
+        if code == DEADLOCK:
+            deadlocks[current["label"]] += 1
+        elif code == LOCK_NOT_AVAILABLE:
+            lock_timeouts[current["label"]] += 1
+
+    event.listen(Engine, "before_cursor_execute", tag_statement, retval=True)
+    event.listen(Engine, "handle_error", count_error)
+
+    session = Database().get_session()
+    users = {}
+    screens = {}
+    records = []
+
+    def wait(seconds):
+        until = time.monotonic() + seconds
+        while time.monotonic() < until:
+            app.processEvents()
+            time.sleep(min(0.01, max(0.0, until - time.monotonic())))
+
+    wait(max(0.0, start_at - time.time()))
+    try:
+        while deadline is None or time.time() < deadline:
+            for e in events:
+                if deadline is not None and time.time() >= deadline:
+                    return
+                wait(e["think"] / speed)
+
+                user_id = e.get("user_id")
+                if user_id not in users:
+                    users[user_id] = session.get(Usuario, user_id) if user_id else None
+                key = (e["screen"], user_id)
+                screen = screens.get(key)
+                if screen is None:
+                    current["label"] = case_label(e["screen"], "abrir")
+                    screen = _build_screen(e["screen"], users[user_id])
+                    screens[key] = screen
+
+                label = case_label(e["screen"], e["slot"])
+                current["label"] = label
+                del dialogs[:]
+                ok = True
+                start = time.perf_counter()
+                try:
+                    apply_inputs(screen, e.get("inputs", {}))
+                    getattr(screen, e["slot"])(*e.get("args", []))
+                    app.processEvents()
+                except Exception as exc:
+                    ok = False
+                    dialogs.append(("exception", f"{type(exc).__name__}: {exc}"))
+                elapsed = (time.perf_counter() - start) * 1000
+                if any(level == "critical" for level, _ in dialogs):
+                    ok = False
+                records.append((label, elapsed, ok))
+            if deadline is None:
+                return
+    finally:
+        for screen in screens.values():
+            screen.close()
+        session.close()
+        results.put(
+            {
+                "operator": index,
+                "records": records,
+                "deadlocks": dict(deadlocks),
+                "lock_timeouts": dict(lock_timeouts),
+            }
+        )
+
+
+# ---------------------------------------------------------------------------
+# Monitoreo de bloqueos (proceso principal)
+# ---------------------------------------------------------------------------
+
+
+class LockMonitor(threading.Thread):
+    """Muestrea pg_stat_activity y suma segundos de espera por caso de uso"""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.waits = defaultdict(float)
+        self._finished = threading.Event()
+
+    def run(self):
+        from sqlalchemy import text
+        from db.database import Database
+
+        session = Database().get_session()
+        query = text(
+            "SELECT query FROM pg_stat_activity "
+            "WHERE wait_event_type = 'Lock' AND query LIKE '/* replay %'"
+        )
+        try:
+            while not self._finished.wait(self.interval):
+                for (sql,) in session.execute(query):
+                    match = _TAG.match(sql)
+                    if match:
+                        self.waits[match.group(1)] += self.interval
+                session.rollback()
+        except Exception as e:
+            print(f"ADVERTENCIA: Se detuvo el monitoreo de bloqueos: {e}")
+        finally:
+            session.close()
+
+    def stop(self):
+        self._finished.set()
+        self.join()
+
+
+def database_deadlocks():
+    """Interbloqueos acumulados de la base de datos (pg_stat_database)"""
+    from sqlalchemy import text
+    from db.database import Database
+
+    session = Database().get_session()
+    try:
+        return session.execute(
+            text(
+                "SELECT deadlocks FROM pg_stat_database "
+                "WHERE datname = current_database()"
+            )
+        ).scalar()
+    finally:
+        session.close()
+
+
+# ---------------------------------------------------------------------------
+# Reporte
+# ---------------------------------------------------------------------------
+
+
+def summarize(outputs, lock_waits, wall_seconds):
+    cases = defaultdict(lambda: {"timings": [], "errors": 0})
+    deadlocks = defaultdict(int)
+    lock_timeouts = defaultdict(int)
+    for output in outputs:
+        for label, elapsed, ok in output["records"]:
+            cases[label]["timings"].append(elapsed)
+            cases[label]["errors"] += 0 if ok else 1
+        for label, count in output["deadlocks"].items():
+            deadlocks[label] += count
+        for label, count in output["lock_timeouts"].items():
+            lock_timeouts[label] += count
+
+    labels = sorted(set(cases) | set(deadlocks) | set(lock_waits))
+    report = {}
+    for label in labels:
+        timings = sorted(cases[label]["timings"])
+        report[label] = {
+            "calls": len(timings),
+            "errors": cases[label]["errors"],
+            "deadlocks": deadlocks[label],
+            "lock_timeouts": lock_timeouts[label],
+            "lock_wait_s": round(lock_waits.get(label, 0.0), 2),
+            "throughput_per_s": round(len(timings) / wall_seconds, 3),
+            "p50_ms": round(percentile(timings, 0.50), 1),
+            "p95_ms": round(percentile(timings, 0.95), 1),
+            "p99_ms": round(percentile(timings, 0.99), 1),
+            "max_ms": round(timings[-1], 1) if timings else 0.0,
+        }
+    total = sum(case["calls"] for case in report.values())
+    return {
+        "wall_seconds": round(wall_seconds, 1),
+        "calls": total,
+        "throughput_per_s": round(total / wall_seconds, 2),
+        "cases": report,
+    }
+
+
+def print_report(summary, operators, db_deadlocks):
+    print(
+        f"\n{operators} operadores, {summary['wall_seconds']} s, "
+        f"{summary['calls']} acciones ({summary['throughput_per_s']}/s)"
+    )
+    if db_deadlocks is not None:
+        print(f"Interbloqueos en la base de datos durante la prueba: {db_deadlocks}")
+    header = (
+        f"{'Caso de uso':<36}{'llamadas':>9}{'errores':>8}{'interbl.':>9}"
+        f"{'p50':>8}{'p95':>8}{'p99':>8}{'máx':>9}{'espera s':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for label, case in summary["cases"].items():
+        print(
+            f"{label:<36}{case['calls']:>9}{case['errors']:>8}"
+            f"{case['deadlocks']:>9}{case['p50_ms']:>8.0f}{case['p95_ms']:>8.0f}"
+            f"{case['p99_ms']:>8.0f}{case['max_ms']:>9.0f}{case['lock_wait_s']:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sessions",
+        action="append",
+        required=True,
+        help="archivo grabado (se puede repetir; se reparten en ronda)",
+    )
+    parser.add_argument("--operators", type=int, default=10)
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="2 = pausas a la mitad"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        help="segundos; las sesiones se repiten hasta cumplirlos",
+    )
+    parser.add_argument(
+        "--ramp", type=float, default=0.0, help="segundos para arrancar a todos"
+    )
+    parser.add_argument("--sample-ms", type=int, default=100)
+    parser.add_argument("--report", help="guardar el resumen en JSON")
+    args = parser.parse_args()
+
+    sessions = [load_session(path) for path in args.sessions]
+    empty = [path for path, events in zip(args.sessions, sessions) if not events]
+    if empty:
+        parser.error(f"Archivos de sesión vacíos: {', '.join(empty)}")
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    # Margen para que los procesos importen Qt y abran su conexión
+    start = time.time() + 5
+    deadline = start + args.ramp + args.duration if args.duration else None
+    processes = []
+    for i in range(args.operators):
+        offset = args.ramp * i / args.operators
+        process = context.Process(
+            target=run_operator,
+            args=(
+                i,
+                sessions[i % len(sessions)],
+                args.speed,
+                start + offset,
+                deadline,
+                results,
+            ),
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+
+    try:
+        deadlocks_before = database_deadlocks()
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo leer pg_stat_database: {e}")
+        deadlocks_before = None
+    monitor = LockMonitor(args.sample_ms / 1000)
+    monitor.start()
+
+    outputs = []
+    while len(outputs) < len(processes):
+        try:
+            outputs.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+            continue
+        print(f"Operador {outputs[-1]['operator']} terminó")
+    wall = max(0.001, time.time() - start)
+    monitor.stop()
+    for process in processes:
+        process.join(timeout=5)
+
+    db_deadlocks = None
+    if deadlocks_before is not None:
+        db_deadlocks = database_deadlocks() - deadlocks_before
+    summary = summarize(outputs, monitor.waits, wall)
+    summary["operators"] = args.operators
+    summary["database_deadlocks"] = db_deadlocks
+    print_report(summary, args.operators, db_deadlocks)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"Reporte guardado en {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+from sqlalchemy import text
+from utils.bulk_history_logger import write_many_to_historial
+from db.event_bus import publish, BOOKS_MODIFIED, BOOK_STATE_CHANGED, USERS_CHANGED
+import db.lookup_cache as lookup
+
+# Columnas de `usuarios` que se pueden modificar en lote (CU10/CU11)
+USER_BULK_COLUMNS = ("rol_id", "estado")
+
+# Columnas de `libros` editables en lote (CU12/CU13) y su tipo SQL,
+# necesario para castear los arreglos que se pasan a unnest()
+BOOK_BULK_COLUMNS = {
+    "titulo": "VARCHAR",
+    "autor": "VARCHAR",
+    "isbn": "VARCHAR",
+    "fecha": "DATE",
+    "numero_paginas": "INTEGER",
+    "estanteria": "VARCHAR",
+    "espacio": "VARCHAR",
+    "categoria_id": "INTEGER",
+    "estado_id": "INTEGER",
+}
+
+
+def _normalize_ids(ids):
+    """Convierte a una lista ordenada de enteros únicos."""
+    return sorted({int(i) for i in ids})
+
+
+def _build_set_update(table, values, allowed_columns):
+    """
+    Construye un UPDATE set-based sobre `table` con `WHERE id = ANY(:ids)`.
+
+    Solo se tocan las filas donde algún valor realmente cambia, así el
+    historial no registra modificaciones vacías.
+    """
+    unknown = set(values) - set(allowed_columns)
+    if unknown:
+        raise ValueError(
+            f"Columnas no permitidas para {table}: {', '.join(sorted(unknown))}"
+        )
+
+    columns = [column for column in allowed_columns if column in values]
+    set_clause = ", ".join(f"{column} = :{column}" for column in columns)
+    changed_clause = " OR ".join(
+        f"{column} IS DISTINCT FROM :{column}" for column in columns
+    )
+    return text(
+        f"UPDATE {table} SET {set_clause} "
+        f"WHERE id = ANY(:ids) AND ({changed_clause}) "
+        f"RETURNING id"
+    )
+
+
+def bulk_update_users(session, actor_id, user_ids, values):
+    """
+    Aplica `values` a todos los usuarios de `user_ids` con un único UPDATE
+    y registra el historial en bloque dentro de la misma transacción.
+
+    No hace commit; el llamador decide cuándo confirmar.
+    Retorna la lista de ids efectivamente modificados.
+    """
+    ids = _normalize_ids(user_ids)
+    if not ids or not values:
+        return []
+
+    statement = _build_set_update("usuarios", values, USER_BULK_COLUMNS)
+    result = session.execute(statement, {**values, "ids": ids})
+    updated_ids = [row.id for row in result]
+
+    write_many_to_historial(
+        session,
+        inserted_usuario_id=actor_id,
+        inserted_accion_id=lookup.accion_modificar.id,
+        inserted_target_type_id=lookup.tt_usuario.id,
+        inserted_target_ids=updated_ids,
+    )
+    if updated_ids:
+        publish(session, USERS_CHANGED, ids=updated_ids, usuario_id=actor_id)
+    return updated_ids
+
+
+def bulk_deactivate_users(session, actor_id, user_ids):
+    """Desactiva (estado = FALSE) todos los usuarios indicados en un solo UPDATE."""
+    return bulk_update_users(session, actor_id, user_ids, {"estado": False})
+
+
+def _build_unnest_update(table, columns, column_types):
+    """
+    Construye un UPDATE ... FROM unnest(...) que asigna a cada fila su propio
+    valor. Un solo statement cubre todas las filas que cambian `columns`.
+    """
+    arrays = ", ".join(
+        ["CAST(:ids AS INTEGER[])"]
+        + [f"CAST(:{column} AS {column_types[column]}[])" for column in columns]
+    )
+    aliases = ", ".join(["id"] + list(columns))
+    set_clause = ", ".join(f"{column} = v.{column}" for column in columns)
+    return text(
+        f"UPDATE {table} AS t SET {set_clause} "
+        f"FROM unnest({arrays}) AS v({aliases}) "
+        f"WHERE t.id = v.id "
+        f"RETURNING t.id"
+    )
+
+
+def bulk_update_books(session, actor_id, changes):
+    """
+    Persiste ediciones de libros hechas celda a celda.
+
+    `changes` es un dict {libro_id: {columna: valor}} con solo las celdas
+    modificadas. Los libros se agrupan por el conjunto de columnas que
+    cambian y cada grupo se escribe con un único UPDATE; el historial se
+    registra en bloque. Todo ocurre en la transacción de `session` (sin commit).
+    Retorna la lista de ids de libros modificados.
+    """
+    groups = {}
+    for book_id, values in changes.items():
+        if not values:
+            continue
+        unknown = set(values) - set(BOOK_BULK_COLUMNS)
+        if unknown:
+            raise ValueError(
+                f"Columnas no permitidas para libros: {', '.join(sorted(unknown))}"
+            )
+        columns = tuple(column for column in BOOK_BULK_COLUMNS if column in values)
+        groups.setdefault(columns, []).append((int(book_id), values))
+
+    updated_ids = set()
+    for columns, rows in groups.items():
+        params = {"ids": [book_id for book_id, _ in rows]}
+        for column in columns:
+            params[column] = [values[column] for _, values in rows]
+        statement = _build_unnest_update("libros", columns, BOOK_BULK_COLUMNS)
+        updated_ids.update(row.id for row in session.execute(statement, params))
+
+    updated_ids = sorted(updated_ids)
+    write_many_to_historial(
+        session,
+        inserted_usuario_id=actor_id,
+        inserted_accion_id=lookup.accion_modificar.id,
+        inserted_target_type_id=lookup.tt_libro.id,
+        inserted_target_ids=updated_ids,
+    )
+    if updated_ids:
+        publish(session, BOOKS_MODIFIED, ids=updated_ids, usuario_id=actor_id)
+    return updated_ids
+
+
+def bulk_set_book_state(session, actor_id, book_ids, estado_id):
+    """Cambia el estado de todos los libros indicados con un único UPDATE."""
+    ids = _normalize_ids(book_ids)
+    if not ids:
+        return []
+
+    statement = _build_set_update(
+        "libros", {"estado_id": estado_id}, tuple(BOOK_BULK_COLUMNS)
+    )
+    result = session.execute(statement, {"estado_id": estado_id, "ids": ids})
+    updated_ids = [row.id for row in result]
+
+    write_many_to_historial(
+        session,
+        inserted_usuario_id=actor_id,
+        inserted_accion_id=lookup.accion_modificar.id,
+        inserted_target_type_id=lookup.tt_libro.id,
+        inserted_target_ids=updated_ids,
+    )
+    if updated_ids:
+        publish(
+            session,
+            BOOK_STATE_CHANGED,
+            ids=updated_ids,
+            estado_id=estado_id,
+            usuario_id=actor_id,
+        )
+    return updated_ids
+
+
+def apply_review_decisions(session, actor_id, from_estado_id, decisions):
+    """
+    Aplica en bloque decisiones de control de calidad (CU15/CU24).
+
+    `decisions` es una lista de tuplas
+    (libro_id, estado_nuevo_id, observaciones, fecha_inicio, fecha_fin).
+    Solo se actualizan los libros que siguen en `from_estado_id`, de modo que
+    una decisión tardía no pisa el trabajo de otro revisor. Por cada libro
+    actualizado se registra una tarea y una fila de historial.
+    No hace commit. Retorna la lista de ids actualizados.
+    """
+    if not decisions:
+        return []
+
+    book_ids, estados, observaciones, inicios, fines = (
+        list(column) for column in zip(*decisions)
+    )
+
+    result = session.execute(
+        text("""
+            UPDATE libros AS t SET estado_id = v.estado_id
+            FROM unnest(CAST(:ids AS INTEGER[]), CAST(:estados AS INTEGER[]))
+                AS v(id, estado_id)
+            WHERE t.id = v.id AND t.estado_id = :from_estado_id
+            RETURNING t.id
+            """),
+        {"ids": book_ids, "estados": estados, "from_estado_id": from_estado_id},
+    )
+    updated_ids = [row.id for row in result]
+    if not updated_ids:
+        return []
+
+    session.execute(
+        text("""
+            INSERT INTO tareas (libro_id, usuario_id, fecha_asignacion,
+                                fecha_finalizacion, estado_nuevo_id, observaciones)
+            SELECT v.id, :usuario_id, v.inicio, v.fin, v.estado_id, v.observaciones
+            FROM unnest(
+                CAST(:ids AS INTEGER[]),
+                CAST(:estados AS INTEGER[]),
+                CAST(:observaciones AS TEXT[]),
+                CAST(:inicios AS TIMESTAMP[]),
+                CAST(:fines AS TIMESTAMP[])
+            ) AS v(id, estado_id, observaciones, inicio, fin)
+            WHERE v.id = ANY(:updated_ids)
+            """),
+        {
+            "usuario_id": actor_id,
+            "ids": book_ids,
+            "estados": estados,
+            "observaciones": observaciones,
+            "inicios": inicios,
+            "fines": fines,
+            "updated_ids": updated_ids,
+        },
+    )
+
+    write_many_to_historial(
+        session,
+        inserted_usuario_id=actor_id,
+        inserted_accion_id=lookup.accion_modificar.id,
+        inserted_target_type_id=lookup.tt_libro.id,
+        inserted_target_ids=updated_ids,
+    )
+    applied = set(updated_ids)
+    by_state = {}
+    for book_id, estado_id in zip(book_ids, estados):
+        if book_id in applied:
+            by_state.setdefault(estado_id, []).append(book_id)
+    for estado_id, ids in by_state.items():
+        publish(
+            session,
+            BOOK_STATE_CHANGED,
+            ids=ids,
+            estado_id=estado_id,
+            usuario_id=actor_id,
+        )
+    return updated_ids
+
+
+def bulk_link_digitized_pdfs(
+    session, actor_id, links, from_estado_ids, digitized_estado_id, accion_id
+):
+    """
+    Asocia PDFs escaneados a sus libros y los pasa a `digitized_estado_id`
+    con un único UPDATE (vinculación automática de CU04).
+
+    `links` es una lista de (libro_id, nombre_de_archivo). Solo se tocan los
+    libros que siguen en alguno de `from_estado_ids`, para no pisar una
+    digitalización hecha a mano mientras tanto.
+    No hace commit. Retorna la lista de ids vinculados.
+    """
+    if not links:
+        return []
+
+    book_ids, filenames = (list(column) for column in zip(*links))
+    result = session.execute(
+        text("""
+            UPDATE libros AS t
+            SET directorio_pdf = v.directorio_pdf, estado_id = :estado_id
+            FROM unnest(CAST(:ids AS INTEGER[]), CAST(:archivos AS VARCHAR[]))
+                AS v(id, directorio_pdf)
+            WHERE t.id = v.id AND t.estado_id = ANY(:from_estado_ids)
+            RETURNING t.id
+            """),
+        {
+            "ids": book_ids,
+            "archivos": filenames,
+            "estado_id": digitized_estado_id,
+            "from_estado_ids": list(from_estado_ids),
+        },
+    )
+    updated_ids = [row.id for row in result]
+
+    write_many_to_historial(
+        session,
+        inserted_usuario_id=actor_id,
+        inserted_accion_id=accion_id,
+        inserted_target_type_id=lookup.tt_libro.id,
+        inserted_target_ids=updated_ids,
+    )
+    if updated_ids:
+        publish(
+            session,
+            BOOK_STATE_CHANGED,
+            ids=updated_ids,
+            estado_id=digitized_estado_id,
+            usuario_id=actor_id,
+        )
+    return updated_ids
+
+
+def bulk_classify_books(
+    session, actor_id, book_ids, categoria_id, estado_id, from_estado_ids
+):
+    """
+    Asigna `categoria_id` y pasa a `estado_id` ("Clasificado") todos los
+    libros indicados con un único UPDATE (clasificación en lote de CU05).
+
+    Solo se tocan los libros que siguen en alguno de `from_estado_ids`, para
+    no clasificar uno que otro operador movió mientras tanto.
+    No hace commit. Retorna la lista de ids clasificados.
+    """
+    ids = _normalize_ids(book_ids)
+    if not ids:
+        return []
+
+    result = session.execute(
+        text("""
+            UPDATE libros SET categoria_id = :categoria_id, estado_id = :estado_id
+            WHERE id = ANY(:ids) AND estado_id = ANY(:from_estado_ids)
+            RETURNING id
+            """),
+        {
+            "categoria_id": categoria_id,
+            "estado_id": estado_id,
+            "ids": ids,
+            "from_estado_ids": list(from_estado_ids),
+        },
+    )
+    updated_ids = [row.id for row in result]
+
+    write_many_to_historial(
+        session,
+        inserted_usuario_id=actor_id,
+        inserted_accion_id=lookup.accion_modificar.id,
+        inserted_target_type_id=lookup.tt_libro.id,
+        inserted_target_ids=updated_ids,
+    )
+    if updated_ids:
+        publish(
+            session,
+            BOOK_STATE_CHANGED,
+            ids=updated_ids,
+            estado_id=estado_id,
+            usuario_id=actor_id,
+        )
+    return updated_ids
@@ -0,0 +1,184 @@
+"""
+Consultas de solo lectura del catálogo (CU17/CU22).
+
+Usan la réplica local cuando está habilitada y sincronizada; si no, o si
+falla, consultan el servidor. Ambos caminos retornan los mismos tipos.
+Categorías y estados salen de la copia de referencia (db.warm_cache).
+"""
+
+import sqlite3
+from types import SimpleNamespace
+
+from db.hot_queries import books_with_names, book_with_names, books_by_isbn
+from db.local_replica import CatalogRow, get_replica
+from db.event_bus import get_event_bus, CATALOG_CHANGED, RESYNC
+from db.search_cache import get_search_cache, search_key
+from db.warm_cache import reference_rows
+from utils.isbn import normalize_isbn
+
+# Categorías y estados casi nunca cambian; se guardan mientras el bus de
+# eventos garantice que llegará el aviso cuando cambien
+_lookups = {}
+
+
+def search_books_on_server(
+    session,
+    titulo="",
+    autor="",
+    isbn="",
+    categoria_id=None,
+    estado_id=None,
+    any_text="",
+    ids=None,
+):
+    rows = books_with_names(
+        session,
+        titulo=titulo,
+        autor=autor,
+        isbn=isbn,
+        categoria_id=categoria_id,
+        estado_id=estado_id,
+        any_text=any_text,
+        ids=ids,
+    )
+    return [_catalog_row(*row) for row in rows]
+
+
+def _catalog_row(libro, categoria_nombre, estado_nombre):
+    return CatalogRow(
+        libro.id,
+        libro.titulo,
+        libro.autor,
+        libro.isbn,
+        libro.categoria_id,
+        categoria_nombre,
+        libro.estado_id,
+        estado_nombre,
+        getattr(libro, "directorio_img", None),
+    )
+
+
+def search_books(session, **filters):
+    """Búsqueda de libros; ver search_books_on_server para los filtros"""
+    replica = get_replica()
+    if replica is not None:
+        try:
+            return replica.search_books(**filters)
+        except sqlite3.Error as e:
+            print(f"ADVERTENCIA: Réplica local no disponible, se usa el servidor: {e}")
+    # Los filtros de CU17 (sin texto libre ni ids) se guardan en caché
+    if (
+        filters.get("ids") is None
+        and not filters.get("any_text")
+        and get_event_bus().delivers_invalidations
+    ):
+        return get_search_cache().get(
+            search_key(
+                filters.get("titulo"),
+                filters.get("autor"),
+                filters.get("isbn"),
+                filters.get("categoria_id"),
+                filters.get("estado_id"),
+            ),
+            lambda: search_books_on_server(session, **filters),
+            lambda ids: search_books_on_server(session, ids=ids),
+        )
+    return search_books_on_server(session, **filters)
+
+
+def search_cache_stats():
+    """Aciertos, fallos y tamaño de la caché de búsquedas"""
+    return get_search_cache().stats()
+
+
+def find_books_by_isbn(session, raw):
+    """
+    Libros (CatalogRow) cuyo ISBN coincide con `raw` en cualquier formato
+    (ISBN-10/13, con o sin guiones): todos los ejemplares de la edición, o
+    una lista vacía. Una sola consulta por el índice de la clave ISBN-13;
+    pensado para el lector de códigos de CU22.
+    """
+    isbn13 = normalize_isbn(raw)
+    if isbn13 is None:
+        return []
+    replica = get_replica()
+    if replica is not None:
+        try:
+            return replica.get_books_by_isbn13(isbn13)
+        except sqlite3.Error as e:
+            print(f"ADVERTENCIA: Réplica local no disponible, se usa el servidor: {e}")
+    return [_catalog_row(*found) for found in books_by_isbn(session, isbn13)]
+
+
+def get_book_details(session, book_id):
+    """Detalle de un libro con nombres de categoría y estado, o None"""
+    replica = get_replica()
+    if replica is not None:
+        try:
+            row = replica.get_book(book_id)
+            if row is not None:
+                return SimpleNamespace(**dict(row))
+        except sqlite3.Error as e:
+            print(f"ADVERTENCIA: Réplica local no disponible, se usa el servidor: {e}")
+
+    found = book_with_names(session, book_id)
+    if found is None:
+        return None
+    libro, categoria_nombre, estado_nombre = found
+    return SimpleNamespace(
+        id=libro.id,
+        isbn=libro.isbn,
+        titulo=libro.titulo,
+        autor=libro.autor,
+        fecha=libro.fecha,
+        numero_paginas=libro.numero_paginas,
+        estado_id=libro.estado_id,
+        estanteria=libro.estanteria,
+        espacio=libro.espacio,
+        categoria_id=libro.categoria_id,
+        directorio_pdf=libro.directorio_pdf,
+        directorio_img=getattr(libro, "directorio_img", None),
+        categoria_nombre=categoria_nombre,
+        estado_nombre=estado_nombre,
+    )
+
+
+def _invalidate_lookups(_kind, _data):
+    _lookups.clear()
+
+
+def _cached_lookup(name, loader):
+    bus = get_event_bus()
+    if not bus.delivers_invalidations:
+        return loader()
+    if not _lookups:
+        bus.subscribe(_invalidate_lookups, CATALOG_CHANGED, RESYNC)
+    if name not in _lookups:
+        _lookups[name] = loader()
+    return list(_lookups[name])
+
+
+def load_categories(session):
+    """Lista de (id, nombre) ordenada por nombre"""
+    return _cached_lookup("categorias", lambda: _load_categories(session))
+
+
+def load_states(session):
+    """Lista de (id, nombre) ordenada por el orden del flujo"""
+    return _cached_lookup("estados", lambda: _load_states(session))
+
+
+def _load_categories(session):
+    categories = reference_rows(session, "categoria")
+    return [
+        (categoria.id, categoria.nombre)
+        for categoria in sorted(categories, key=lambda row: row.nombre.lower())
+    ]
+
+
+def _load_states(session):
+    states = reference_rows(session, "estados_libro")
+    return [
+        (estado.id, estado.nombre)
+        for estado in sorted(states, key=lambda row: row.orden)
+    ]
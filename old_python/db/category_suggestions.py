@@ -0,0 +1,287 @@
+"""
+Sugerencias de categoría para la cola de clasificación (CU05).
+
+Modelo TF-IDF de centroides: cada libro ya clasificado es un vector disperso
+con los términos de su título, su autor y, si está indexado, el texto de su
+PDF (utils.pdf_text_index). El centroide normalizado de cada categoría es el
+promedio de sus libros; la sugerencia es la similitud coseno con cada
+centroide. Toda la aritmética es matricial (NumPy/SciPy): entrenar es una
+multiplicación indicador-por-documentos y puntuar la cola completa, una
+multiplicación documentos-por-centroides.
+
+El modelo se entrena una vez y se conserva hasta que cambian las categorías
+(CATALOG_CHANGED) o se resincroniza el bus. Sin NumPy/SciPy no hay
+sugerencias (available() retorna False).
+"""
+
+import math
+import threading
+import time
+from collections import Counter, namedtuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from db.database import Database
+from db.models import Libro
+from db.event_bus import get_event_bus, CATALOG_CHANGED, RESYNC
+from utils.pdf_text_index import tokenize
+from utils.pdf_text_search import get_pdf_index
+
+Suggestion = namedtuple("Suggestion", ["categoria_id", "score"])
+
+TOP_SUGGESTIONS = 3
+# Similitud mínima para mostrar una sugerencia
+MIN_SCORE = 0.05
+# Un término debe aparecer en al menos esta cantidad de libros clasificados
+MIN_DOCUMENT_FREQUENCY = 2
+MAX_FEATURES = 100000
+# Peso relativo de cada fuente de términos
+AUTHOR_WEIGHT = 1.5
+PDF_WEIGHT = 0.5
+# Filas de la cola que se puntúan por multiplicación
+SCORE_CHUNK = 5000
+# Sin avisos del bus, el modelo se reentrena pasado este tiempo
+MODEL_MAX_AGE_SECONDS = 600
+
+
+def available():
+    return np is not None
+
+
+def book_features(titulo, autor, pdf_terms=None):
+    """{rasgo: peso} de un libro; autor y PDF con prefijo propio"""
+    features = Counter(tokenize(titulo or ""))
+    for token in tokenize(autor or ""):
+        features[f"autor:{token}"] += AUTHOR_WEIGHT
+    for term, pages in (pdf_terms or {}).items():
+        features[f"pdf:{term}"] += PDF_WEIGHT * math.log1p(pages)
+    return features
+
+
+def _to_matrix(documents, vocabulary):
+    """Matriz CSR documentos x vocabulario (tf sublineal, sin normalizar)"""
+    indptr = [0]
+    indices = []
+    data = []
+    for features in documents:
+        for feature, weight in features.items():
+            column = vocabulary.get(feature)
+            if column is not None:
+                indices.append(column)
+                data.append(weight)
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (
+            np.asarray(data, dtype=np.float32),
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(indptr, dtype=np.int64),
+        ),
+        shape=(len(documents), len(vocabulary)),
+    )
+    matrix.sum_duplicates()
+    np.log1p(matrix.data, out=matrix.data)
+    return matrix
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+class CategoryModel:
+    """Vocabulario, idf y centroides normalizados de cada categoría"""
+
+    def __init__(self, vocabulary, idf, centroids, categoria_ids):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.centroids = centroids
+        self.categoria_ids = categoria_ids
+
+    @classmethod
+    def fit(cls, documents, labels):
+        """`documents`: [{rasgo: peso}]; `labels`: categoria_id de cada uno"""
+        document_frequency = Counter()
+        for features in documents:
+            document_frequency.update(features.keys())
+        kept = [
+            feature
+            for feature, count in document_frequency.most_common(MAX_FEATURES)
+            if count >= MIN_DOCUMENT_FREQUENCY
+        ]
+        vocabulary = {feature: column for column, feature in enumerate(kept)}
+        frequencies = np.array(
+            [document_frequency[feature] for feature in kept], dtype=np.float32
+        )
+        n = len(documents)
+        idf = (np.log((1 + n) / (1 + frequencies)) + 1).astype(np.float32)
+
+        matrix = cls._weigh(_to_matrix(documents, vocabulary), idf)
+        categoria_ids, rows = np.unique(np.asarray(labels), return_inverse=True)
+        membership = sparse.csr_matrix(
+            (np.ones(n, dtype=np.float32), (rows, np.arange(n))),
+            shape=(len(categoria_ids), n),
+        )
+        centroids = _normalize_rows(membership @ matrix).T.tocsr()
+        return cls(vocabulary, idf, centroids, categoria_ids)
+
+    @staticmethod
+    def _weigh(matrix, idf):
+        matrix.data *= idf[matrix.indices]
+        return _normalize_rows(matrix)
+
+    def score(self, documents, top=TOP_SUGGESTIONS):
+        """[[Suggestion]] de cada documento, de mayor a menor similitud"""
+        results = []
+        top = min(top, len(self.categoria_ids))
+        if top == 0:
+            return [[] for _ in documents]
+        for start in range(0, len(documents), SCORE_CHUNK):
+            chunk = documents[start : start + SCORE_CHUNK]
+            matrix = self._weigh(_to_matrix(chunk, self.vocabulary), self.idf)
+            scores = (matrix @ self.centroids).toarray()
+            best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-best_scores, axis=1)
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            for columns, values in zip(best, best_scores):
+                results.append(
+                    [
+                        Suggestion(int(self.categoria_ids[c]), float(v))
+                        for c, v in zip(columns, values)
+                        if v >= MIN_SCORE
+                    ]
+                )
+        return results
+
+
+class CategorySuggester:
+    """
+    Modelo compartido del proceso; se entrena en el primer uso. Con
+    `pdf_index` (utils.pdf_text_index) se agregan los términos de los PDFs.
+    """
+
+    def __init__(self, pdf_index=None):
+        self.pdf_index = pdf_index
+        self._model = None
+        self._trained_at = 0.0
+        # Cambia con cada invalidación; un entrenamiento que empezó antes
+        # no guarda su modelo
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _documents(self, rows):
+        pdf_terms = {}
+        if self.pdf_index is not None:
+            try:
+                pdf_terms = self.pdf_index.book_terms([row.id for row in rows])
+            except Exception as e:
+                print(f"ADVERTENCIA: Sugerencias sin el texto de los PDFs: {e}")
+        return [
+            book_features(row.titulo, row.autor, pdf_terms.get(row.id)) for row in rows
+        ]
+
+    def _train(self, session):
+        rows = (
+            session.query(Libro.id, Libro.titulo, Libro.autor, Libro.categoria_id)
+            .filter(Libro.categoria_id.isnot(None))
+            .all()
+        )
+        if not rows:
+            return None
+        return CategoryModel.fit(
+            self._documents(rows), [row.categoria_id for row in rows]
+        )
+
+    def _current_model(self, session):
+        with self._lock:
+            expired = (
+                not get_event_bus().delivers_invalidations
+                and time.monotonic() - self._trained_at > MODEL_MAX_AGE_SECONDS
+            )
+            if self._model is None or expired:
+                generation = self._generation
+                model = self._train(session)
+                if model is None or generation != self._generation:
+                    return model
+                self._model = model
+                self._trained_at = time.monotonic()
+            return self._model
+
+    def suggest(self, session, book_ids):
+        """{libro_id: [Suggestion]} de todos los libros indicados, en un solo paso"""
+        if not available() or not book_ids:
+            return {}
+        model = self._current_model(session)
+        if model is None:
+            return {}
+        rows = (
+            session.query(Libro.id, Libro.titulo, Libro.autor)
+            .filter(Libro.id.in_(list(book_ids)))
+            .all()
+        )
+        scored = model.score(self._documents(rows))
+        return {row.id: suggestions for row, suggestions in zip(rows, scored)}
+
+    def on_event(self, _kind, _data):
+        # Sin el lock: no bloquear el hilo de UI mientras otro hilo entrena
+        self._generation += 1
+        self._model = None
+
+
+_suggester = None
+
+
+def get_category_suggester():
+    """Instancia compartida; llamarla primero desde el hilo de UI"""
+    global _suggester
+    if _suggester is None:
+        try:
+            pdf_index = get_pdf_index()
+        except Exception as e:
+            print(f"ADVERTENCIA: Sugerencias sin el texto de los PDFs: {e}")
+            pdf_index = None
+        _suggester = CategorySuggester(pdf_index)
+        get_event_bus().subscribe(_suggester.on_event, CATALOG_CHANGED, RESYNC)
+    return _suggester
+
+
+def combine(suggestions_by_book, book_ids, top=TOP_SUGGESTIONS):
+    """Sugerencias para un grupo de libros: suma de similitudes por categoría"""
+    totals = Counter()
+    for book_id in book_ids:
+        for suggestion in suggestions_by_book.get(book_id, []):
+            totals[suggestion.categoria_id] += suggestion.score
+    count = max(1, len(book_ids))
+    return [
+        Suggestion(categoria_id, total / count)
+        for categoria_id, total in totals.most_common(top)
+    ]
+
+
+class SuggestionThread(QThread):
+    """Puntúa la cola de CU05 fuera del hilo de UI"""
+
+    ready = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, book_ids, parent=None):
+        super().__init__(parent)
+        self.book_ids = list(book_ids)
+        self.suggester = get_category_suggester()
+
+    def run(self):
+        session = Database().get_session()
+        try:
+            self.ready.emit(self.suggester.suggest(session, self.book_ids))
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            session.close()
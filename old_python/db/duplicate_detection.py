@@ -0,0 +1,185 @@
+"""
+Detección de libros duplicados antes de registrarlos (CU01).
+
+Los candidatos se buscan en el servidor con el índice de trigramas sobre el
+título normalizado (migración 003_book_similarity_index); PostgreSQL lo
+mantiene al día con cada inserción. El puntaje final combina la similitud
+del título, la del autor y la cercanía de la fecha.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, namedtuple
+
+from sqlalchemy import text
+
+DuplicateCandidate = namedtuple(
+    "DuplicateCandidate", ["id", "titulo", "autor", "fecha", "score"]
+)
+
+# Similitud mínima de título para que el índice devuelva un candidato
+TITLE_THRESHOLD = 0.45
+# Puntaje combinado desde el cual se avisa al usuario
+DUPLICATE_SCORE = 0.6
+MAX_CANDIDATES = 5
+BATCH_CHUNK = 500
+
+TITLE_WEIGHT = 0.6
+AUTHOR_WEIGHT = 0.3
+DATE_WEIGHT = 0.1
+
+_CANDIDATES_SQL = """
+    SELECT c.idx, l.id, l.titulo, l.autor, l.fecha,
+           similarity(libro_normalizar(l.titulo), libro_normalizar(c.titulo))
+               AS sim_titulo,
+           similarity(libro_normalizar(l.autor), libro_normalizar(c.autor))
+               AS sim_autor
+    FROM unnest(CAST(:titulos AS TEXT[]), CAST(:autores AS TEXT[]))
+         WITH ORDINALITY AS c(titulo, autor, idx)
+    CROSS JOIN LATERAL (
+        SELECT id, titulo, autor, fecha
+        FROM libros
+        WHERE libro_normalizar(titulo) % libro_normalizar(c.titulo)
+        ORDER BY libro_normalizar(titulo) <-> libro_normalizar(c.titulo)
+        LIMIT :per_record
+    ) AS l
+"""
+
+
+def _date_score(fecha_a, fecha_b):
+    """1 si coincide el año, 0.5 si difiere en uno, 0 si no; neutro sin fecha"""
+    if fecha_a is None or fecha_b is None:
+        return 0.5
+    years = abs(fecha_a.year - fecha_b.year)
+    return 1.0 if years == 0 else 0.5 if years == 1 else 0.0
+
+
+def _combined_score(sim_titulo, sim_autor, date_score):
+    return (
+        TITLE_WEIGHT * sim_titulo + AUTHOR_WEIGHT * sim_autor + DATE_WEIGHT * date_score
+    )
+
+
+def _query_candidates(session, records, per_record):
+    """Una sola consulta para todo el lote; retorna {índice: [candidatos]}"""
+    session.execute(
+        text("SELECT set_config('pg_trgm.similarity_threshold', :t, true)"),
+        {"t": str(TITLE_THRESHOLD)},
+    )
+    rows = session.execute(
+        text(_CANDIDATES_SQL),
+        {
+            "titulos": [titulo for titulo, _, _ in records],
+            "autores": [autor or "" for _, autor, _ in records],
+            "per_record": per_record,
+        },
+    )
+
+    found = {}
+    for row in rows:
+        _, _, fecha = records[row.idx - 1]
+        score = _combined_score(
+            row.sim_titulo, row.sim_autor, _date_score(fecha, row.fecha)
+        )
+        if score >= DUPLICATE_SCORE:
+            found.setdefault(row.idx - 1, []).append(
+                DuplicateCandidate(
+                    row.id, row.titulo, row.autor, row.fecha, round(score, 2)
+                )
+            )
+    for candidates in found.values():
+        candidates.sort(key=lambda candidate: -candidate.score)
+    return found
+
+
+def find_duplicate_candidates(session, titulo, autor, fecha=None):
+    """
+    Libros del catálogo que probablemente son el mismo que se va a registrar,
+    ordenados de mayor a menor puntaje. Si el índice no está disponible se
+    retorna una lista vacía para no bloquear el registro.
+    """
+    if not titulo:
+        return []
+    try:
+        found = _query_candidates(session, [(titulo, autor, fecha)], MAX_CANDIDATES)
+    except Exception as e:
+        session.rollback()
+        print(f"ADVERTENCIA: No se pudo verificar duplicados: {e}")
+        return []
+    return found.get(0, [])
+
+
+def _trigrams(value):
+    """Trigramas al estilo de pg_trgm: por palabra, con dos espacios delante"""
+    decomposed = unicodedata.normalize("NFKD", (value or "").lower())
+    plain = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    grams = set()
+    for word in re.findall(r"\w+", plain):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _similarity(grams_a, grams_b):
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def _duplicates_within_batch(records):
+    """
+    Pares repetidos dentro del mismo lote (que todavía no están en la base).
+
+    Filtro por prefijo: con los trigramas de cada título ordenados del más
+    raro al más común, dos títulos con similitud >= TITLE_THRESHOLD comparten
+    al menos uno de los primeros `n - ceil(t * n) + 1`. Solo esos se indexan,
+    así los trigramas frecuentes no generan comparaciones.
+    """
+    title_grams = [_trigrams(titulo) for titulo, _, _ in records]
+    author_grams = [_trigrams(autor) for _, autor, _ in records]
+    frequency = Counter(gram for grams in title_grams for gram in grams)
+
+    by_gram = {}
+    found = {}
+    for index, grams in enumerate(title_grams):
+        ordered = sorted(grams, key=lambda gram: (frequency[gram], gram))
+        prefix = ordered[: len(ordered) - math.ceil(TITLE_THRESHOLD * len(ordered)) + 1]
+
+        others = set()
+        for gram in prefix:
+            others.update(by_gram.get(gram, ()))
+            by_gram.setdefault(gram, []).append(index)
+
+        for other in sorted(others):
+            sim_titulo = _similarity(grams, title_grams[other])
+            if sim_titulo < TITLE_THRESHOLD:
+                continue
+            score = _combined_score(
+                sim_titulo,
+                _similarity(author_grams[index], author_grams[other]),
+                _date_score(records[index][2], records[other][2]),
+            )
+            if score >= DUPLICATE_SCORE:
+                found.setdefault(index, []).append((other, round(score, 2)))
+    return found
+
+
+def find_duplicates_batch(session, records, chunk_size=BATCH_CHUNK):
+    """
+    Pasada de deduplicación para importaciones masivas. `records` es una
+    lista de (titulo, autor, fecha); se hace una consulta por bloque de
+    `chunk_size` registros.
+
+    Retorna (en_catalogo, en_lote): {índice: [DuplicateCandidate]} con los
+    libros ya registrados y {índice: [(índice_anterior, puntaje)]} con los
+    registros repetidos dentro del mismo lote.
+    """
+    records = list(records)
+    in_catalog = {}
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start : start + chunk_size]
+        found = _query_candidates(session, chunk, MAX_CANDIDATES)
+        for index, candidates in found.items():
+            in_catalog[start + index] = candidates
+    return in_catalog, _duplicates_within_batch(records)
@@ -0,0 +1,268 @@
+"""
+Bus de eventos del flujo de trabajo (CU14) sobre LISTEN/NOTIFY de PostgreSQL.
+
+Las operaciones publican con publish(session, tipo, **datos) dentro de su
+propia transacción: PostgreSQL solo entrega la notificación si se confirma.
+Las escrituras que no publican (p. ej. las del servidor web) igual llegan:
+los triggers de la migración 008 avisan de todo cambio en libros, categoria
+y estados_libro.
+Cada cliente mantiene una única conexión escuchando el canal, sin consultas
+periódicas, y reenvía los eventos al hilo de UI, donde se despachan a los
+suscriptores (pantallas y cachés locales).
+
+Con ARCHIBOX_EVENT_BUS=local no se usa PostgreSQL: los eventos se entregan
+dentro del mismo proceso al hacer commit de la sesión (pruebas y demos).
+"""
+
+import json
+import os
+import select
+import threading
+
+from PyQt5.QtCore import QCoreApplication, QObject, QThread, pyqtSignal
+from sqlalchemy import event, text
+from db.database import Database
+
+CHANNEL = "archibox_eventos"
+
+# Tipos de evento
+BOOK_STATE_CHANGED = "libro_estado"  # ids, estado_id
+BOOKS_MODIFIED = "libros_modificados"  # ids
+BOOKS_CREATED = "libros_creados"  # ids
+TASK_ASSIGNED = "tarea_asignada"  # tarea_id, libro_id, titulo, usuario_id
+QA_REJECTED = "qa_rechazo"  # ids, estado_id
+USERS_CHANGED = "usuarios"  # ids (usuarios creados, editados o desactivados)
+CATALOG_CHANGED = "catalogo"  # categorías o estados de libro
+# Emitido localmente al reconectar: pudieron perderse eventos, hay que
+# invalidar todas las cachés
+RESYNC = "resincronizar"
+
+# Tipos que modifican datos del catálogo que los clientes guardan en caché
+CATALOG_EVENTS = (
+    BOOK_STATE_CHANGED,
+    BOOKS_MODIFIED,
+    BOOKS_CREATED,
+    QA_REJECTED,
+    CATALOG_CHANGED,
+)
+
+# NOTIFY admite hasta 8000 bytes por mensaje
+MAX_PAYLOAD_BYTES = 7900
+WAIT_SECONDS = 1.0
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 60
+
+_PENDING_KEY = "archibox_eventos_pendientes"
+
+
+def local_mode():
+    return os.environ.get("ARCHIBOX_EVENT_BUS", "").lower() == "local"
+
+
+def _encode(kind, data):
+    payload = json.dumps({"tipo": kind, **data}, default=str)
+    if len(payload.encode("utf-8")) > MAX_PAYLOAD_BYTES and "ids" in data:
+        # Demasiados ids: los suscriptores tratan ids=None como "varios libros"
+        payload = json.dumps({"tipo": kind, **data, "ids": None}, default=str)
+    return payload
+
+
+def _decode(payload):
+    data = json.loads(payload)
+    return data.pop("tipo", ""), data
+
+
+def publish(session, kind, **data):
+    """
+    Publica un evento como parte de la transacción de `session`. No hace
+    commit: el evento se entrega cuando el llamador confirma, y se descarta
+    si hace rollback.
+    """
+    payload = _encode(kind, data)
+    if not local_mode():
+        # La marca (local a la transacción) evita que los triggers de la
+        # migración 008 publiquen además su propio aviso de estos cambios
+        session.execute(
+            text(
+                "SELECT pg_notify(:canal, :payload), "
+                "set_config('archibox.eventos_publicados', 'on', true)"
+            ),
+            {"canal": CHANNEL, "payload": payload},
+        )
+        return
+
+    pending = session.info.get(_PENDING_KEY)
+    if pending is None:
+        pending = session.info[_PENDING_KEY] = []
+        event.listen(session, "after_commit", _deliver_pending)
+        event.listen(session, "after_rollback", _discard_pending)
+    pending.append(payload)
+
+
+def _deliver_pending(session):
+    pending = session.info.get(_PENDING_KEY) or []
+    delivered = list(pending)
+    pending.clear()
+    bus = get_event_bus()
+    for payload in delivered:
+        bus.deliver(*_decode(payload))
+
+
+def _discard_pending(session):
+    session.info.get(_PENDING_KEY, []).clear()
+
+
+class NotificationListener(QThread):
+    """
+    Mantiene una conexión dedicada con LISTEN sobre el canal. Espera con
+    select() sobre el socket, así que no genera tráfico mientras no hay
+    eventos. Si la conexión se cae, reintenta con espera exponencial.
+    """
+
+    notified = pyqtSignal(str, dict)
+    reconnected = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.connected = False
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        delay = RECONNECT_MIN_SECONDS
+        first = True
+        while not self._stop.is_set():
+            session = Database().get_session()
+            try:
+                raw = self._listen(session)
+                self.connected = True
+                if not first:
+                    self.reconnected.emit()
+                first = False
+                delay = RECONNECT_MIN_SECONDS
+                self._wait_for_notifications(raw)
+            except Exception as e:
+                self.failed.emit(str(e))
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+            finally:
+                self.connected = False
+                session.close()
+
+    def _listen(self, session):
+        fairy = session.connection().connection
+        # La conexión no vuelve al pool: queda en autocommit escuchando
+        fairy.detach()
+        raw = getattr(fairy, "dbapi_connection", None) or fairy.connection
+        if not hasattr(raw, "poll"):
+            self._stop.set()
+            raise RuntimeError(
+                "El driver de PostgreSQL no soporta LISTEN; solo se recibirán "
+                "los eventos de este cliente."
+            )
+        raw.rollback()
+        raw.autocommit = True
+        raw.cursor().execute(f"LISTEN {CHANNEL}")
+        return raw
+
+    def _wait_for_notifications(self, raw):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([raw], [], [], WAIT_SECONDS)
+            if not ready:
+                continue
+            raw.poll()
+            while raw.notifies:
+                notification = raw.notifies.pop(0)
+                try:
+                    self.notified.emit(*_decode(notification.payload))
+                except ValueError:
+                    print(f"ADVERTENCIA: Evento ilegible: {notification.payload!r}")
+
+
+class EventBus(QObject):
+    """
+    Despacha los eventos a los suscriptores en el hilo donde vive el bus
+    (el de UI). Los callbacks reciben (tipo, datos).
+    """
+
+    received = pyqtSignal(str, dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._subscribers = {}  # tipo -> [callback]; None = todos los tipos
+        self._listener = None
+        self.received.connect(self._dispatch)
+
+    @property
+    def listening(self):
+        """True si los eventos de otros clientes están llegando por PostgreSQL"""
+        return self._listener is not None and self._listener.connected
+
+    @property
+    def delivers_invalidations(self):
+        """True si una caché puede confiar en que se le avisará de los cambios"""
+        return local_mode() or self.listening
+
+    def start(self):
+        if local_mode() or self._listener is not None:
+            return
+        self._listener = NotificationListener()
+        self._listener.notified.connect(self.deliver)
+        self._listener.reconnected.connect(lambda: self.deliver(RESYNC, {}))
+        self._listener.failed.connect(_report_listener_failure)
+        self._listener.start()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener.wait()
+            self._listener = None
+
+    def subscribe(self, callback, *kinds):
+        """Suscribe `callback` a los tipos indicados (a todos si no se indica)"""
+        for kind in kinds or (None,):
+            callbacks = self._subscribers.setdefault(kind, [])
+            if callback not in callbacks:
+                callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        for callbacks in self._subscribers.values():
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def deliver(self, kind, data):
+        """Entrega un evento; se puede llamar desde cualquier hilo"""
+        self.received.emit(kind, data)
+
+    def _dispatch(self, kind, data):
+        callbacks = self._subscribers.get(kind, []) + self._subscribers.get(None, [])
+        for callback in callbacks:
+            try:
+                callback(kind, data)
+            except Exception as e:
+                print(f"ADVERTENCIA: Error al procesar el evento '{kind}': {e}")
+
+
+def _report_listener_failure(message):
+    print(f"ADVERTENCIA: Bus de eventos: {message}")
+
+
+_bus = None
+
+
+def get_event_bus():
+    """
+    Bus compartido del proceso; la primera llamada empieza a escuchar y deja
+    programado el cierre del hilo al salir de la aplicación.
+    """
+    global _bus
+    if _bus is None:
+        _bus = EventBus()
+        _bus.start()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_bus.stop)
+    return _bus
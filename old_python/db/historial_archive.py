@@ -0,0 +1,359 @@
+"""
+Mantenimiento del historial particionado por mes (migración 004).
+
+- ensure_partitions(): crea las particiones de los próximos meses.
+- archive_cold_partitions(): exporta las particiones frías a archivos
+  JSONL comprimidos (gzip), los registra en `historial_archivo` y elimina
+  la partición. Los meses archivados se siguen pudiendo consultar con
+  query_history(..., include_archived=True), que lee los archivos a demanda.
+- daily_summary(): conteos por día desde `historial_resumen_diario`, que
+  el servidor mantiene con un trigger y nunca se archiva.
+
+Uso periódico (cron / tarea programada):
+    python -m db.historial_archive --ensure --archive --older-than 24
+"""
+
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from sqlalchemy import text
+from db.database import Database
+from utils.path_utils import get_books_path
+
+DEFAULT_MONTHS_AHEAD = 3
+# Meses que se mantienen en PostgreSQL; los anteriores se archivan
+DEFAULT_HOT_MONTHS = 24
+FETCH_CHUNK = 5000
+
+HistoryRow = namedtuple(
+    "HistoryRow",
+    [
+        "id",
+        "fecha",
+        "usuario_id",
+        "accion_id",
+        "target_type_id",
+        "target_id",
+        "detalles",
+        "created_at",
+    ],
+)
+
+_COLUMNS = ", ".join(HistoryRow._fields)
+_FILTER_COLUMNS = ("usuario_id", "accion_id", "target_type_id", "target_id")
+
+
+def get_archive_root():
+    """
+    `historial_archivo/` junto a `books/`, para que todos los clientes lean
+    los mismos archivos; se puede reubicar con ARCHIBOX_HISTORIAL_ARCHIVE.
+    """
+    configured = os.environ.get("ARCHIBOX_HISTORIAL_ARCHIVE")
+    if configured:
+        return configured
+    books_dir = os.path.dirname(get_books_path("libro.pdf"))
+    return os.path.join(os.path.dirname(books_dir), "historial_archivo")
+
+
+def ensure_partitions(session, months_ahead=DEFAULT_MONTHS_AHEAD):
+    """Crea las particiones que falten; retorna cuántas se crearon"""
+    created = session.execute(
+        text("SELECT historial_asegurar_particiones(:meses)"),
+        {"meses": months_ahead},
+    ).scalar()
+    session.commit()
+    return created
+
+
+def _month_start(day, months_back=0):
+    month_index = day.year * 12 + day.month - 1 - months_back
+    return datetime.datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def cold_partitions(session, hot_months=DEFAULT_HOT_MONTHS):
+    """
+    Particiones mensuales que terminan antes del corte, de la más antigua a
+    la más reciente: [(nombre, desde, hasta)].
+    """
+    cutoff = _month_start(datetime.date.today(), hot_months)
+    rows = session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'historial'::regclass "
+            "AND c.relname LIKE 'historial\\_p%' "
+            "ORDER BY c.relname"
+        )
+    )
+    partitions = []
+    for (name,) in rows:
+        start = datetime.datetime.strptime(name[len("historial_p") :], "%Y_%m")
+        end = _month_start(start.date(), -1)
+        if end <= cutoff:
+            partitions.append((name, start, end))
+    return partitions
+
+
+def _to_json(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def _export_partition(session, name, destination):
+    """
+    Escribe la partición en `destination` (JSONL gzip, una fila por línea) y
+    retorna (filas, sha256 del archivo, min_id, max_id).
+    """
+    result = session.execute(
+        text(f"SELECT {_COLUMNS} FROM {name} ORDER BY id").execution_options(
+            stream_results=True
+        )
+    )
+    count, min_id, max_id = 0, None, None
+    with gzip.open(destination, "wt", encoding="utf-8") as out:
+        while True:
+            chunk = result.fetchmany(FETCH_CHUNK)
+            if not chunk:
+                break
+            for row in chunk:
+                record = dict(zip(HistoryRow._fields, row))
+                out.write(json.dumps(record, default=_to_json) + "\n")
+                min_id = record["id"] if min_id is None else min_id
+                max_id = record["id"]
+            count += len(chunk)
+
+    digest = hashlib.sha256()
+    with open(destination, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return count, digest.hexdigest(), min_id, max_id
+
+
+def archive_partition(session, name, start, end, archive_root=None):
+    """
+    Archiva una partición: exporta, verifica el conteo, registra el archivo
+    en `historial_archivo` y elimina la partición, todo en una transacción.
+    Si algo falla la partición queda intacta y el archivo a medias se borra.
+    """
+    archive_root = archive_root or get_archive_root()
+    os.makedirs(archive_root, exist_ok=True)
+    filename = f"{name}.jsonl.gz"
+    final_path = os.path.join(archive_root, filename)
+    tmp_path = final_path + ".tmp"
+
+    try:
+        # Nadie puede insertar en el mes mientras se exporta
+        session.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+        count, sha256, min_id, max_id = _export_partition(session, name, tmp_path)
+        live = session.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+        if live != count:
+            raise RuntimeError(
+                f"{name}: se exportaron {count} filas pero la partición tiene {live}"
+            )
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, final_path)
+
+        session.execute(
+            text(
+                "INSERT INTO historial_archivo "
+                "(particion, desde, hasta, archivo, filas, sha256, min_id, max_id) "
+                "VALUES (:particion, :desde, :hasta, :archivo, :filas, :sha256, "
+                ":min_id, :max_id)"
+            ),
+            {
+                "particion": name,
+                "desde": start,
+                "hasta": end,
+                "archivo": filename,
+                "filas": count,
+                "sha256": sha256,
+                "min_id": min_id,
+                "max_id": max_id,
+            },
+        )
+        session.execute(text(f"ALTER TABLE historial DETACH PARTITION {name}"))
+        session.execute(text(f"DROP TABLE {name}"))
+        session.commit()
+    except Exception:
+        session.rollback()
+        for path in (tmp_path, final_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return count
+
+
+def archive_cold_partitions(session, hot_months=DEFAULT_HOT_MONTHS, archive_root=None):
+    """Archiva todas las particiones frías; retorna [(partición, filas)]"""
+    archived = []
+    for name, start, end in cold_partitions(session, hot_months):
+        archived.append(
+            (name, archive_partition(session, name, start, end, archive_root))
+        )
+    return archived
+
+
+def _parse_row(line):
+    record = json.loads(line)
+    for field in ("fecha", "created_at"):
+        if record[field]:
+            record[field] = datetime.datetime.fromisoformat(record[field])
+    return HistoryRow(**record)
+
+
+def _wanted_filters(filters):
+    """
+    Filtros con valor, validados. Una lista, tupla o conjunto significa
+    "cualquiera de estos valores" y se entrega como lista.
+    """
+    wanted = {
+        key: list(value) if isinstance(value, (list, tuple, set, frozenset)) else value
+        for key, value in filters.items()
+        if value is not None
+    }
+    unknown = set(wanted) - set(_FILTER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Filtros no permitidos: {', '.join(sorted(unknown))}")
+    return wanted
+
+
+def read_archived(session, desde, hasta, archive_root=None, **filters):
+    """
+    Filas archivadas con `desde <= fecha < hasta` que cumplen los filtros
+    (usuario_id, accion_id, target_type_id, target_id; cada uno un valor o
+    una lista de valores). Solo se abren los archivos de los meses que se
+    solapan con el rango, una vez cada uno.
+    """
+    archive_root = archive_root or get_archive_root()
+    allowed = {
+        key: set(value) if isinstance(value, list) else {value}
+        for key, value in _wanted_filters(filters).items()
+    }
+
+    files = session.execute(
+        text(
+            "SELECT archivo FROM historial_archivo "
+            "WHERE desde < :hasta AND hasta > :desde ORDER BY desde"
+        ),
+        {"desde": desde, "hasta": hasta},
+    ).scalars()
+    for filename in list(files):
+        path = os.path.join(archive_root, filename)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    row = _parse_row(line)
+                    if not desde <= row.fecha < hasta:
+                        continue
+                    if all(getattr(row, k) in v for k, v in allowed.items()):
+                        yield row
+        except OSError as e:
+            print(f"ADVERTENCIA: No se pudo leer el archivo de historial {path}: {e}")
+
+
+def query_history(session, desde, hasta, include_archived=False, **filters):
+    """
+    Historial con `desde <= fecha < hasta`, del más reciente al más antiguo.
+    El filtro por fecha hace que PostgreSQL solo recorra las particiones del
+    rango; con include_archived=True se agregan los meses archivados. Un
+    filtro con una lista de valores se resuelve en la misma consulta.
+    """
+    wanted = _wanted_filters(filters)
+    conditions = ["fecha >= :desde", "fecha < :hasta"]
+    conditions += [
+        (
+            f"{column} = ANY(:{column})"
+            if isinstance(value, list)
+            else f"{column} = :{column}"
+        )
+        for column, value in wanted.items()
+    ]
+    result = session.execute(
+        text(
+            f"SELECT {_COLUMNS} FROM historial "
+            f"WHERE {' AND '.join(conditions)} ORDER BY fecha DESC, id DESC"
+        ),
+        {"desde": desde, "hasta": hasta, **wanted},
+    )
+    rows = [HistoryRow(*row) for row in result]
+    if include_archived:
+        rows += read_archived(session, desde, hasta, **wanted)
+        rows.sort(key=lambda row: (row.fecha, row.id), reverse=True)
+    return rows
+
+
+def recent_history(session, days=30, **filters):
+    """Atajo para las consultas de auditoría habituales (últimos `days` días)"""
+    hasta = datetime.datetime.now() + datetime.timedelta(seconds=1)
+    return query_history(
+        session, hasta - datetime.timedelta(days=days), hasta, **filters
+    )
+
+
+def daily_summary(session, desde, hasta, usuario_id=None, accion_id=None):
+    """
+    [(dia, usuario_id, accion_id, target_type_id, total)] para
+    `desde <= dia < hasta`. Cubre también los meses archivados.
+    """
+    conditions = ["dia >= :desde", "dia < :hasta"]
+    params = {"desde": desde, "hasta": hasta}
+    if usuario_id is not None:
+        conditions.append("usuario_id = :usuario_id")
+        params["usuario_id"] = usuario_id
+    if accion_id is not None:
+        conditions.append("accion_id = :accion_id")
+        params["accion_id"] = accion_id
+    return session.execute(
+        text(
+            "SELECT dia, usuario_id, accion_id, target_type_id, total "
+            "FROM historial_resumen_diario "
+            f"WHERE {' AND '.join(conditions)} "
+            "ORDER BY dia, usuario_id, accion_id, target_type_id"
+        ),
+        params,
+    ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--ensure", action="store_true", help="crea las particiones que falten"
+    )
+    parser.add_argument(
+        "--archive", action="store_true", help="archiva las particiones frías"
+    )
+    parser.add_argument(
+        "--older-than",
+        type=int,
+        default=DEFAULT_HOT_MONTHS,
+        help="meses que se mantienen en la base de datos",
+    )
+    parser.add_argument(
+        "--months-ahead",
+        type=int,
+        default=DEFAULT_MONTHS_AHEAD,
+        help="meses futuros con partición ya creada",
+    )
+    args = parser.parse_args()
+
+    session = Database().get_session()
+    try:
+        if args.ensure:
+            created = ensure_partitions(session, args.months_ahead)
+            print(f"Particiones creadas: {created}")
+        if args.archive:
+            for name, count in archive_cold_partitions(session, args.older_than):
+                print(f"{name}: {count} filas archivadas")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Sentencias precompiladas para las consultas de los caminos más frecuentes.
+
+Con session.query(...).filter(...) cada clic vuelve a construir la consulta y
+su clave de caché. Aquí cada sentencia se construye una sola vez, con
+bindparam() en lugar de valores, y se reutiliza: SQLAlchemy encuentra el SQL
+ya compilado y solo se envían los parámetros. Los filtros dinámicos de
+CU17/CU18 guardan una sentencia por combinación de filtros presentes (como
+mucho unas decenas).
+
+Ver benchmarks/bench_hot_queries.py para la comparación con el enfoque ORM.
+"""
+
+import threading
+
+from sqlalchemy import bindparam, literal_column, or_, select
+from db.models import Libro, Categoria, EstadoLibro, Usuario, Rol
+from utils.isbn import normalize_isbn
+
+# Columna generada por PostgreSQL (migración 005_isbn13_key), indexada; los
+# ejemplares de una misma edición comparten la clave
+_ISBN13 = literal_column("libros.isbn13")
+
+_STATE_BY_NAME = select(EstadoLibro).where(EstadoLibro.nombre == bindparam("nombre"))
+_USER_BY_EMAIL = select(Usuario).where(
+    Usuario.correo_electronico == bindparam("correo")
+)
+_ACTIVE_USER_BY_EMAIL = _USER_BY_EMAIL.where(Usuario.estado.is_(True))
+
+_BOOKS_WITH_NAMES = (
+    select(Libro, Categoria.nombre, EstadoLibro.nombre)
+    .outerjoin(Categoria, Libro.categoria_id == Categoria.id)
+    .outerjoin(EstadoLibro, Libro.estado_id == EstadoLibro.id)
+)
+_BOOK_WITH_NAMES = _BOOKS_WITH_NAMES.where(Libro.id == bindparam("book_id"))
+_BOOKS_BY_ISBN13 = _BOOKS_WITH_NAMES.where(_ISBN13 == bindparam("isbn13")).order_by(
+    Libro.id
+)
+
+# Columnas planas para exportar (utils.result_export): sin objetos del ORM
+_BOOK_EXPORT = (
+    select(
+        Libro.id,
+        Libro.titulo,
+        Libro.autor,
+        Libro.isbn,
+        Libro.fecha,
+        Libro.numero_paginas,
+        Categoria.nombre.label("categoria"),
+        EstadoLibro.nombre.label("estado"),
+        Libro.estanteria,
+        Libro.espacio,
+    )
+    .outerjoin(Categoria, Libro.categoria_id == Categoria.id)
+    .outerjoin(EstadoLibro, Libro.estado_id == EstadoLibro.id)
+)
+_USER_EXPORT = select(
+    Usuario.id,
+    Usuario.nombres,
+    Usuario.apellidos,
+    Usuario.correo_electronico,
+    Rol.nombre.label("rol"),
+    Usuario.estado,
+).outerjoin(Rol, Usuario.rol_id == Rol.id)
+
+# Condición de cada filtro; el nombre del filtro es también el del parámetro
+_BOOK_CONDITIONS = {
+    "ids": Libro.id.in_(bindparam("ids", expanding=True)),
+    "titulo": Libro.titulo.ilike(bindparam("titulo")),
+    "autor": Libro.autor.ilike(bindparam("autor")),
+    "isbn": Libro.isbn.ilike(bindparam("isbn")),
+    "isbn13": _ISBN13 == bindparam("isbn13"),
+    "any_text": or_(
+        Libro.titulo.ilike(bindparam("any_text")),
+        Libro.autor.ilike(bindparam("any_text")),
+        Libro.isbn.ilike(bindparam("any_text")),
+    ),
+    "categoria_id": Libro.categoria_id == bindparam("categoria_id"),
+    "estado_id": Libro.estado_id == bindparam("estado_id"),
+}
+_USER_CONDITIONS = {
+    "nombres": Usuario.nombres.ilike(bindparam("nombres")),
+    "apellidos": Usuario.apellidos.ilike(bindparam("apellidos")),
+    "correo": Usuario.correo_electronico.ilike(bindparam("correo")),
+    "rol_id": Usuario.rol_id == bindparam("rol_id"),
+    "estado": Usuario.estado == bindparam("estado"),
+}
+
+_statements = {}
+_statements_lock = threading.Lock()
+
+
+def _statement_for(kind, present, build):
+    """Sentencia de `kind` para los filtros `present`, construida una sola vez"""
+    key = (kind, present)
+    statement = _statements.get(key)
+    if statement is None:
+        with _statements_lock:
+            statement = _statements.setdefault(key, build())
+    return statement
+
+
+def get_book(session, book_id):
+    """
+    Libro por id. Session.get() consulta primero el mapa de identidad y, si
+    no lo tiene, usa la carga por clave primaria que SQLAlchemy ya cachea.
+    """
+    return session.get(Libro, book_id)
+
+
+def state_by_name(session, nombre):
+    """EstadoLibro con ese nombre, o None"""
+    return session.execute(_STATE_BY_NAME, {"nombre": nombre}).scalars().first()
+
+
+def user_by_email(session, correo, active_only=True):
+    """Usuario con ese correo (solo activos por defecto), o None"""
+    statement = _ACTIVE_USER_BY_EMAIL if active_only else _USER_BY_EMAIL
+    return session.execute(statement, {"correo": correo}).scalars().first()
+
+
+def _book_params(
+    titulo="",
+    autor="",
+    isbn="",
+    categoria_id=None,
+    estado_id=None,
+    any_text="",
+    ids=None,
+):
+    """Parámetros de los filtros de CU17 que vienen con valor"""
+    params = {}
+    if ids is not None:
+        params["ids"] = list(ids)
+    isbn13 = normalize_isbn(isbn)
+    if isbn13:
+        params["isbn13"] = isbn13
+        isbn = ""
+    for name, value in (
+        ("titulo", titulo),
+        ("autor", autor),
+        ("isbn", isbn),
+        ("any_text", any_text),
+    ):
+        if value:
+            params[name] = f"%{value}%"
+    if categoria_id:
+        params["categoria_id"] = categoria_id
+    if estado_id:
+        params["estado_id"] = estado_id
+    return params
+
+
+def books_with_names(
+    session,
+    titulo="",
+    autor="",
+    isbn="",
+    categoria_id=None,
+    estado_id=None,
+    any_text="",
+    ids=None,
+):
+    """
+    [(Libro, categoria_nombre, estado_nombre)] según los filtros de CU17. Un
+    `isbn` completo y válido se busca por la clave ISBN-13 (con cualquier
+    formato de guiones); uno parcial, como subcadena.
+    """
+    params = _book_params(titulo, autor, isbn, categoria_id, estado_id, any_text, ids)
+    present = tuple(name for name in _BOOK_CONDITIONS if name in params)
+    statement = _statement_for(
+        "libros",
+        present,
+        lambda: _BOOKS_WITH_NAMES.where(
+            *[_BOOK_CONDITIONS[name] for name in present]
+        ).order_by(Libro.titulo),
+    )
+    return session.execute(statement, params).all()
+
+
+def book_export_query(**filters):
+    """
+    (sentencia, parámetros) con las columnas planas de los libros que
+    cumplen los filtros de books_with_names(), para exportarlos
+    """
+    params = _book_params(**filters)
+    present = tuple(name for name in _BOOK_CONDITIONS if name in params)
+    statement = _statement_for(
+        "libros_export",
+        present,
+        lambda: _BOOK_EXPORT.where(
+            *[_BOOK_CONDITIONS[name] for name in present]
+        ).order_by(Libro.titulo, Libro.id),
+    )
+    return statement, params
+
+
+def book_with_names(session, book_id):
+    """(Libro, categoria_nombre, estado_nombre) de un libro, o None"""
+    return session.execute(_BOOK_WITH_NAMES, {"book_id": book_id}).first()
+
+
+def books_by_isbn(session, isbn13):
+    """[(Libro, categoria_nombre, estado_nombre)] de los ejemplares con esa clave"""
+    return session.execute(_BOOKS_BY_ISBN13, {"isbn13": isbn13}).all()
+
+
+def _user_params(nombres="", apellidos="", correo="", rol_id=None, estado=None):
+    """Parámetros de los filtros de CU18; rol_id/estado None no filtran"""
+    params = {}
+    for name, value in (
+        ("nombres", nombres),
+        ("apellidos", apellidos),
+        ("correo", correo),
+    ):
+        if value:
+            params[name] = f"%{value}%"
+    if rol_id is not None:
+        params["rol_id"] = rol_id
+    if estado is not None:
+        params["estado"] = estado
+    return params
+
+
+def search_users(
+    session, nombres="", apellidos="", correo="", rol_id=None, estado=None
+):
+    """Usuarios según los filtros de CU18; rol_id/estado None no filtran"""
+    params = _user_params(nombres, apellidos, correo, rol_id, estado)
+    present = tuple(name for name in _USER_CONDITIONS if name in params)
+    statement = _statement_for(
+        "usuarios",
+        present,
+        lambda: select(Usuario).where(*[_USER_CONDITIONS[name] for name in present]),
+    )
+    return session.execute(statement, params).scalars().all()
+
+
+def user_export_query(**filters):
+    """(sentencia, parámetros) como book_export_query(), con los filtros de CU18"""
+    params = _user_params(**filters)
+    present = tuple(name for name in _USER_CONDITIONS if name in params)
+    statement = _statement_for(
+        "usuarios_export",
+        present,
+        lambda: _USER_EXPORT.where(
+            *[_USER_CONDITIONS[name] for name in present]
+        ).order_by(Usuario.apellidos, Usuario.nombres, Usuario.id),
+    )
+    return statement, params
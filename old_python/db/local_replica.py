@@ -0,0 +1,492 @@
+"""
+Réplica local (SQLite + FTS5) de `libros`, `categoria` y `estados_libro`
+para búsquedas de solo lectura (CU17/CU22) en clientes con enlace lento.
+
+La réplica es opcional: se activa con ARCHIBOX_LOCAL_REPLICA=1. Las
+escrituras siempre van al servidor; la réplica se pone al día leyendo los
+libros con `updated_at` posterior a la última marca de agua aplicada. Esa
+columna la mantiene un trigger, así que también cubre las escrituras del
+servidor web, que no pasan por el historial. Los libros borrados se
+detectan comparando la cantidad de filas.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+from PyQt5.QtCore import QCoreApplication, QThread, pyqtSignal
+from sqlalchemy import text
+from db.database import Database
+from db.models import Libro, Categoria, EstadoLibro
+from db.event_bus import get_event_bus, CATALOG_EVENTS, RESYNC
+from utils.cache_paths import get_cache_dir
+from utils.isbn import normalize_isbn
+
+# Fila de resultado de búsqueda, independiente de la sesión ORM
+CatalogRow = namedtuple(
+    "CatalogRow",
+    [
+        "id",
+        "titulo",
+        "autor",
+        "isbn",
+        "categoria_id",
+        "categoria_nombre",
+        "estado_id",
+        "estado_nombre",
+        "directorio_img",
+    ],
+)
+
+SYNC_INTERVAL_SECONDS = 30
+# Con el bus de eventos conectado se sincroniza al recibir cada cambio (los
+# triggers de la migración 008 avisan también de las escrituras del servidor
+# web); el intervalo queda como red de seguridad ante avisos perdidos
+EVENT_SYNC_INTERVAL_SECONDS = 120
+# updated_at es la hora de inicio de la transacción, que puede confirmar
+# después de la lectura anterior. Se relee una ventana hacia atrás; las
+# upserts son idempotentes.
+WATERMARK_OVERLAP_SECONDS = 300
+FETCH_CHUNK = 1000
+MIN_TRIGRAM_LENGTH = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+CREATE TABLE IF NOT EXISTS categoria (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    descripcion TEXT
+);
+
+CREATE TABLE IF NOT EXISTS estados_libro (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    orden INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS libros (
+    id INTEGER PRIMARY KEY,
+    isbn TEXT,
+    titulo TEXT NOT NULL,
+    autor TEXT NOT NULL,
+    fecha TEXT,
+    numero_paginas INTEGER,
+    estado_id INTEGER,
+    estanteria TEXT,
+    espacio TEXT,
+    categoria_id INTEGER,
+    directorio_pdf TEXT,
+    directorio_img TEXT,
+    isbn13 TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_libros_estado ON libros(estado_id);
+CREATE INDEX IF NOT EXISTS idx_libros_categoria ON libros(categoria_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS libros_fts USING fts5(
+    titulo, autor, isbn,
+    content='libros', content_rowid='id', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS libros_ai AFTER INSERT ON libros BEGIN
+    INSERT INTO libros_fts(rowid, titulo, autor, isbn)
+    VALUES (new.id, new.titulo, new.autor, new.isbn);
+END;
+CREATE TRIGGER IF NOT EXISTS libros_ad AFTER DELETE ON libros BEGIN
+    INSERT INTO libros_fts(libros_fts, rowid, titulo, autor, isbn)
+    VALUES ('delete', old.id, old.titulo, old.autor, old.isbn);
+END;
+CREATE TRIGGER IF NOT EXISTS libros_au AFTER UPDATE ON libros BEGIN
+    INSERT INTO libros_fts(libros_fts, rowid, titulo, autor, isbn)
+    VALUES ('delete', old.id, old.titulo, old.autor, old.isbn);
+    INSERT INTO libros_fts(rowid, titulo, autor, isbn)
+    VALUES (new.id, new.titulo, new.autor, new.isbn);
+END;
+"""
+
+_LIBRO_COLUMNS = (
+    "id",
+    "isbn",
+    "titulo",
+    "autor",
+    "fecha",
+    "numero_paginas",
+    "estado_id",
+    "estanteria",
+    "espacio",
+    "categoria_id",
+    "directorio_pdf",
+    "directorio_img",
+    "isbn13",
+)
+
+_UPSERT_LIBRO = (
+    f"INSERT INTO libros ({', '.join(_LIBRO_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _LIBRO_COLUMNS)}) "
+    f"ON CONFLICT(id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in _LIBRO_COLUMNS if c != "id")
+)
+
+
+# Fechas como segundos desde 1970, sin zona (igual que en la base de datos)
+_MAX_UPDATED_SQL = (
+    "SELECT COALESCE(EXTRACT(EPOCH FROM MAX(updated_at))::float8, 0) FROM libros"
+)
+_CHANGED_SQL = (
+    "SELECT id, EXTRACT(EPOCH FROM updated_at)::float8 AS marca FROM libros "
+    "WHERE updated_at >= to_timestamp(:desde) AT TIME ZONE 'UTC'"
+)
+
+
+def _libro_values(book):
+    values = []
+    for column in _LIBRO_COLUMNS:
+        value = getattr(book, column, None)
+        if column == "fecha" and value is not None:
+            value = value.isoformat()
+        elif column == "isbn13":
+            value = normalize_isbn(book.isbn)
+        values.append(value)
+    return values
+
+
+def _fts_phrase(column, term):
+    return f'{column}:"{term.replace(chr(34), chr(34) * 2)}"'
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class LocalCatalogReplica:
+    """Réplica SQLite del catálogo; una conexión por hilo, en modo WAL"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_cache_dir("replica"), "catalogo.sqlite3")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+            self._upgrade_schema(conn)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _upgrade_schema(self, conn):
+        """Agrega a réplicas antiguas las columnas nuevas y fuerza una recarga"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(libros)")}
+        if "isbn13" not in columns:
+            conn.execute("ALTER TABLE libros ADD COLUMN isbn13 TEXT")
+            conn.execute("DELETE FROM meta WHERE key = 'libros_watermark'")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_libros_isbn13 ON libros(isbn13)")
+        # La marca anterior era un id de historial; sin la nueva se recarga todo
+        conn.execute("DELETE FROM meta WHERE key = 'historial_watermark'")
+
+    def _get_meta(self, key):
+        row = (
+            self._connection()
+            .execute("SELECT value FROM meta WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return row["value"] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    def is_ready(self):
+        """True cuando ya se completó al menos una carga inicial"""
+        return self._get_meta("libros_watermark") is not None
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def search_books(
+        self,
+        titulo="",
+        autor="",
+        isbn="",
+        categoria_id=None,
+        estado_id=None,
+        any_text="",
+        ids=None,
+    ):
+        """
+        Misma semántica que la búsqueda del servidor: subcadena sin distinguir
+        mayúsculas; `any_text` coincide con título, autor o ISBN y `ids`
+        restringe el resultado a esos libros. Un `isbn` completo se compara
+        por su clave ISBN-13.
+        """
+        where = []
+        params = []
+        if ids is not None:
+            where.append("l.id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps([int(book_id) for book_id in ids]))
+        isbn13 = normalize_isbn(isbn)
+        if isbn13:
+            where.append("l.isbn13 = ?")
+            params.append(isbn13)
+            isbn = ""
+        match_terms = []
+        for column, term in (("titulo", titulo), ("autor", autor), ("isbn", isbn)):
+            if not term:
+                continue
+            if len(term) >= MIN_TRIGRAM_LENGTH:
+                match_terms.append(_fts_phrase(column, term))
+            else:
+                where.append(f"l.{column} LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(term))
+        if any_text:
+            if len(any_text) >= MIN_TRIGRAM_LENGTH:
+                match_terms.append(_fts_phrase("{titulo autor isbn}", any_text))
+            else:
+                where.append(
+                    "(l.titulo LIKE ? ESCAPE '\\' OR l.autor LIKE ? ESCAPE '\\' "
+                    "OR l.isbn LIKE ? ESCAPE '\\')"
+                )
+                params.extend([_like_pattern(any_text)] * 3)
+        if match_terms:
+            where.append(
+                "l.id IN (SELECT rowid FROM libros_fts WHERE libros_fts MATCH ?)"
+            )
+            params.append(" AND ".join(match_terms))
+        if categoria_id:
+            where.append("l.categoria_id = ?")
+            params.append(categoria_id)
+        if estado_id:
+            where.append("l.estado_id = ?")
+            params.append(estado_id)
+
+        sql = (
+            "SELECT l.id, l.titulo, l.autor, l.isbn, l.categoria_id, "
+            "c.nombre AS categoria_nombre, l.estado_id, "
+            "e.nombre AS estado_nombre, l.directorio_img "
+            "FROM libros l "
+            "LEFT JOIN categoria c ON c.id = l.categoria_id "
+            "LEFT JOIN estados_libro e ON e.id = l.estado_id"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY l.titulo"
+
+        rows = self._connection().execute(sql, params).fetchall()
+        return [CatalogRow(*row) for row in rows]
+
+    def get_books_by_isbn13(self, isbn13):
+        """CatalogRow de los ejemplares con esa clave ISBN-13"""
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT l.id, l.titulo, l.autor, l.isbn, l.categoria_id, "
+                "c.nombre AS categoria_nombre, l.estado_id, "
+                "e.nombre AS estado_nombre, l.directorio_img "
+                "FROM libros l "
+                "LEFT JOIN categoria c ON c.id = l.categoria_id "
+                "LEFT JOIN estados_libro e ON e.id = l.estado_id "
+                "WHERE l.isbn13 = ? ORDER BY l.id",
+                (isbn13,),
+            )
+            .fetchall()
+        )
+        return [CatalogRow(*row) for row in rows]
+
+    def get_book(self, book_id):
+        return (
+            self._connection()
+            .execute(
+                "SELECT l.*, c.nombre AS categoria_nombre, e.nombre AS estado_nombre "
+                "FROM libros l "
+                "LEFT JOIN categoria c ON c.id = l.categoria_id "
+                "LEFT JOIN estados_libro e ON e.id = l.estado_id "
+                "WHERE l.id = ?",
+                (book_id,),
+            )
+            .fetchone()
+        )
+
+    # ------------------------------------------------------------------
+    # Sincronización
+    # ------------------------------------------------------------------
+
+    def sync(self, session):
+        """
+        Pone la réplica al día con el servidor. La primera vez copia todo;
+        luego solo los libros modificados desde la marca de agua, y quita
+        los que se borraron. Retorna el número de libros actualizados o
+        eliminados.
+        """
+        with self._write_lock:
+            watermark = self._get_meta("libros_watermark")
+
+            conn = self._connection()
+            with conn:
+                if watermark is None:
+                    # Antes de copiar: lo que cambie durante la copia se relee
+                    watermark = session.execute(text(_MAX_UPDATED_SQL)).scalar()
+                    changed = self._full_load(session, conn)
+                else:
+                    watermark, changed = self._incremental(
+                        session, conn, float(watermark)
+                    )
+                changed += self._remove_deleted(session, conn)
+                self._reload_small_tables(session, conn)
+                self._set_meta(conn, "libros_watermark", watermark)
+            return changed
+
+    def _full_load(self, session, conn):
+        conn.execute("DELETE FROM libros")
+        count = 0
+        for book in session.query(Libro).order_by(Libro.id).yield_per(FETCH_CHUNK):
+            conn.execute(_UPSERT_LIBRO, _libro_values(book))
+            count += 1
+        return count
+
+    def _incremental(self, session, conn, watermark):
+        """Retorna (nueva marca de agua, libros releídos)"""
+        changes = session.execute(
+            text(_CHANGED_SQL), {"desde": watermark - WATERMARK_OVERLAP_SECONDS}
+        ).all()
+        if not changes:
+            return watermark, 0
+        book_ids = sorted(row.id for row in changes)
+
+        for start in range(0, len(book_ids), FETCH_CHUNK):
+            chunk = book_ids[start : start + FETCH_CHUNK]
+            for book in session.query(Libro).filter(Libro.id.in_(chunk)):
+                conn.execute(_UPSERT_LIBRO, _libro_values(book))
+        return max(watermark, max(row.marca for row in changes)), len(book_ids)
+
+    def _remove_deleted(self, session, conn):
+        """
+        Tras las upserts la réplica tiene todos los libros del servidor: si
+        tiene más filas, sobran las de libros borrados.
+        """
+        server_count = session.execute(text("SELECT COUNT(*) FROM libros")).scalar()
+        local_count = conn.execute("SELECT COUNT(*) FROM libros").fetchone()[0]
+        if local_count <= server_count:
+            return 0
+        server_ids = {row.id for row in session.execute(text("SELECT id FROM libros"))}
+        deleted = [
+            (row["id"],)
+            for row in conn.execute("SELECT id FROM libros")
+            if row["id"] not in server_ids
+        ]
+        conn.executemany("DELETE FROM libros WHERE id = ?", deleted)
+        return len(deleted)
+
+    def _reload_small_tables(self, session, conn):
+        """Categorías y estados son pocas filas: se copian completas"""
+        conn.execute("DELETE FROM categoria")
+        conn.executemany(
+            "INSERT INTO categoria (id, nombre, descripcion) VALUES (?, ?, ?)",
+            [(c.id, c.nombre, c.descripcion) for c in session.query(Categoria).all()],
+        )
+        conn.execute("DELETE FROM estados_libro")
+        conn.executemany(
+            "INSERT INTO estados_libro (id, nombre, orden) VALUES (?, ?, ?)",
+            [(e.id, e.nombre, e.orden) for e in session.query(EstadoLibro).all()],
+        )
+
+
+class ReplicaSyncThread(QThread):
+    """Sincroniza la réplica periódicamente o cuando se pide con sync_now()"""
+
+    synced = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, replica, interval=SYNC_INTERVAL_SECONDS, bus=None, parent=None):
+        super().__init__(parent)
+        self.replica = replica
+        self.interval = interval
+        self.bus = bus
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def sync_now(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            session = Database().get_session()
+            try:
+                self.synced.emit(self.replica.sync(session))
+            except Exception as e:
+                session.rollback()
+                self.failed.emit(str(e))
+            finally:
+                session.close()
+            listening = self.bus is not None and self.bus.listening
+            self._wake.wait(EVENT_SYNC_INTERVAL_SECONDS if listening else self.interval)
+            self._wake.clear()
+
+
+_replica = None
+_sync_thread = None
+
+
+def replica_enabled():
+    return os.environ.get("ARCHIBOX_LOCAL_REPLICA", "").lower() in ("1", "true", "si")
+
+
+def _report_sync_failure(message):
+    print(f"ADVERTENCIA: Sincronización de réplica: {message}")
+
+
+def get_replica():
+    """
+    Retorna la réplica local si está habilitada y ya tiene datos; si no,
+    None y el llamador debe consultar el servidor. La primera llamada inicia
+    la sincronización en segundo plano.
+    """
+    global _replica, _sync_thread
+    if not replica_enabled():
+        return None
+    if _replica is None:
+        try:
+            _replica = LocalCatalogReplica()
+        except sqlite3.Error as e:
+            print(f"ADVERTENCIA: No se pudo abrir la réplica local: {e}")
+            return None
+        bus = get_event_bus()
+        _sync_thread = ReplicaSyncThread(_replica, bus=bus)
+        _sync_thread.failed.connect(_report_sync_failure)
+        bus.subscribe(_on_catalog_event, *CATALOG_EVENTS, RESYNC)
+        _sync_thread.start()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_stop_sync)
+    return _replica if _replica.is_ready() else None
+
+
+def _stop_sync():
+    """Al salir: no cortar una sincronización a mitad de la transacción"""
+    _sync_thread.stop()
+    _sync_thread.wait()
+
+
+def _on_catalog_event(_kind, _data):
+    request_sync()
+
+
+def request_sync():
+    """Pide una sincronización inmediata (p. ej. tras una escritura)"""
+    if _sync_thread is not None:
+        _sync_thread.sync_now()
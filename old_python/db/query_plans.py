@@ -0,0 +1,424 @@
+"""
+Revisión de los planes de las consultas que emiten las pantallas.
+
+1. Captura: StatementCapture registra cada sentencia SQL que se ejecuta en
+   el proceso (una por forma, con los parámetros de su primera ejecución).
+   Se activa durante un benchmark con --run, o en la aplicación con
+   ARCHIBOX_SQL_CAPTURE=<archivo.jsonl> (ver use_cases/__init__.py).
+2. Análisis: cada sentencia se ejecuta con EXPLAIN (ANALYZE, BUFFERS) dentro
+   de una transacción que se revierte. Se señalan los escaneos secuenciales
+   sobre tablas grandes y se recomiendan los índices que faltan, junto con
+   las claves foráneas sin índice.
+3. Regresiones: el costo estimado de cada plan se compara con una línea
+   base; si alguno sube más de la tolerancia, o aparece un escaneo
+   secuencial nuevo, el comando termina con código 1.
+
+Uso (desde old_python/, contra la base de datos local con los datos de
+prueba de `npm run db:seed`):
+    python -m db.query_plans --run benchmarks.bench_hot_queries \\
+        --baseline planes.json -- --clicks 20
+    python -m db.query_plans --statements sentencias.jsonl --update-baseline
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import re
+import runpy
+import sys
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from db.database import Database
+
+# Filas estimadas desde las cuales un escaneo secuencial se reporta
+LARGE_TABLE_ROWS = 1000
+# Aumento de costo tolerado respecto de la línea base
+COST_TOLERANCE = 0.2
+DEFAULT_BASELINE = "query_plans_baseline.json"
+
+_CAPTURED_VERBS = ("select", "with", "insert", "update", "delete")
+_PARAM = re.compile(r"%\(\w+\)s|%s|\?")
+_PARAM_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACES = re.compile(r"\s+")
+# `(estado_id = 2)`, `((titulo)::text ~~* '%a%'::text)`, `(id = ANY (...))`
+_FILTER_TERM = re.compile(
+    r"\(?\(?(\w+)\)?(?:::[\w ]+)?\s*(=|<>|>=|<=|<|>|~~\*|~~|!~~\*|!~~)\s*(ANY\b)?"
+)
+_LEADING_WILDCARD = re.compile(r"'%")
+
+
+def fingerprint(sql):
+    """Forma normalizada de una sentencia: parámetros y listas IN colapsados"""
+    shape = _SPACES.sub(" ", _PARAM.sub("?", sql)).strip()
+    shape = _PARAM_LIST.sub("?...", shape)
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest()[:16]
+
+
+class StatementCapture:
+    """Sentencias ejecutadas por cualquier Engine del proceso"""
+
+    def __init__(self):
+        self._statements = {}  # huella -> {"sql", "params", "calls"}
+        self._lock = threading.Lock()
+
+    def start(self):
+        event.listen(Engine, "before_cursor_execute", self._on_execute)
+
+    def stop(self):
+        event.remove(Engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().lower().startswith(_CAPTURED_VERBS):
+            return
+        if "pg_notify" in statement:
+            return
+        if executemany and parameters:
+            parameters = parameters[0]
+        key = fingerprint(statement)
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                self._statements[key] = {
+                    "sql": statement,
+                    "params": parameters,
+                    "calls": 1,
+                }
+            else:
+                entry["calls"] += 1
+
+    def statements(self):
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._statements.items()}
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for entry in self.statements().values():
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+
+def load_statements(path):
+    """Lee un archivo de captura; retorna {huella: {"sql", "params", "calls"}}"""
+    statements = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry["params"], list):
+                entry["params"] = tuple(entry["params"])
+            key = fingerprint(entry["sql"])
+            if key in statements:
+                statements[key]["calls"] += entry["calls"]
+            else:
+                statements[key] = entry
+    return statements
+
+
+@contextmanager
+def capture():
+    """`with capture() as captured:` registra las sentencias del bloque"""
+    captured = StatementCapture()
+    captured.start()
+    try:
+        yield captured
+    finally:
+        captured.stop()
+
+
+def capture_to_file(path):
+    """Captura hasta que termina el proceso y guarda en `path`"""
+    captured = StatementCapture()
+    captured.start()
+    atexit.register(captured.save, path)
+    return captured
+
+
+# -- análisis -----------------------------------------------------------------
+
+
+def explain(session, sql, params):
+    """Plan (dict de FORMAT JSON) de la sentencia ejecutada; siempre revierte"""
+    try:
+        result = (
+            session.connection()
+            .exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params or {}
+            )
+            .scalar()
+        )
+    finally:
+        session.rollback()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]
+
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _nodes(child)
+
+
+def table_sizes(session):
+    """{tabla: filas estimadas} de las tablas y particiones de public"""
+    rows = session.execute(
+        text(
+            "SELECT c.relname, GREATEST(c.reltuples, 0)::BIGINT AS filas "
+            "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')"
+        )
+    )
+    return {row.relname: row.filas for row in rows}
+
+
+def indexed_columns(session):
+    """{tabla: {columnas que encabezan algún índice}}"""
+    rows = session.execute(
+        text(
+            "SELECT t.relname AS tabla, a.attname AS columna "
+            "FROM pg_index i "
+            "JOIN pg_class t ON t.oid = i.indrelid "
+            "JOIN pg_namespace n ON n.oid = t.relnamespace "
+            "JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = i.indkey[0] "
+            "WHERE n.nspname = 'public'"
+        )
+    )
+    indexed = {}
+    for row in rows:
+        indexed.setdefault(row.tabla, set()).add(row.columna)
+    return indexed
+
+
+def missing_fk_indexes(session):
+    """[(tabla, columna)] de claves foráneas sin un índice que las encabece"""
+    rows = session.execute(
+        text(
+            "SELECT t.relname AS tabla, a.attname AS columna "
+            "FROM pg_constraint c "
+            "JOIN pg_class t ON t.oid = c.conrelid "
+            "JOIN pg_namespace n ON n.oid = t.relnamespace "
+            "JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = c.conkey[1] "
+            "WHERE c.contype = 'f' AND n.nspname = 'public' "
+            "AND NOT EXISTS ("
+            "    SELECT 1 FROM pg_index i "
+            "    WHERE i.indrelid = c.conrelid AND i.indkey[0] = c.conkey[1]"
+            ") "
+            "ORDER BY 1, 2"
+        )
+    )
+    return [(row.tabla, row.columna) for row in rows]
+
+
+def recommend_index(table, filter_text, indexed):
+    """Sentencias CREATE INDEX para las columnas filtradas sin índice"""
+    recommendations = []
+    for column, operator, any_ in _FILTER_TERM.findall(filter_text or ""):
+        if column in indexed.get(table, set()) and "~~" not in operator:
+            continue
+        if operator in ("<>", "!~~", "!~~*"):
+            continue
+        if "~~" in operator:
+            if not _LEADING_WILDCARD.search(filter_text):
+                continue
+            statement = (
+                f"CREATE INDEX ON {table} USING gin ({column} gin_trgm_ops);"
+                "  -- requiere pg_trgm"
+            )
+        else:
+            statement = f"CREATE INDEX ON {table} ({column});"
+        if statement not in recommendations:
+            recommendations.append(statement)
+    return recommendations
+
+
+def analyze(session, statements, min_rows=LARGE_TABLE_ROWS):
+    """Un resultado por sentencia capturada, ordenado por costo descendente"""
+    sizes = table_sizes(session)
+    indexed = indexed_columns(session)
+    results = []
+    for key, entry in statements.items():
+        result = {"fingerprint": key, "sql": entry["sql"], "calls": entry["calls"]}
+        try:
+            plan = explain(session, entry["sql"], entry["params"])
+        except Exception as e:
+            result["error"] = str(e).splitlines()[0]
+            results.append(result)
+            continue
+
+        root = plan["Plan"]
+        seq_scans, recommendations = [], []
+        for node in _nodes(root):
+            table = node.get("Relation Name")
+            if node["Node Type"] != "Seq Scan" or sizes.get(table, 0) < min_rows:
+                continue
+            seq_scans.append(
+                {"table": table, "rows": sizes[table], "filter": node.get("Filter")}
+            )
+            for statement in recommend_index(table, node.get("Filter"), indexed):
+                if statement not in recommendations:
+                    recommendations.append(statement)
+        result.update(
+            total_cost=root["Total Cost"],
+            execution_ms=plan.get("Execution Time"),
+            shared_hit=root.get("Shared Hit Blocks", 0),
+            shared_read=root.get("Shared Read Blocks", 0),
+            seq_scans=seq_scans,
+            recommendations=recommendations,
+        )
+        results.append(result)
+    results.sort(key=lambda r: r.get("total_cost", float("inf")), reverse=True)
+    return results
+
+
+def compare(results, baseline, tolerance=COST_TOLERANCE):
+    """[(huella, motivo)] de los planes que empeoraron respecto de la base"""
+    regressions = []
+    for result in results:
+        before = baseline.get(result["fingerprint"])
+        if before is None or "total_cost" not in result:
+            continue
+        limit = before["total_cost"] * (1 + tolerance)
+        if result["total_cost"] > limit:
+            regressions.append(
+                (
+                    result["fingerprint"],
+                    f"costo {before['total_cost']:.1f} -> {result['total_cost']:.1f}",
+                )
+            )
+        new_scans = {scan["table"] for scan in result["seq_scans"]} - set(
+            before.get("seq_scans", [])
+        )
+        if new_scans:
+            regressions.append(
+                (
+                    result["fingerprint"],
+                    f"escaneo secuencial nuevo en {', '.join(sorted(new_scans))}",
+                )
+            )
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    baseline = {
+        result["fingerprint"]: {
+            "sql": _SPACES.sub(" ", result["sql"]).strip(),
+            "total_cost": result["total_cost"],
+            "seq_scans": sorted({scan["table"] for scan in result["seq_scans"]}),
+        }
+        for result in results
+        if "total_cost" in result
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _print_report(results, fk_missing):
+    for result in results:
+        sql = _SPACES.sub(" ", result["sql"]).strip()
+        print(f"\n[{result['fingerprint']}] x{result['calls']}  {sql[:120]}")
+        if "error" in result:
+            print(f"  ERROR: {result['error']}")
+            continue
+        print(
+            f"  costo {result['total_cost']:.1f}, {result['execution_ms'] or 0:.2f} ms,"
+            f" buffers {result['shared_hit']} hit / {result['shared_read']} read"
+        )
+        for scan in result["seq_scans"]:
+            print(
+                f"  SEQ SCAN {scan['table']} (~{scan['rows']} filas): "
+                f"{scan['filter']}"
+            )
+        for statement in result["recommendations"]:
+            print(f"  recomendado: {statement}")
+    for table, column in fk_missing:
+        print(f"\nClave foránea sin índice: CREATE INDEX ON {table} ({column});")
+
+
+def _run_workload(module, argv):
+    """Ejecuta `python -m module argv...` dentro del proceso"""
+    saved_argv = sys.argv
+    sys.argv = [module] + argv
+    try:
+        runpy.run_module(module, run_name="__main__", alter_sys=True)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise
+    finally:
+        sys.argv = saved_argv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--run", metavar="MODULO", help="benchmark a ejecutar")
+    parser.add_argument(
+        "--statements",
+        action="append",
+        default=[],
+        metavar="ARCHIVO",
+        help="sentencias capturadas con ARCHIBOX_SQL_CAPTURE",
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="guarda los costos actuales como nueva línea base",
+    )
+    parser.add_argument("--tolerance", type=float, default=COST_TOLERANCE)
+    parser.add_argument("--min-rows", type=int, default=LARGE_TABLE_ROWS)
+    parser.add_argument("--report", metavar="ARCHIVO", help="resultado en JSON")
+    parser.add_argument("workload_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    statements = {}
+    for path in args.statements:
+        statements.update(load_statements(path))
+    if args.run:
+        workload_args = args.workload_args
+        if workload_args[:1] == ["--"]:
+            workload_args = workload_args[1:]
+        with capture() as captured:
+            _run_workload(args.run, workload_args)
+        statements.update(captured.statements())
+    if not statements:
+        parser.error("no hay sentencias: use --run o --statements")
+
+    session = Database().get_session()
+    try:
+        results = analyze(session, statements, args.min_rows)
+        fk_missing = missing_fk_indexes(session)
+    finally:
+        session.close()
+
+    _print_report(results, fk_missing)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nLínea base actualizada: {args.baseline}")
+        return
+
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    if regressions:
+        print("\nRegresiones de plan:")
+        for key, reason in regressions:
+            print(f"  [{key}] {reason}")
+        sys.exit(1)
+    print(f"\n{len(results)} sentencias revisadas, sin regresiones.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Caché LRU de resultados de búsqueda de CU17.
+
+La clave es la tupla normalizada (titulo, autor, isbn, categoria_id,
+estado_id). Las entradas se invalidan con los eventos del bus (ver
+db/event_bus.py) y solo las que el cambio realmente afecta:
+
+- Un evento con ids marca esos libros como pendientes. En la siguiente
+  consulta se releen todos juntos (una consulta por id, indexada) y se
+  descartan las entradas que contenían alguno de ellos o cuyos filtros
+  coinciden con los datos nuevos (el libro podría aparecer ahora).
+- Un evento sin ids (demasiados libros), un cambio de categorías/estados o
+  una reconexión vacían la caché.
+- Una búsqueda que empezó antes de cualquier evento no guarda su resultado,
+  aunque la caché estuviera vacía en ese momento.
+
+Solo se usa mientras el bus garantice que llegarán los avisos; los
+triggers de la migración 008 los emiten también para las escrituras que no
+pasan por publish() (servidor web).
+"""
+
+import threading
+from collections import OrderedDict
+
+from utils.isbn import normalize_isbn
+
+from db.event_bus import (
+    get_event_bus,
+    BOOK_STATE_CHANGED,
+    BOOKS_MODIFIED,
+    BOOKS_CREATED,
+    QA_REJECTED,
+    CATALOG_CHANGED,
+    RESYNC,
+)
+
+MAX_ENTRIES = 128
+
+# Eventos que traen los ids de los libros escritos
+BOOK_EVENTS = (BOOK_STATE_CHANGED, BOOKS_MODIFIED, BOOKS_CREATED, QA_REJECTED)
+
+
+def search_key(titulo="", autor="", isbn="", categoria_id=None, estado_id=None):
+    """
+    Clave normalizada: ILIKE no distingue mayúsculas, un ISBN completo se
+    reduce a su clave ISBN-13 y 0 equivale a None.
+    """
+    return (
+        (titulo or "").strip().lower(),
+        (autor or "").strip().lower(),
+        normalize_isbn(isbn) or (isbn or "").strip().lower(),
+        categoria_id or None,
+        estado_id or None,
+    )
+
+
+def row_matches(key, row):
+    """True si `row` (CatalogRow) cumple los filtros de `key`"""
+    titulo, autor, isbn, categoria_id, estado_id = key
+    if normalize_isbn(isbn) == isbn:
+        # Clave ISBN-13 completa: igualdad, como en la consulta
+        if normalize_isbn(row.isbn) != isbn:
+            return False
+        isbn = ""
+    for term, value in ((titulo, row.titulo), (autor, row.autor), (isbn, row.isbn)):
+        if term and term not in (value or "").lower():
+            return False
+    if categoria_id is not None and row.categoria_id != categoria_id:
+        return False
+    if estado_id is not None and row.estado_id != estado_id:
+        return False
+    return True
+
+
+class SearchResultCache:
+    """LRU acotado de (clave -> filas) con invalidación por eventos"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # clave -> (filas, ids)
+        self._pending_ids = set()
+        # Cambia con cada evento; una carga que empezó antes no se guarda
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, load, reload_ids):
+        """
+        Filas para `key`. `load()` ejecuta la búsqueda completa y
+        `reload_ids(ids)` relee solo esos libros para resolver los cambios
+        pendientes.
+        """
+        self._resolve_pending(reload_ids)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[0])
+            self.misses += 1
+            generation = self._generation
+
+        rows = load()
+        with self._lock:
+            # Si llegó un cambio mientras se cargaba, no se guarda
+            if generation == self._generation:
+                self._entries[key] = (tuple(rows), frozenset(row.id for row in rows))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return rows
+
+    def _resolve_pending(self, reload_ids):
+        with self._lock:
+            if not self._pending_ids or not self._entries:
+                self._pending_ids.clear()
+                return
+            ids = self._pending_ids
+            self._pending_ids = set()
+        rows = reload_ids(sorted(ids))
+        with self._lock:
+            stale = [
+                key
+                for key, (_, cached_ids) in self._entries.items()
+                if cached_ids & ids or any(row_matches(key, row) for row in rows)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def on_event(self, kind, data):
+        ids = data.get("ids") if kind in BOOK_EVENTS else None
+        with self._lock:
+            self._generation += 1
+            if ids:
+                self._pending_ids.update(int(book_id) for book_id in ids)
+            elif self._entries:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._pending_ids.clear()
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._pending_ids.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = None
+
+
+def get_search_cache():
+    """Caché compartida del proceso, suscrita al bus de eventos"""
+    global _cache
+    if _cache is None:
+        _cache = SearchResultCache()
+        bus = get_event_bus()
+        bus.subscribe(_cache.on_event, *BOOK_EVENTS, CATALOG_CHANGED, RESYNC)
+    return _cache
@@ -0,0 +1,248 @@
+"""
+Copia en disco de los datos de referencia para arrancar sin esperar al
+servidor.
+
+roles, categoria, estados_libro, accion y target_type casi no cambian, pero
+cada pantalla los consultaba al abrirse. La copia vive en
+get_cache_dir("warm")/referencia.json junto con un resumen (md5) de cada
+tabla: al iniciar se lee del disco y las pantallas la usan de inmediato,
+aunque el enlace sea lento.
+
+En segundo plano, SnapshotCheckThread pide al servidor solo los resúmenes
+(una consulta de unos cientos de bytes) y vuelve a leer únicamente las
+tablas que cambiaron. Si cambió algo se avisa por el bus local:
+CATALOG_CHANGED para categorías y estados, RESYNC para el resto, y las
+pantallas se recargan como con cualquier otro aviso.
+
+En el primer arranque (sin copia en disco) la primera consulta espera la
+carga completa.
+"""
+
+import json
+import os
+import threading
+from collections import namedtuple
+
+from PyQt5.QtCore import QCoreApplication, QThread, pyqtSignal
+from sqlalchemy import text
+from db.database import Database
+from db.event_bus import get_event_bus, CATALOG_CHANGED, RESYNC
+from utils.cache_paths import get_cache_dir
+
+# Subir este número descarta las copias guardadas (p. ej. si cambia TABLES)
+SNAPSHOT_VERSION = 1
+CHECK_INTERVAL_SECONDS = 300
+# Con el bus escuchando, CATALOG_CHANGED pide la revisión; el intervalo
+# queda solo como red de seguridad
+EVENT_CHECK_INTERVAL_SECONDS = 3600
+
+# tabla -> columnas copiadas
+TABLES = {
+    "roles": ("id", "nombre", "descripcion"),
+    "categoria": ("id", "nombre", "descripcion"),
+    "estados_libro": ("id", "nombre", "descripcion", "orden"),
+    "accion": ("id", "nombre", "descripcion"),
+    "target_type": ("id", "nombre"),
+}
+# Un cambio en estas tablas se anuncia con CATALOG_CHANGED; en las demás, RESYNC
+CATALOG_TABLES = ("categoria", "estados_libro")
+
+_ROW_TYPES = {table: namedtuple(table, columns) for table, columns in TABLES.items()}
+
+# Un md5 por tabla, calculado en el servidor sobre el texto de cada fila
+_DIGESTS_SQL = "SELECT " + ", ".join(
+    f"(SELECT md5(COALESCE(string_agg(t::text, '|' ORDER BY t.id), '')) "
+    f"FROM {table} AS t) AS {table}"
+    for table in TABLES
+)
+
+
+class ReferenceSnapshot:
+    """
+    Tablas de referencia en memoria y en disco. Las lecturas no toman el
+    lock: refresh() reemplaza el diccionario completo.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_cache_dir("warm"), "referencia.json")
+        self.tables = {}  # tabla -> [fila]
+        self.digests = {}  # tabla -> md5 del servidor
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"versión {data.get('version')}")
+            self.tables = {
+                table: [_ROW_TYPES[table](*row) for row in data["tables"][table]]
+                for table in TABLES
+                if table in data["tables"]
+            }
+            self.digests = {table: data["digests"][table] for table in self.tables}
+        except Exception as e:
+            print(f"ADVERTENCIA: Se descarta la copia local de referencia: {e}")
+            self.tables = {}
+            self.digests = {}
+
+    def _save(self):
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "digests": self.digests,
+            "tables": {
+                table: [list(row) for row in rows]
+                for table, rows in self.tables.items()
+            },
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def has(self, table):
+        return table in self.tables
+
+    def rows(self, table):
+        return list(self.tables.get(table, []))
+
+    def refresh(self, session):
+        """
+        Compara los resúmenes con el servidor y relee las tablas que
+        cambiaron. Retorna las que ya estaban en la copia y cambiaron (las
+        que faltaban no se mostraron desactualizadas).
+        """
+        with self._lock:
+            known = set(self.digests)
+            digests = dict(session.execute(text(_DIGESTS_SQL)).mappings().one())
+            changed = [
+                table for table in TABLES if digests[table] != self.digests.get(table)
+            ]
+            if changed:
+                tables = dict(self.tables)
+                for table in changed:
+                    result = session.execute(
+                        text(
+                            f"SELECT {', '.join(TABLES[table])} "
+                            f"FROM {table} ORDER BY id"
+                        )
+                    )
+                    tables[table] = [_ROW_TYPES[table](*row) for row in result]
+                self.tables = tables
+                self.digests = {table: digests[table] for table in tables}
+                try:
+                    self._save()
+                except OSError as e:
+                    print(
+                        f"ADVERTENCIA: No se pudo guardar la copia de referencia: {e}"
+                    )
+            return [table for table in changed if table in known]
+
+
+class SnapshotCheckThread(QThread):
+    """Revisa la copia al iniciar y luego periódicamente o con check_now()"""
+
+    checked = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(
+        self, snapshot, interval=CHECK_INTERVAL_SECONDS, bus=None, parent=None
+    ):
+        super().__init__(parent)
+        self.snapshot = snapshot
+        self.interval = interval
+        self.bus = bus
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def check_now(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            session = Database().get_session()
+            try:
+                self.checked.emit(self.snapshot.refresh(session))
+            except Exception as e:
+                session.rollback()
+                self.failed.emit(str(e))
+            finally:
+                session.close()
+            listening = self.bus is not None and self.bus.listening
+            self._wake.wait(
+                EVENT_CHECK_INTERVAL_SECONDS if listening else self.interval
+            )
+            self._wake.clear()
+
+
+_snapshot = None
+_check_thread = None
+
+
+def _report_check_failure(message):
+    print(f"ADVERTENCIA: Revisión de la copia de referencia: {message}")
+
+
+def _announce_changes(changed):
+    """Las pantallas se enteran igual que de un cambio hecho por otro cliente"""
+    if not changed:
+        return
+    bus = get_event_bus()
+    if any(table in CATALOG_TABLES for table in changed):
+        bus.deliver(CATALOG_CHANGED, {"tablas": changed})
+    if any(table not in CATALOG_TABLES for table in changed):
+        bus.deliver(RESYNC, {})
+
+
+def _on_catalog_event(_kind, _data):
+    if _check_thread is not None:
+        _check_thread.check_now()
+
+
+def get_reference_snapshot():
+    """
+    Copia compartida del proceso; la primera llamada (desde el hilo de UI)
+    la lee del disco e inicia la revisión en segundo plano.
+    """
+    global _snapshot, _check_thread
+    if _snapshot is None:
+        _snapshot = ReferenceSnapshot()
+        bus = get_event_bus()
+        _check_thread = SnapshotCheckThread(_snapshot, bus=bus)
+        _check_thread.checked.connect(_announce_changes)
+        _check_thread.failed.connect(_report_check_failure)
+        bus.subscribe(_on_catalog_event, CATALOG_CHANGED, RESYNC)
+        _check_thread.start()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_stop_check)
+    return _snapshot
+
+
+def _stop_check():
+    """Al salir: esperar a que termine la revisión en curso"""
+    _check_thread.stop()
+    _check_thread.wait()
+
+
+def reference_rows(session, table):
+    """
+    Filas de `table` desde la copia local; si todavía no hay copia, se
+    carga en este momento con `session`.
+    """
+    snapshot = get_reference_snapshot()
+    if not snapshot.has(table):
+        snapshot.refresh(session)
+    return snapshot.rows(table)
+
+
+def load_roles(session):
+    """Roles ordenados por nombre"""
+    return sorted(reference_rows(session, "roles"), key=lambda rol: rol.nombre.lower())
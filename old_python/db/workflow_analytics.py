@@ -0,0 +1,406 @@
+"""
+Análisis de cuellos de botella del flujo de trabajo a partir de `tareas`.
+
+Cada tarea terminada (CU02/CU03, revisiones de CU15/CU24) deja al libro en
+`estado_nuevo_id` al momento de `fecha_finalizacion`. Ordenadas por libro,
+dos tareas consecutivas delimitan el intervalo que el libro pasó en un
+estado; la última deja un intervalo abierto (el estado actual). Con eso:
+
+- stage_dwell(): tiempo de permanencia por estado (media, mediana, p90).
+- queue_depth(): libros en cada estado a lo largo del tiempo.
+- operator_cycle_times(): duración de las tareas de cada operador
+  (fecha_asignacion -> fecha_finalizacion).
+
+Las columnas de `tareas` se guardan como arreglos de NumPy en la caché
+local (tareas.npz) y toda la aritmética de intervalos es vectorizada. Cada
+refresh() lee solo las filas con `updated_at` posterior a la marca de agua
+(índice de la migración 006_tareas_analytics_watermark), más un margen por
+las transacciones que confirman tarde; una vez al día se recarga todo para
+descartar tareas eliminadas.
+
+Uso (desde old_python/):
+    python -m db.workflow_analytics --desde 2024-01-01 --paso 168
+"""
+
+import argparse
+import datetime
+import os
+import time
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from sqlalchemy import text
+from db.database import Database
+from db.models import EstadoLibro, Usuario
+from utils.cache_paths import get_cache_dir
+
+# Subir este número descarta las copias locales guardadas
+CACHE_VERSION = 1
+FETCH_CHUNK = 20000
+# Margen sobre la marca de agua: updated_at es la hora de inicio de la
+# transacción, que puede confirmar después de la lectura anterior
+WATERMARK_OVERLAP_SECONDS = 300
+FULL_RELOAD_SECONDS = 24 * 3600
+HOUR = 3600.0
+
+_COLUMNS = ("id", "libro_id", "usuario_id", "asignacion", "finalizacion", "estado")
+_TIMES = ("asignacion", "finalizacion")
+
+# Fechas como segundos desde 1970 (sin zona, igual que en la base de datos);
+# los NULL quedan como NaN o -1
+_SELECT = """
+    SELECT id,
+           COALESCE(libro_id, -1),
+           COALESCE(usuario_id, -1),
+           COALESCE(EXTRACT(EPOCH FROM fecha_asignacion)::float8, 'NaN'),
+           COALESCE(EXTRACT(EPOCH FROM fecha_finalizacion)::float8, 'NaN'),
+           COALESCE(estado_nuevo_id, -1),
+           COALESCE(EXTRACT(EPOCH FROM updated_at)::float8, 0)
+    FROM tareas
+"""
+
+StageDwell = namedtuple(
+    "StageDwell",
+    ["estado_id", "completed", "in_progress", "mean_h", "median_h", "p90_h"],
+)
+OperatorCycle = namedtuple(
+    "OperatorCycle", ["usuario_id", "tasks", "mean_h", "median_h", "p90_h"]
+)
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _empty_columns():
+    return {
+        name: np.array([], dtype=np.float64 if name in _TIMES else np.int64)
+        for name in _COLUMNS
+    }
+
+
+def to_seconds(value):
+    """datetime (sin zona) -> segundos desde 1970, como en las columnas"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return (value - _EPOCH).total_seconds()
+
+
+def from_seconds(seconds):
+    return _EPOCH + datetime.timedelta(seconds=float(seconds))
+
+
+def _order_by(keys, values):
+    """Como np.lexsort((values, keys)), pero con un solo ordenamiento estable"""
+    order = np.argsort(values)
+    return order[np.argsort(keys[order], kind="stable")]
+
+
+def _group_stats(keys, values):
+    """
+    Por cada clave distinta: (claves, cantidad, media, mediana, p90) de
+    `values`, sin recorrer los grupos en Python.
+    """
+    if len(keys) == 0:
+        empty = np.array([])
+        return empty.astype(np.int64), empty.astype(np.int64), empty, empty, empty
+    order = _order_by(keys, values)
+    keys, values = keys[order], values[order]
+    # Ya ordenadas: cada grupo empieza donde cambia la clave
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    groups = keys[starts]
+    counts = np.diff(np.append(starts, len(keys)))
+    means = np.add.reduceat(values, starts) / counts
+    medians = _quantile(values, starts, counts, 0.5)
+    p90 = _quantile(values, starts, counts, 0.9)
+    return groups, counts, means, medians, p90
+
+
+def _quantile(values, starts, counts, q):
+    """Cuantil `q` de cada grupo ordenado, interpolando como np.quantile"""
+    position = (counts - 1) * q
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, counts - 1)
+    fraction = position - low
+    return values[starts + low] * (1 - fraction) + values[starts + high] * fraction
+
+
+class WorkflowAnalytics:
+    """Copia columnar de `tareas` con actualización incremental"""
+
+    def __init__(self, path=None):
+        if np is None:
+            raise RuntimeError("NumPy no está instalado.")
+        self.path = path or os.path.join(get_cache_dir("analytics"), "tareas.npz")
+        self.columns = _empty_columns()
+        self.watermark = 0.0
+        self.loaded_at = 0.0
+        self._intervals = None
+        self._load_cache()
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+
+    def _load_cache(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                version, self.watermark, self.loaded_at = data["meta"]
+                if int(version) != CACHE_VERSION:
+                    raise ValueError(f"versión {int(version)}")
+                self.columns = {name: data[name] for name in _COLUMNS}
+        except Exception as e:
+            print(f"ADVERTENCIA: Se descarta la copia local de tareas: {e}")
+            self.columns = _empty_columns()
+            self.watermark = 0.0
+            self.loaded_at = 0.0
+
+    def _save_cache(self):
+        tmp_path = f"{self.path}.tmp"
+        meta = np.array([CACHE_VERSION, self.watermark, self.loaded_at])
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=meta, **self.columns)
+        os.replace(tmp_path, self.path)
+
+    def _fetch(self, session, where="", params=None):
+        """Columnas de las filas de `tareas` que cumplen `where`"""
+        result = session.execute(
+            text(f"{_SELECT} {where} ORDER BY id").execution_options(
+                stream_results=True
+            ),
+            params or {},
+        )
+        chunks = []
+        while True:
+            rows = result.fetchmany(FETCH_CHUNK)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.float64))
+        block = np.concatenate(chunks) if chunks else np.empty((0, 7))
+        columns = {
+            "id": block[:, 0].astype(np.int64),
+            "libro_id": block[:, 1].astype(np.int64),
+            "usuario_id": block[:, 2].astype(np.int64),
+            "asignacion": block[:, 3],
+            "finalizacion": block[:, 4],
+            "estado": block[:, 5].astype(np.int64),
+        }
+        return columns, block[:, 6]
+
+    def refresh(self, session, full=False):
+        """Trae lo nuevo desde la marca de agua; retorna las filas leídas"""
+        now = time.time()
+        full = full or now - self.loaded_at > FULL_RELOAD_SECONDS
+        if full:
+            columns, updated = self._fetch(session)
+            self.columns = columns
+            self.loaded_at = now
+        else:
+            columns, updated = self._fetch(
+                session,
+                "WHERE updated_at >= to_timestamp(:desde) AT TIME ZONE 'UTC'",
+                {"desde": self.watermark - WATERMARK_OVERLAP_SECONDS},
+            )
+            if len(columns["id"]):
+                # Las filas releídas reemplazan a su versión anterior
+                keep = ~np.isin(self.columns["id"], columns["id"])
+                merged = {
+                    name: np.concatenate([self.columns[name][keep], columns[name]])
+                    for name in _COLUMNS
+                }
+                order = np.argsort(merged["id"], kind="stable")
+                self.columns = {name: merged[name][order] for name in _COLUMNS}
+
+        if len(updated):
+            self.watermark = max(self.watermark, float(updated.max()))
+        if full or len(updated):
+            self._intervals = None
+            try:
+                self._save_cache()
+            except OSError as e:
+                print(f"ADVERTENCIA: No se pudo guardar la copia local de tareas: {e}")
+        return len(updated)
+
+    # ------------------------------------------------------------------
+    # Intervalos
+    # ------------------------------------------------------------------
+
+    def intervals(self):
+        """
+        (libro_id, estado, entrada, salida) de cada estancia, como arreglos.
+        Las estancias abiertas (estado actual del libro) tienen salida inf.
+        """
+        if self._intervals is None:
+            c = self.columns
+            done = ~np.isnan(c["finalizacion"]) & (c["estado"] >= 0)
+            libro = c["libro_id"][done]
+            fin = c["finalizacion"][done]
+            estado = c["estado"][done]
+            order = _order_by(libro, fin)
+            libro, fin, estado = libro[order], fin[order], estado[order]
+
+            salida = np.full(len(fin), np.inf)
+            same_book = libro[1:] == libro[:-1]
+            salida[:-1][same_book] = fin[1:][same_book]
+            self._intervals = (libro, estado, fin, salida)
+        return self._intervals
+
+    def stage_dwell(self, desde=None, hasta=None):
+        """
+        [StageDwell] por estado, con las estancias que terminaron en
+        [desde, hasta). `in_progress`: libros que siguen en el estado.
+        """
+        _libro, estado, entrada, salida = self.intervals()
+        closed = np.isfinite(salida)
+        window = closed.copy()
+        if desde is not None:
+            window &= salida >= to_seconds(desde)
+        if hasta is not None:
+            window &= salida < to_seconds(hasta)
+
+        groups, counts, means, medians, p90 = _group_stats(
+            estado[window], (salida - entrada)[window] / HOUR
+        )
+        open_states, open_counts = np.unique(estado[~closed], return_counts=True)
+        in_progress = dict(zip(open_states.tolist(), open_counts.tolist()))
+
+        stats = {
+            int(g): (int(n), float(m), float(md), float(p))
+            for g, n, m, md, p in zip(groups, counts, means, medians, p90)
+        }
+        stages = []
+        for estado_id in sorted(set(stats) | set(in_progress)):
+            completed, mean, median, p90 = stats.get(estado_id, (0, 0.0, 0.0, 0.0))
+            stages.append(
+                StageDwell(
+                    estado_id,
+                    completed,
+                    in_progress.get(estado_id, 0),
+                    mean,
+                    median,
+                    p90,
+                )
+            )
+        return stages
+
+    def queue_depth(self, desde, hasta, step_seconds=24 * HOUR):
+        """
+        (instantes, {estado_id: libros en el estado en cada instante}),
+        muestreado cada `step_seconds` entre `desde` y `hasta`.
+        """
+        _libro, estado, entrada, salida = self.intervals()
+        times = np.arange(to_seconds(desde), to_seconds(hasta), step_seconds)
+        depths = {}
+        for estado_id in np.unique(estado):
+            mask = estado == estado_id
+            entered = np.searchsorted(np.sort(entrada[mask]), times, side="right")
+            left = np.searchsorted(np.sort(salida[mask]), times, side="right")
+            depths[int(estado_id)] = entered - left
+        return times, depths
+
+    def operator_cycle_times(self, desde=None, hasta=None):
+        """[OperatorCycle] con las tareas terminadas en [desde, hasta)"""
+        c = self.columns
+        cycle = c["finalizacion"] - c["asignacion"]
+        mask = ~np.isnan(cycle) & (cycle >= 0) & (c["usuario_id"] >= 0)
+        if desde is not None:
+            mask &= c["finalizacion"] >= to_seconds(desde)
+        if hasta is not None:
+            mask &= c["finalizacion"] < to_seconds(hasta)
+        groups, counts, means, medians, p90 = _group_stats(
+            c["usuario_id"][mask], cycle[mask] / HOUR
+        )
+        return [
+            OperatorCycle(int(g), int(n), float(m), float(md), float(p))
+            for g, n, m, md, p in zip(groups, counts, means, medians, p90)
+        ]
+
+
+_analytics = None
+
+
+def get_workflow_analytics():
+    global _analytics
+    if _analytics is None:
+        _analytics = WorkflowAnalytics()
+    return _analytics
+
+
+def _names(session, model, label):
+    return {row.id: label(row) for row in session.query(model)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--desde", type=datetime.date.fromisoformat)
+    parser.add_argument(
+        "--hasta",
+        type=datetime.date.fromisoformat,
+        default=datetime.date.today() + datetime.timedelta(days=1),
+    )
+    parser.add_argument(
+        "--paso", type=float, default=24, help="horas entre muestras de la cola"
+    )
+    parser.add_argument(
+        "--completo", action="store_true", help="recargar todas las tareas"
+    )
+    args = parser.parse_args()
+
+    analytics = get_workflow_analytics()
+    session = Database().get_session()
+    try:
+        start = time.perf_counter()
+        read = analytics.refresh(session, full=args.completo)
+        print(f"{read} tareas leídas en {time.perf_counter() - start:.2f} s")
+        states = _names(session, EstadoLibro, lambda row: row.nombre)
+        users = _names(session, Usuario, lambda row: f"{row.nombres} {row.apellidos}")
+    finally:
+        session.close()
+
+    desde = args.desde
+    if desde is None:
+        finished = analytics.columns["finalizacion"]
+        finished = finished[~np.isnan(finished)]
+        if not len(finished):
+            print("No hay tareas terminadas.")
+            return
+        desde = from_seconds(finished.min()).date()
+
+    start = time.perf_counter()
+    dwell = analytics.stage_dwell(desde, args.hasta)
+    times, depths = analytics.queue_depth(desde, args.hasta, args.paso * HOUR)
+    cycles = analytics.operator_cycle_times(desde, args.hasta)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nPermanencia por estado ({desde} a {args.hasta}), en horas")
+    print(
+        f"{'Estado':<34}{'salidas':>9}{'actuales':>9}"
+        f"{'media':>9}{'mediana':>9}{'p90':>9}{'cola máx':>10}"
+    )
+    for stage in sorted(dwell, key=lambda s: -s.p90_h):
+        depth = depths.get(stage.estado_id)
+        peak = int(depth.max()) if depth is not None and len(depth) else 0
+        print(
+            f"{states.get(stage.estado_id, stage.estado_id)!s:<34}"
+            f"{stage.completed:>9}{stage.in_progress:>9}{stage.mean_h:>9.1f}"
+            f"{stage.median_h:>9.1f}{stage.p90_h:>9.1f}{peak:>10}"
+        )
+
+    print("\nDuración de tareas por operador, en horas")
+    print(f"{'Operador':<34}{'tareas':>9}{'media':>9}{'mediana':>9}{'p90':>9}")
+    for op in sorted(cycles, key=lambda o: -o.tasks):
+        print(
+            f"{users.get(op.usuario_id, op.usuario_id)!s:<34}{op.tasks:>9}"
+            f"{op.mean_h:>9.1f}{op.median_h:>9.1f}{op.p90_h:>9.1f}"
+        )
+    print(f"\n{len(times)} muestras de cola; cálculo en {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Pruebas de la caché de búsquedas de CU17 (db/search_cache.py).
+
+Desde old_python/:
+    python -m unittest discover tests
+"""
+
+import unittest
+from collections import namedtuple
+
+from db.event_bus import BOOKS_MODIFIED, CATALOG_CHANGED, RESYNC
+from db.search_cache import SearchResultCache, row_matches, search_key
+
+Row = namedtuple("Row", "id titulo autor isbn categoria_id estado_id")
+
+QUIJOTE = Row(1, "Don Quijote", "Cervantes", "978-84-376-0494-7", 2, 3)
+CELESTINA = Row(2, "La Celestina", "Fernando de Rojas", None, 2, 4)
+
+
+class SearchKeyTest(unittest.TestCase):
+    def test_normalizes_text_and_empty_filters(self):
+        self.assertEqual(
+            search_key(" Quijote ", "CERVANTES", "", 0, None),
+            ("quijote", "cervantes", "", None, None),
+        )
+
+    def test_full_isbn_becomes_isbn13_key(self):
+        self.assertEqual(
+            search_key(isbn="0-306-40615-2"), search_key(isbn="9780306406157")
+        )
+
+
+class RowMatchesTest(unittest.TestCase):
+    def test_text_filters_are_case_insensitive_substrings(self):
+        self.assertTrue(row_matches(search_key("quijote", "cerv"), QUIJOTE))
+        self.assertFalse(row_matches(search_key("celestina"), QUIJOTE))
+
+    def test_full_isbn_must_be_equal(self):
+        self.assertTrue(row_matches(search_key(isbn="978 84 376 0494 7"), QUIJOTE))
+        self.assertFalse(row_matches(search_key(isbn="0306406152"), QUIJOTE))
+        self.assertFalse(row_matches(search_key(isbn="9788437604947"), CELESTINA))
+
+    def test_partial_isbn_is_a_substring(self):
+        self.assertTrue(row_matches(search_key(isbn="0494"), QUIJOTE))
+        self.assertFalse(row_matches(search_key(isbn="0494"), CELESTINA))
+
+    def test_category_and_state(self):
+        self.assertTrue(row_matches(search_key(categoria_id=2, estado_id=3), QUIJOTE))
+        self.assertFalse(row_matches(search_key(categoria_id=1), QUIJOTE))
+        self.assertFalse(row_matches(search_key(estado_id=4), QUIJOTE))
+
+
+class SearchResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = SearchResultCache(max_entries=2)
+        self.books = {QUIJOTE.id: QUIJOTE, CELESTINA.id: CELESTINA}
+        self.loads = 0
+
+    def search(self, key):
+        def load():
+            self.loads += 1
+            return [row for row in self.books.values() if row_matches(key, row)]
+
+        return self.cache.get(key, load, self.reload_ids)
+
+    def reload_ids(self, ids):
+        return [self.books[book_id] for book_id in ids if book_id in self.books]
+
+    def test_second_lookup_is_a_hit(self):
+        key = search_key("quijote")
+        self.assertEqual(self.search(key), [QUIJOTE])
+        self.assertEqual(self.search(key), [QUIJOTE])
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        first, second, third = search_key("a"), search_key("b"), search_key("c")
+        self.search(first)
+        self.search(second)
+        self.search(first)
+        self.search(third)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.search(first)
+        self.assertEqual(self.loads, 3)
+        self.search(second)
+        self.assertEqual(self.loads, 4)
+
+    def test_event_drops_entries_that_contained_the_book(self):
+        key = search_key("quijote")
+        self.search(key)
+        self.books[QUIJOTE.id] = QUIJOTE._replace(titulo="El Quijote", estado_id=4)
+        self.cache.on_event(BOOKS_MODIFIED, {"ids": [QUIJOTE.id]})
+        self.assertEqual(self.search(key)[0].estado_id, 4)
+        self.assertEqual(self.loads, 2)
+
+    def test_event_drops_entries_the_book_now_matches(self):
+        key = search_key(estado_id=3)
+        self.assertEqual(self.search(key), [QUIJOTE])
+        self.books[CELESTINA.id] = CELESTINA._replace(estado_id=3)
+        self.cache.on_event(BOOKS_MODIFIED, {"ids": [CELESTINA.id]})
+        self.assertEqual(len(self.search(key)), 2)
+
+    def test_unaffected_entries_survive(self):
+        key = search_key("celestina")
+        self.search(key)
+        self.books[QUIJOTE.id] = QUIJOTE._replace(estado_id=4)
+        self.cache.on_event(BOOKS_MODIFIED, {"ids": [QUIJOTE.id]})
+        self.search(key)
+        self.assertEqual(self.loads, 1)
+
+    def test_events_without_ids_clear_everything(self):
+        for kind, data in (
+            (BOOKS_MODIFIED, {"ids": None}),
+            (CATALOG_CHANGED, {}),
+            (RESYNC, {}),
+        ):
+            key = search_key("quijote")
+            self.search(key)
+            loads = self.loads
+            self.cache.on_event(kind, data)
+            self.search(key)
+            self.assertEqual(self.loads, loads + 1, kind)
+
+    def test_result_loaded_during_a_change_is_not_stored(self):
+        key = search_key("quijote")
+
+        def load():
+            self.loads += 1
+            self.cache.on_event(BOOKS_MODIFIED, {"ids": [QUIJOTE.id]})
+            return [QUIJOTE]
+
+        self.cache.get(key, load, self.reload_ids)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_result_loaded_during_a_full_invalidation_is_not_stored(self):
+        key = search_key("quijote")
+
+        def load():
+            self.loads += 1
+            # Caché vacía: el evento no tiene entradas que borrar
+            self.cache.on_event(CATALOG_CHANGED, {})
+            return [QUIJOTE]
+
+        self.cache.get(key, load, self.reload_ids)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
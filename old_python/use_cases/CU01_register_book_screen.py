@@ -2,9 +2,12 @@ from PyQt5.QtWidgets import QWidget, QMessageBox
 from PyQt5.QtCore import pyqtSlot
 from ui.screens.ui_CU01_register_book_screen import Ui_register_book_screen
 from db.database import Database
-from db.models import Libro, EstadoLibro
+from db.models import Libro
+from db.hot_queries import state_by_name
 from datetime import datetime
 from utils.history_logger import write_to_historial
+from db.duplicate_detection import find_duplicate_candidates
+from db.event_bus import publish, BOOKS_CREATED
 import db.lookup_cache as lookup
 
 session = Database().get_session()
@@ -41,10 +44,13 @@ class RegisterBookScreen(QWidget):
             self._show_error("El número de páginas debe ser un número entero positivo.")
             return
 
+        # Advertir si el libro ya parece estar en el catálogo
+        candidatos = find_duplicate_candidates(session, titulo, autor, fecha)
+        if candidatos and not self._confirmar_duplicado(candidatos):
+            return
+
         # Buscar estado inicial
-        estado_inicial = (
-            session.query(EstadoLibro).filter_by(nombre="Registrado").first()
-        )
+        estado_inicial = state_by_name(session, "Registrado")
         if not estado_inicial:
             self._show_error("No se encontró el estado 'Registrado'.")
             return
@@ -61,18 +67,38 @@ class RegisterBookScreen(QWidget):
         )
 
         session.add(nuevo_libro)
+        session.flush()
+        publish(session, BOOKS_CREATED, ids=[nuevo_libro.id], usuario_id=self.user.id)
         session.commit()
-        new_book = session.query(Libro).filter_by(titulo=titulo).first()
+        # Por id: con títulos repetidos, buscar por título daría otro libro
         write_to_historial(
             inserted_usuario_id=self.user.id,
             inserted_accion_id=lookup.accion_crear.id,
             inserted_target_type_id=lookup.tt_libro.id,
-            inserted_target_id=new_book.id,
+            inserted_target_id=nuevo_libro.id,
         )
 
         QMessageBox.information(self, "✅ Éxito", "Libro registrado exitosamente.")
         self._clear_form()
 
+    def _confirmar_duplicado(self, candidatos):
+        """Muestra los posibles duplicados y pregunta si registrar igual"""
+        lineas = [
+            f"• [{c.id}] {c.titulo} — {c.autor}"
+            f" ({c.fecha.year if c.fecha else 's/f'}) — {c.score:.0%}"
+            for c in candidatos
+        ]
+        respuesta = QMessageBox.question(
+            self,
+            "Posible duplicado",
+            "Estos libros del catálogo se parecen al que intenta registrar:\n\n"
+            + "\n".join(lineas)
+            + "\n\n¿Desea registrarlo de todas formas?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No,
+        )
+        return respuesta == QMessageBox.Yes
+
     def _clear_form(self):
         self.ui.tituloInput.clear()
         self.ui.autorInput.clear()
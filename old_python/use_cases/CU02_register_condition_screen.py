@@ -2,8 +2,10 @@ from PyQt5.QtWidgets import QWidget, QMessageBox
 from PyQt5.QtCore import pyqtSlot, QDate
 from ui.screens.ui_CU02_register_condition_screen import Ui_register_condition_screen
 from db.database import Database
-from db.models import Libro, EstadoLibro, Tarea
+from db.models import EstadoLibro, Tarea
 from utils.history_logger import write_to_historial
+from db.hot_queries import get_book, state_by_name
+from db.event_bus import publish, BOOK_STATE_CHANGED
 import db.lookup_cache as lookup
 
 session = Database().get_session()
@@ -56,7 +58,7 @@ class RegisterConditionScreen(QWidget):
             return
 
         # Verificar libro y su estado
-        libro = session.query(Libro).get(libro_id)
+        libro = get_book(session, libro_id)
         if not libro:
             self.ui.mensajeLabel.setText("No se encontró un libro con ese ID.")
             return
@@ -70,13 +72,9 @@ class RegisterConditionScreen(QWidget):
 
         # Determinar nuevo estado según condición
         if condicion == "bueno":
-            nuevo_estado = (
-                session.query(EstadoLibro).filter_by(nombre="En digitalización").first()
-            )
+            nuevo_estado = state_by_name(session, "En digitalización")
         else:
-            nuevo_estado = (
-                session.query(EstadoLibro).filter_by(nombre="En restauración").first()
-            )
+            nuevo_estado = state_by_name(session, "En restauración")
 
         if not nuevo_estado:
             self.ui.mensajeLabel.setText("No se encontró el estado correspondiente.")
@@ -96,6 +94,13 @@ class RegisterConditionScreen(QWidget):
         )
 
         session.add(nueva_tarea)
+        publish(
+            session,
+            BOOK_STATE_CHANGED,
+            ids=[libro.id],
+            estado_id=nuevo_estado.id,
+            usuario_id=self.user.id,
+        )
         session.commit()
 
         QMessageBox.information(
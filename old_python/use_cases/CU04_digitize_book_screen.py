@@ -1,13 +1,31 @@
 import os
-from PyQt5.QtWidgets import QWidget, QMessageBox
+from PyQt5.QtWidgets import (
+    QWidget,
+    QMessageBox,
+    QCheckBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QVBoxLayout,
+)
 from ui.screens.ui_CU04_digitize_book_screen import Ui_digitize_book_screen
 from db.database import Database
 from db.models import Libro, EstadoLibro, Accion, TargetType
 from utils.history_logger import write_to_historial
+from db.hot_queries import get_book, state_by_name
 from utils.path_utils import get_books_path
+from utils.pdf_text_search import request_indexing
+from utils.pdf_store import StorePdfThread
+from utils.pdf_preview import build_preview_in_background
+from utils.scan_watcher import ScanFolderWatcher, ScanLinkWorker
+from db.local_replica import request_sync
+from db.event_bus import publish, BOOK_STATE_CHANGED, BOOKS_MODIFIED, QA_REJECTED
 
 
 class DigitizeBookScreen(QWidget):
+    # Eventos que dejan desactualizada la lista de libros (ver utils.screen_pool)
+    REFRESH_ON = (BOOK_STATE_CHANGED, BOOKS_MODIFIED, QA_REJECTED)
+
     def __init__(self, user):
         super().__init__()
         self.ui = Ui_digitize_book_screen()
@@ -20,6 +38,75 @@ class DigitizeBookScreen(QWidget):
         self.ui.save_button.clicked.connect(self.save_digitization)
         self.ui.book_combo.currentIndexChanged.connect(self.update_book_info)
 
+        self._watcher = None
+        self._link_worker = None
+        self._store_threads = []
+        self._build_auto_link()
+        self._load_eligible_books()
+
+    def _build_auto_link(self):
+        """Agrega la vinculación automática de PDFs dejados en la carpeta"""
+        self.auto_link_check = QCheckBox(
+            "Vincular automáticamente los PDFs que se copien a la carpeta de libros",
+            self,
+        )
+        self.auto_link_check.toggled.connect(self._toggle_auto_link)
+
+        self.scan_table = QTableWidget(0, 2, self)
+        self.scan_table.setHorizontalHeaderLabels(["Archivo", "Resultado"])
+        self.scan_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.scan_table.setEditTriggers(QTableWidget.NoEditTriggers)
+
+        layout = self.layout() or QVBoxLayout(self)
+        layout.addWidget(self.auto_link_check)
+        layout.addWidget(self.scan_table)
+
+    def _toggle_auto_link(self, enabled):
+        if enabled:
+            books_dir = os.path.dirname(get_books_path("scan.pdf"))
+            self._link_worker = ScanLinkWorker(self.user.id, parent=self)
+            self._link_worker.linked.connect(self._on_scans_linked)
+            self._link_worker.unmatched.connect(self._on_scans_unmatched)
+            self._link_worker.failed.connect(self._on_link_failed)
+            self._link_worker.start()
+            self._watcher = ScanFolderWatcher(books_dir, parent=self)
+            self._watcher.file_ready.connect(self._link_worker.submit)
+            self._link_worker.retry.connect(self._watcher.forget)
+            self._watcher.start()
+        else:
+            self._stop_auto_link()
+
+    def _stop_auto_link(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        if self._link_worker is not None:
+            self._link_worker.stop()
+            self._link_worker.wait()
+            self._link_worker = None
+
+    def _add_scan_row(self, filename, result):
+        row = self.scan_table.rowCount()
+        self.scan_table.insertRow(row)
+        self.scan_table.setItem(row, 0, QTableWidgetItem(filename))
+        self.scan_table.setItem(row, 1, QTableWidgetItem(result))
+        self.scan_table.scrollToBottom()
+
+    def _on_scans_linked(self, links):
+        for filename, book_id in links:
+            self._add_scan_row(filename, f"Digitalizado: libro {book_id}")
+        self._load_eligible_books()
+        request_indexing()
+        request_sync()
+
+    def _on_scans_unmatched(self, unmatched):
+        for filename, reason in unmatched:
+            self._add_scan_row(filename, f"Sin vincular: {reason}")
+
+    def _on_link_failed(self, message):
+        self._add_scan_row("-", f"Error al vincular el lote: {message}")
+
+    def _refresh_data(self):
         self._load_eligible_books()
 
     def _load_eligible_books(self):
@@ -54,7 +141,7 @@ class DigitizeBookScreen(QWidget):
     def update_book_info(self):
         book_id = self.ui.book_combo.currentData()
         if book_id != -1:
-            book = self.session.query(Libro).get(book_id)
+            book = get_book(self.session, book_id)
             if book:
                 self.ui.title_display.setText(book.titulo)
                 self.ui.author_display.setText(book.autor)
@@ -94,10 +181,10 @@ class DigitizeBookScreen(QWidget):
                 )
                 return
 
-            book = self.session.query(Libro).get(book_id)
-            new_state = (
-                self.session.query(EstadoLibro).filter_by(nombre="Digitalizado").one()
-            )
+            book = get_book(self.session, book_id)
+            new_state = state_by_name(self.session, "Digitalizado")
+            if new_state is None:
+                raise LookupError("No se encontró el estado 'Digitalizado'.")
 
             book.directorio_pdf = pdf_filename
             book.estado_id = new_state.id
@@ -114,7 +201,17 @@ class DigitizeBookScreen(QWidget):
             else:
                 print("ADVERTENCIA: No se pudo registrar en el historial.")
 
+            publish(
+                self.session,
+                BOOK_STATE_CHANGED,
+                ids=[book.id],
+                estado_id=book.estado_id,
+                usuario_id=self.user.id,
+            )
             self.session.commit()
+            # Se guarda en el almacén (deduplicado) en segundo plano; al
+            # terminar queda buscable en CU17/CU22
+            self._store_in_background(pdf_path, pdf_filename)
 
             QMessageBox.information(
                 self,
@@ -131,6 +228,20 @@ class DigitizeBookScreen(QWidget):
                 self, "Error", f"Ocurrió un error al guardar la digitalización:\n{e}"
             )
 
+    def _store_in_background(self, pdf_path, pdf_filename):
+        thread = StorePdfThread(pdf_path, pdf_filename, parent=self)
+        thread.stored.connect(self._on_pdf_stored)
+        thread.finished.connect(lambda: self._store_threads.remove(thread))
+        self._store_threads.append(thread)
+        thread.start()
+
+    def _on_pdf_stored(self, pdf_filename):
+        build_preview_in_background(pdf_filename)
+        request_indexing()
+
     def closeEvent(self, event):
+        self._stop_auto_link()
+        for thread in list(self._store_threads):
+            thread.wait()
         self.session.close()
         super().closeEvent(event)
@@ -1,12 +1,41 @@
-from PyQt5.QtWidgets import QWidget, QMessageBox
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QWidget,
+    QMessageBox,
+    QListWidget,
+    QListWidgetItem,
+    QAbstractItemView,
+    QPushButton,
+    QLabel,
+    QHBoxLayout,
+    QVBoxLayout,
+)
 from ui.screens.ui_CU05_classify_book_screen import Ui_classify_book_screen
 from db.database import Database
-from db.models import Libro, EstadoLibro, Categoria
+from db.models import Libro, Categoria
 from utils.history_logger import write_to_historial
+from db.hot_queries import get_book, state_by_name
+from db.bulk_updates import bulk_classify_books
+from db import category_suggestions
+from db.catalog_search import load_categories
+from db.warm_cache import reference_rows
+from db.event_bus import (
+    publish,
+    BOOK_STATE_CHANGED,
+    BOOKS_MODIFIED,
+    QA_REJECTED,
+    CATALOG_CHANGED,
+)
 import db.lookup_cache as lookup
 
+# Estados desde los que un libro se puede clasificar
+ELIGIBLE_STATES = ["Aprobado por control de calidad", "Digitalizado"]
+
 
 class ClassifyBookScreen(QWidget):
+    # Eventos que dejan desactualizados los combos (ver utils.screen_pool)
+    REFRESH_ON = (BOOK_STATE_CHANGED, BOOKS_MODIFIED, QA_REJECTED, CATALOG_CHANGED)
+
     def __init__(self, user):
         super().__init__()
         self.ui = Ui_classify_book_screen()
@@ -15,10 +44,98 @@ class ClassifyBookScreen(QWidget):
         self.user = user
         self.db = Database()
         self.session = self.db.get_session()
+        self._suggestions = {}  # libro_id -> [Suggestion]
+        self._suggestion_thread = None
+        # Todas las que siguen corriendo; solo la última entrega su resultado
+        self._suggestion_threads = []
 
         self.ui.save_button.clicked.connect(self.save_classification)
         self.ui.book_combo.currentIndexChanged.connect(self.update_book_info)
+        self._build_batch_widgets()
+        self._build_suggestions()
+
+        self._load_eligible_books()
+        self._load_categories()
+
+    def _build_batch_widgets(self):
+        """Agrega la lista para clasificar varios libros a la vez"""
+        layout = self.layout() or QVBoxLayout(self)
+
+        layout.addWidget(QLabel("Clasificación en lote (Ctrl/Shift para varios):"))
+        self.books_list = QListWidget(self)
+        self.books_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.books_list.itemSelectionChanged.connect(self._update_batch_status)
+        layout.addWidget(self.books_list)
+
+        self.batch_button = QPushButton("Clasificar seleccionados", self)
+        self.batch_button.clicked.connect(self.save_batch_classification)
+        layout.addWidget(self.batch_button)
+
+        self.batch_status = QLabel(self)
+        layout.addWidget(self.batch_status)
+
+    def _build_suggestions(self):
+        """Botones con las categorías sugeridas; un clic elige la categoría"""
+        row = QHBoxLayout()
+        self.suggestions_label = QLabel("Sugerencias:", self)
+        row.addWidget(self.suggestions_label)
+        self.suggestion_buttons = []
+        for _ in range(category_suggestions.TOP_SUGGESTIONS):
+            button = QPushButton(self)
+            button.clicked.connect(lambda _checked, b=button: self._apply_suggestion(b))
+            row.addWidget(button)
+            self.suggestion_buttons.append(button)
+        row.addStretch()
+        (self.layout() or QVBoxLayout(self)).addLayout(row)
+        self._show_suggestions([])
+
+    def _load_suggestions(self, book_ids):
+        """Puntúa todos los libros pendientes en segundo plano"""
+        self._suggestions = {}
+        if not category_suggestions.available() or not book_ids:
+            return
+        if self._suggestion_thread is not None:
+            # Su resultado ya no corresponde a la lista
+            self._suggestion_thread.ready.disconnect()
+        thread = category_suggestions.SuggestionThread(book_ids, parent=self)
+        thread.ready.connect(self._on_suggestions_ready)
+        thread.failed.connect(
+            lambda message: print(f"ADVERTENCIA: Sugerencias de categoría: {message}")
+        )
+        thread.finished.connect(lambda: self._suggestion_threads.remove(thread))
+        self._suggestion_threads.append(thread)
+        self._suggestion_thread = thread
+        thread.start()
+
+    def _on_suggestions_ready(self, suggestions):
+        self._suggestions = suggestions
+        selected = [item.data(Qt.UserRole) for item in self.books_list.selectedItems()]
+        if selected:
+            self._show_suggestions(selected)
+        else:
+            self._show_suggestions([self.ui.book_combo.currentData()])
 
+    def _show_suggestions(self, book_ids):
+        """Sugerencias del libro elegido o, en lote, las comunes a la selección"""
+        suggestions = category_suggestions.combine(self._suggestions, book_ids)
+        self.suggestions_label.setVisible(bool(suggestions))
+        for index, button in enumerate(self.suggestion_buttons):
+            if index < len(suggestions):
+                categoria_id, score = suggestions[index]
+                combo_index = self.ui.category_combo.findData(categoria_id)
+                name = self.ui.category_combo.itemText(combo_index)
+                button.setText(f"{name} ({score:.0%})")
+                button.setProperty("categoria_id", categoria_id)
+                button.setVisible(combo_index >= 0)
+            else:
+                button.setVisible(False)
+
+    def _apply_suggestion(self, button):
+        index = self.ui.category_combo.findData(button.property("categoria_id"))
+        if index >= 0:
+            self.ui.category_combo.setCurrentIndex(index)
+
+    def _refresh_data(self):
         self._load_eligible_books()
         self._load_categories()
 
@@ -26,23 +143,13 @@ class ClassifyBookScreen(QWidget):
         """Carga libros que están listos para clasificación"""
         self.ui.book_combo.clear()
         self.ui.book_combo.addItem("Seleccione un libro...", -1)
+        self.books_list.clear()
 
         try:
-            # Libros en estado "Aprobado por control de calidad" o "Digitalizado"
-            eligible_states = (
-                self.session.query(EstadoLibro)
-                .filter(
-                    EstadoLibro.nombre.in_(
-                        ["Aprobado por control de calidad", "Digitalizado"]
-                    )
-                )
-                .all()
-            )
-
-            if not eligible_states:
+            eligible_state_ids = self._eligible_state_ids()
+            if not eligible_state_ids:
                 return
 
-            eligible_state_ids = [state.id for state in eligible_states]
             books = (
                 self.session.query(Libro)
                 .filter(Libro.estado_id.in_(eligible_state_ids))
@@ -51,12 +158,49 @@ class ClassifyBookScreen(QWidget):
             )
 
             for book in books:
-                self.ui.book_combo.addItem(f"{book.titulo} (ID: {book.id})", book.id)
+                label = f"{book.titulo} (ID: {book.id})"
+                self.ui.book_combo.addItem(label, book.id)
+                item = QListWidgetItem(label)
+                item.setData(Qt.UserRole, book.id)
+                self.books_list.addItem(item)
         except Exception as e:
             print(f"Error al cargar libros para clasificar: {e}")
             QMessageBox.warning(
                 self, "Error", f"No se pudieron cargar los libros: {str(e)}"
             )
+        self._update_batch_status()
+        self._load_suggestions(
+            [
+                self.books_list.item(row).data(Qt.UserRole)
+                for row in range(self.books_list.count())
+            ]
+        )
+
+    def _eligible_state_ids(self):
+        """Ids de los estados de ELIGIBLE_STATES"""
+        states = reference_rows(self.session, "estados_libro")
+        return [state.id for state in states if state.nombre in ELIGIBLE_STATES]
+
+    def _remove_books(self, book_ids):
+        """Quita de la vista los libros ya clasificados, sin recargarla"""
+        book_ids = set(book_ids)
+        for row in reversed(range(self.books_list.count())):
+            if self.books_list.item(row).data(Qt.UserRole) in book_ids:
+                self.books_list.takeItem(row)
+        for index in reversed(range(self.ui.book_combo.count())):
+            if self.ui.book_combo.itemData(index) in book_ids:
+                self.ui.book_combo.removeItem(index)
+        for book_id in book_ids:
+            self._suggestions.pop(book_id, None)
+        self._update_batch_status()
+
+    def _update_batch_status(self):
+        selected = [item.data(Qt.UserRole) for item in self.books_list.selectedItems()]
+        self.batch_status.setText(
+            f"{len(selected)} de {self.books_list.count()} libro(s) seleccionados."
+        )
+        if selected:
+            self._show_suggestions(selected)
 
     def _load_categories(self):
         """Carga todas las categorías disponibles"""
@@ -64,9 +208,8 @@ class ClassifyBookScreen(QWidget):
         self.ui.category_combo.addItem("Seleccione una categoría...", -1)
 
         try:
-            categories = self.session.query(Categoria).order_by(Categoria.nombre).all()
-            for category in categories:
-                self.ui.category_combo.addItem(category.nombre, category.id)
+            for category_id, nombre in load_categories(self.session):
+                self.ui.category_combo.addItem(nombre, category_id)
         except Exception as e:
             print(f"Error al cargar categorías: {e}")
             QMessageBox.warning(
@@ -76,8 +219,9 @@ class ClassifyBookScreen(QWidget):
     def update_book_info(self):
         """Actualiza la información mostrada cuando se selecciona un libro"""
         book_id = self.ui.book_combo.currentData()
+        self._show_suggestions([book_id])
         if book_id != -1:
-            book = self.session.query(Libro).get(book_id)
+            book = get_book(self.session, book_id)
             if book:
                 self.ui.title_display.setText(book.titulo)
                 self.ui.author_display.setText(book.autor)
@@ -119,7 +263,7 @@ class ClassifyBookScreen(QWidget):
             return
 
         try:
-            book = self.session.query(Libro).get(book_id)
+            book = get_book(self.session, book_id)
             if not book:
                 QMessageBox.warning(self, "Error", "El libro seleccionado no existe.")
                 return
@@ -129,11 +273,7 @@ class ClassifyBookScreen(QWidget):
 
             # Cambiar estado a "Clasificado" si no lo está
             if book.estado.nombre != "Clasificado":
-                new_state = (
-                    self.session.query(EstadoLibro)
-                    .filter_by(nombre="Clasificado")
-                    .first()
-                )
+                new_state = state_by_name(self.session, "Clasificado")
                 if new_state:
                     book.estado_id = new_state.id
 
@@ -145,6 +285,13 @@ class ClassifyBookScreen(QWidget):
                 inserted_target_id=book.id,
             )
 
+            publish(
+                self.session,
+                BOOK_STATE_CHANGED,
+                ids=[book.id],
+                estado_id=book.estado_id,
+                usuario_id=self.user.id,
+            )
             self.session.commit()
 
             QMessageBox.information(
@@ -153,9 +300,8 @@ class ClassifyBookScreen(QWidget):
                 f"El libro '{book.titulo}' ha sido clasificado exitosamente.",
             )
 
-            # Actualizar la lista de libros
-            self._load_eligible_books()
-            self.update_book_info()
+            # Ya no está pendiente de clasificar
+            self._remove_books([book.id])
 
         except Exception as e:
             self.session.rollback()
@@ -165,7 +311,60 @@ class ClassifyBookScreen(QWidget):
                 f"Ocurrió un error al guardar la clasificación:\n{str(e)}",
             )
 
+    def save_batch_classification(self):
+        """Clasifica todos los libros seleccionados en la lista con un UPDATE"""
+        book_ids = [item.data(Qt.UserRole) for item in self.books_list.selectedItems()]
+        category_id = self.ui.category_combo.currentData()
+
+        if not book_ids:
+            QMessageBox.warning(
+                self, "Selección Requerida", "Por favor, seleccione al menos un libro."
+            )
+            return
+
+        if category_id == -1:
+            QMessageBox.warning(
+                self, "Selección Requerida", "Por favor, seleccione una categoría."
+            )
+            return
+
+        try:
+            classified = state_by_name(self.session, "Clasificado")
+            if not classified:
+                QMessageBox.critical(
+                    self, "Error", "No se encontró el estado 'Clasificado'."
+                )
+                return
+
+            updated_ids = bulk_classify_books(
+                self.session,
+                self.user.id,
+                book_ids,
+                category_id,
+                classified.id,
+                self._eligible_state_ids(),
+            )
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Ocurrió un error al guardar la clasificación:\n{str(e)}",
+            )
+            return
+
+        # Los que otro operador movió mientras tanto tampoco son elegibles
+        self._remove_books(book_ids)
+        skipped = len(book_ids) - len(updated_ids)
+        message = f"{len(updated_ids)} libro(s) clasificados exitosamente."
+        if skipped:
+            message += f"\n{skipped} libro(s) ya no estaban pendientes de clasificar."
+        QMessageBox.information(self, "Éxito", message)
+
     def closeEvent(self, event):
         """Cierra la sesión de base de datos al cerrar la ventana"""
+        for thread in list(self._suggestion_threads):
+            thread.wait()
         self.session.close()
         super().closeEvent(event)
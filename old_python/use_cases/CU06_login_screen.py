@@ -1,10 +1,9 @@
 from PyQt5.QtWidgets import QWidget
 from ui.screens.ui_CU06_login_screen import Ui_login_screen
-from PyQt5.QtGui import QPixmap
 from db.database import Database
-from db.models import Usuario
-from utils.path_utils import get_asset_path
-from PyQt5.QtGui import QIcon
+from db.hot_queries import user_by_email
+from db.warm_cache import get_reference_snapshot
+from utils.asset_cache import load_icon, load_pixmap
 
 
 class LoginScreen(QWidget):
@@ -16,10 +15,10 @@ class LoginScreen(QWidget):
         self.ui.access.clicked.connect(self.handle_login)
         self.on_login_success = on_login_success  # callback to launch main window
 
-        self.setWindowIcon(
-            QIcon(get_asset_path("ArchiBox_alpha_icon.png"))
-        )  # or "app_icon.ico"
+        self.setWindowIcon(load_icon("ArchiBox_alpha_icon.png"))  # or "app_icon.ico"
         self._load_banner()
+        # Lee la copia de referencia y la revisa mientras el usuario escribe
+        get_reference_snapshot()
 
     def handle_login(self):
         email = self.ui.email_in.text()
@@ -30,11 +29,7 @@ class LoginScreen(QWidget):
             return
 
         session = Database().get_session()
-        user = (
-            session.query(Usuario)
-            .filter_by(correo_electronico=email, estado=True)
-            .first()
-        )
+        user = user_by_email(session, email)
 
         if user and user.verify_password(password):
             self.ui.err_display.setText("")
@@ -51,8 +46,7 @@ class LoginScreen(QWidget):
         )
 
     def _load_banner(self):
-        # pixmap = QPixmap("assets/ArchiBox_login_Banner.png")
-        pixmap = QPixmap(get_asset_path("ArchiBox_login_Banner.png"))
+        pixmap = load_pixmap("ArchiBox_login_Banner.png")
         self.ui.bannerLabel.setPixmap(pixmap)
         self.ui.bannerLabel.setScaledContents(
             True
@@ -1,15 +1,123 @@
-from PyQt5.QtWidgets import QWidget
+import datetime
+
+from PyQt5.QtWidgets import (
+    QWidget,
+    QMessageBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QCheckBox,
+    QLabel,
+    QVBoxLayout,
+    QAbstractItemView,
+)
 from ui.screens.ui_CU07_query_book_history_screen import Ui_query_book_history_screen
+from db.database import Database
+from db.models import Usuario
+from db.catalog_search import search_books
+from db.historial_archive import query_history, recent_history
+from db.warm_cache import reference_rows
+import db.lookup_cache as lookup
+
+# Días que cubre la consulta rápida (solo particiones recientes)
+RECENT_DAYS = 30
 
 
 class QueryBookHistoryScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user=None):
         super().__init__()
         self.ui = Ui_query_book_history_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.db = Database()
+        self.session = self.db.get_session()
+
+        self._build_history_view()
         self.ui.saveButton.clicked.connect(self.save_entry)
+        self.ui.titleInput.returnPressed.connect(self.save_entry)
+
+    def _build_history_view(self):
+        """Agrega la tabla del historial de los libros encontrados"""
+        self.ui.titleInput.setPlaceholderText("Título, autor o ISBN del libro")
+        layout = self.layout() or QVBoxLayout(self)
+
+        # Sin marcar se consulta todo, incluidos los meses archivados
+        self.recent_check = QCheckBox(f"Solo los últimos {RECENT_DAYS} días", self)
+        self.recent_check.setChecked(True)
+        layout.addWidget(self.recent_check)
+
+        self.history_table = QTableWidget(0, 4, self)
+        self.history_table.setHorizontalHeaderLabels(
+            ["Fecha", "Libro", "Acción", "Usuario"]
+        )
+        self.history_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.history_table)
+
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
 
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving query book history screen: {value}")
+        """Busca los libros y muestra su historial, del más reciente al más antiguo"""
+        term = self.ui.titleInput.text().strip()
+        if not term:
+            return
+        try:
+            books = {
+                book.id: book.titulo
+                for book in search_books(self.session, any_text=term)
+            }
+            # Una sola consulta (y una pasada por los archivos) para todos
+            filters = {"target_type_id": lookup.tt_libro.id, "target_id": list(books)}
+            if not books:
+                rows = []
+            elif self.recent_check.isChecked():
+                rows = recent_history(self.session, RECENT_DAYS, **filters)
+            else:
+                rows = query_history(
+                    self.session,
+                    datetime.datetime.min,
+                    datetime.datetime.now() + datetime.timedelta(seconds=1),
+                    include_archived=True,
+                    **filters,
+                )
+            self._show_history(rows, books)
+        except Exception as e:
+            self.session.rollback()
+            QMessageBox.critical(
+                self, "Error", f"No se pudo consultar el historial:\n{str(e)}"
+            )
+
+    def _show_history(self, rows, books):
+        actions = {
+            accion.id: accion.nombre
+            for accion in reference_rows(self.session, "accion")
+        }
+        user_ids = {row.usuario_id for row in rows if row.usuario_id}
+        users = {
+            usuario.id: f"{usuario.nombres} {usuario.apellidos}"
+            for usuario in self.session.query(Usuario).filter(Usuario.id.in_(user_ids))
+        }
+
+        self.history_table.setRowCount(len(rows))
+        for index, row in enumerate(rows):
+            values = [
+                row.fecha.strftime("%Y-%m-%d %H:%M"),
+                books.get(row.target_id, str(row.target_id)),
+                actions.get(row.accion_id, ""),
+                users.get(row.usuario_id, ""),
+            ]
+            for column, value in enumerate(values):
+                self.history_table.setItem(index, column, QTableWidgetItem(value))
+        self.history_table.resizeColumnsToContents()
+
+        if not books:
+            self.status_label.setText("No se encontraron libros.")
+        else:
+            self.status_label.setText(
+                f"{len(rows)} registro(s) de {len(books)} libro(s)."
+            )
+
+    def closeEvent(self, event):
+        """Cierra la sesión de base de datos al cerrar la ventana"""
+        self.session.close()
+        super().closeEvent(event)
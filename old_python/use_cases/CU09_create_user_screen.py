@@ -2,7 +2,10 @@ from PyQt5.QtWidgets import QWidget, QMessageBox
 from PyQt5.QtCore import pyqtSlot
 from ui.screens.ui_CU09_create_user_screen import Ui_create_user_screen
 from db.database import Database
-from db.models import Usuario, Rol
+from db.models import Usuario
+from db.hot_queries import user_by_email
+from db.warm_cache import load_roles
+from db.event_bus import publish, USERS_CHANGED
 from utils.password_hashing import hash_password
 from utils.history_logger import write_to_historial
 import db.lookup_cache as lookup
@@ -12,6 +15,10 @@ session = Database().get_session()
 
 
 class CreateUserScreen(QWidget):
+    # Los roles no cambian desde la aplicación; se recargan solo al
+    # resincronizar (ver utils.screen_pool)
+    REFRESH_ON = ()
+
     def __init__(self, user=None):
         super().__init__()
         self.user = user
@@ -21,8 +28,11 @@ class CreateUserScreen(QWidget):
         self._load_roles()
         self.ui.saveButton.clicked.connect(self.create_user)
 
+    def _refresh_data(self):
+        self._load_roles()
+
     def _load_roles(self):
-        self.roles = session.query(Rol).all()
+        self.roles = load_roles(session)
         self.ui.rolComboBox.clear()
         for rol in self.roles:
             self.ui.rolComboBox.addItem(rol.nombre, rol.id)
@@ -49,7 +59,7 @@ class CreateUserScreen(QWidget):
             )
             return
 
-        if session.query(Usuario).filter_by(correo_electronico=correo).first():
+        if user_by_email(session, correo, active_only=False):
             self._show_error("Ya existe un usuario con ese correo electrónico.")
             return
 
@@ -64,15 +74,14 @@ class CreateUserScreen(QWidget):
         )
 
         session.add(nuevo_usuario)
+        session.flush()
+        # CU19 (y cualquier pantalla con la lista de usuarios) se recarga
+        publish(session, USERS_CHANGED, ids=[nuevo_usuario.id], usuario_id=self.user.id)
         session.commit()
 
         print("Usuario creado exitosamente.")
 
-        new_user = (
-            session.query(Usuario)
-            .filter_by(correo_electronico=correo, estado=True)
-            .first()
-        )
+        new_user = user_by_email(session, correo)
         write_to_historial(
             inserted_usuario_id=self.user.id,
             inserted_accion_id=lookup.accion_crear.id,
@@ -1,15 +1,154 @@
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtWidgets import (
+    QWidget,
+    QMessageBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QComboBox,
+    QLabel,
+    QFormLayout,
+    QVBoxLayout,
+    QAbstractItemView,
+)
 from ui.screens.ui_CU10_edit_user_screen import Ui_edit_user_screen
+from db.database import Database
+from db.models import Usuario
+from db.bulk_updates import bulk_update_users
+from db.warm_cache import load_roles
 
 
 class EditUserScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user=None, user_ids=None):
         super().__init__()
         self.ui = Ui_edit_user_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.user_ids = list(user_ids or [])
+        self.db = Database()
+        self.session = self.db.get_session()
+
+        self._build_bulk_widgets()
         self.ui.saveButton.clicked.connect(self.save_entry)
 
+        self._load_roles()
+        self.load_users(self.user_ids)
+
+    def _build_bulk_widgets(self):
+        """Agrega la tabla de usuarios seleccionados y los campos a modificar"""
+        # El campo de texto del formulario base no aplica a la edición en lote
+        self.ui.titleInput.hide()
+
+        layout = self.layout() or QVBoxLayout(self)
+
+        self.users_table = QTableWidget(0, 5, self)
+        self.users_table.setHorizontalHeaderLabels(
+            ["Nombres", "Apellidos", "Correo", "Rol", "Estado"]
+        )
+        self.users_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.users_table.setSelectionMode(QAbstractItemView.NoSelection)
+        layout.addWidget(self.users_table)
+
+        form = QFormLayout()
+        self.rol_combo = QComboBox(self)
+        self.estado_combo = QComboBox(self)
+        form.addRow("Nuevo rol:", self.rol_combo)
+        form.addRow("Nuevo estado:", self.estado_combo)
+        layout.addLayout(form)
+
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
+
+    def _load_roles(self):
+        """Carga las opciones de rol y estado; 'Sin cambios' no modifica la columna"""
+        self.rol_combo.clear()
+        self.rol_combo.addItem("Sin cambios", None)
+        try:
+            for rol in load_roles(self.session):
+                self.rol_combo.addItem(rol.nombre, rol.id)
+        except Exception as e:
+            print(f"Error al cargar roles: {e}")
+
+        self.estado_combo.clear()
+        self.estado_combo.addItem("Sin cambios", None)
+        self.estado_combo.addItem("Activo", True)
+        self.estado_combo.addItem("Inactivo", False)
+
+    def load_users(self, user_ids):
+        """Muestra los usuarios seleccionados en CU18 (una sola consulta)"""
+        self.user_ids = list(user_ids)
+        self.users_table.setRowCount(0)
+        if not self.user_ids:
+            self.status_label.setText("No hay usuarios seleccionados.")
+            return
+
+        usuarios = (
+            self.session.query(Usuario)
+            .filter(Usuario.id.in_(self.user_ids))
+            .order_by(Usuario.apellidos, Usuario.nombres)
+            .all()
+        )
+
+        self.users_table.setRowCount(len(usuarios))
+        for row, usuario in enumerate(usuarios):
+            rol_nombre = usuario.rol.nombre if usuario.rol else "N/A"
+            estado_texto = "Activo" if usuario.estado else "Inactivo"
+            self.users_table.setItem(row, 0, QTableWidgetItem(usuario.nombres))
+            self.users_table.setItem(row, 1, QTableWidgetItem(usuario.apellidos))
+            self.users_table.setItem(
+                row, 2, QTableWidgetItem(usuario.correo_electronico)
+            )
+            self.users_table.setItem(row, 3, QTableWidgetItem(rol_nombre))
+            self.users_table.setItem(row, 4, QTableWidgetItem(estado_texto))
+
+        self.status_label.setText(f"{len(usuarios)} usuario(s) seleccionados.")
+
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving edit user screen: {value}")
+        """Aplica los cambios a todos los usuarios seleccionados en un solo UPDATE"""
+        if not self.user_ids:
+            QMessageBox.warning(
+                self, "Selección Requerida", "No hay usuarios seleccionados."
+            )
+            return
+
+        values = {}
+        rol_id = self.rol_combo.currentData()
+        estado = self.estado_combo.currentData()
+        if rol_id is not None:
+            values["rol_id"] = rol_id
+        if estado is not None:
+            values["estado"] = estado
+
+        if not values:
+            QMessageBox.warning(
+                self, "Sin Cambios", "Seleccione al menos un campo a modificar."
+            )
+            return
+
+        if estado is False and self.user and self.user.id in self.user_ids:
+            QMessageBox.warning(
+                self, "Operación no permitida", "No puede desactivar su propia cuenta."
+            )
+            return
+
+        try:
+            updated_ids = bulk_update_users(
+                self.session, self.user.id, self.user_ids, values
+            )
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            QMessageBox.critical(
+                self, "Error", f"Ocurrió un error al editar los usuarios:\n{e}"
+            )
+            return
+
+        QMessageBox.information(
+            self, "Éxito", f"{len(updated_ids)} usuario(s) actualizados exitosamente."
+        )
+        self.rol_combo.setCurrentIndex(0)
+        self.estado_combo.setCurrentIndex(0)
+        self.load_users(self.user_ids)
+
+    def closeEvent(self, event):
+        self.session.close()
+        super().closeEvent(event)
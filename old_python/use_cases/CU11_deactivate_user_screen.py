@@ -1,15 +1,118 @@
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtWidgets import (
+    QWidget,
+    QMessageBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QLabel,
+    QVBoxLayout,
+    QAbstractItemView,
+)
 from ui.screens.ui_CU11_deactivate_user_screen import Ui_deactivate_user_screen
+from db.database import Database
+from db.models import Usuario
+from db.bulk_updates import bulk_deactivate_users
 
 
 class DeactivateUserScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user=None, user_ids=None):
         super().__init__()
         self.ui = Ui_deactivate_user_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.user_ids = list(user_ids or [])
+        self.db = Database()
+        self.session = self.db.get_session()
+
+        self._build_bulk_widgets()
         self.ui.saveButton.clicked.connect(self.save_entry)
 
+        self.load_users(self.user_ids)
+
+    def _build_bulk_widgets(self):
+        """Agrega la tabla con los usuarios que se van a desactivar"""
+        self.ui.titleInput.hide()
+
+        layout = self.layout() or QVBoxLayout(self)
+
+        self.users_table = QTableWidget(0, 3, self)
+        self.users_table.setHorizontalHeaderLabels(["Nombres", "Apellidos", "Correo"])
+        self.users_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.users_table.setSelectionMode(QAbstractItemView.NoSelection)
+        layout.addWidget(self.users_table)
+
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
+
+    def load_users(self, user_ids):
+        """Muestra solo los usuarios seleccionados que siguen activos"""
+        self.users_table.setRowCount(0)
+        ids = list(user_ids)
+        if not ids:
+            self.user_ids = []
+            self.status_label.setText("No hay usuarios seleccionados.")
+            return
+
+        usuarios = (
+            self.session.query(Usuario)
+            .filter(Usuario.id.in_(ids), Usuario.estado.is_(True))
+            .order_by(Usuario.apellidos, Usuario.nombres)
+            .all()
+        )
+        self.user_ids = [usuario.id for usuario in usuarios]
+
+        self.users_table.setRowCount(len(usuarios))
+        for row, usuario in enumerate(usuarios):
+            self.users_table.setItem(row, 0, QTableWidgetItem(usuario.nombres))
+            self.users_table.setItem(row, 1, QTableWidgetItem(usuario.apellidos))
+            self.users_table.setItem(
+                row, 2, QTableWidgetItem(usuario.correo_electronico)
+            )
+
+        self.status_label.setText(f"{len(usuarios)} usuario(s) activos por desactivar.")
+
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving deactivate user screen: {value}")
+        """Desactiva todos los usuarios listados en una sola transacción"""
+        if not self.user_ids:
+            QMessageBox.warning(
+                self, "Selección Requerida", "No hay usuarios activos seleccionados."
+            )
+            return
+
+        if self.user and self.user.id in self.user_ids:
+            QMessageBox.warning(
+                self, "Operación no permitida", "No puede desactivar su propia cuenta."
+            )
+            return
+
+        confirm = QMessageBox.question(
+            self,
+            "Confirmar desactivación",
+            f"¿Desactivar {len(self.user_ids)} usuario(s)?",
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        if confirm != QMessageBox.Yes:
+            return
+
+        try:
+            deactivated_ids = bulk_deactivate_users(
+                self.session, self.user.id, self.user_ids
+            )
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            QMessageBox.critical(
+                self, "Error", f"Ocurrió un error al desactivar los usuarios:\n{e}"
+            )
+            return
+
+        QMessageBox.information(
+            self,
+            "Éxito",
+            f"{len(deactivated_ids)} usuario(s) desactivados exitosamente.",
+        )
+        self.load_users(self.user_ids)
+
+    def closeEvent(self, event):
+        self.session.close()
+        super().closeEvent(event)
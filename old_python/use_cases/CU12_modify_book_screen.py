@@ -1,15 +1,250 @@
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtWidgets import (
+    QWidget,
+    QMessageBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QPushButton,
+    QLabel,
+    QHBoxLayout,
+    QVBoxLayout,
+    QAbstractItemView,
+)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QBrush, QColor
 from ui.screens.ui_CU12_modify_book_screen import Ui_modify_book_screen
+from db.database import Database
+from db.models import Libro
+from db.bulk_updates import bulk_update_books
+from db.local_replica import request_sync
+
+# (encabezado, columna de `libros`); la columna None es de solo lectura
+GRID_COLUMNS = [
+    ("ID", None),
+    ("Título", "titulo"),
+    ("Autor", "autor"),
+    ("ISBN", "isbn"),
+    ("Páginas", "numero_paginas"),
+    ("Estantería", "estanteria"),
+    ("Espacio", "espacio"),
+]
+REQUIRED_COLUMNS = ("titulo", "autor")
+DIRTY_BRUSH = QBrush(QColor("#fff3b0"))
 
 
 class ModifyBookScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user=None, book_ids=None):
         super().__init__()
         self.ui = Ui_modify_book_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.db = Database()
+        self.session = self.db.get_session()
+
+        # Valores cargados desde la BD y celdas modificadas por el usuario
+        self._original = {}  # {(libro_id, columna): valor}
+        self._dirty = {}  # {libro_id: {columna: valor}}
+
+        self._build_grid()
         self.ui.saveButton.clicked.connect(self.save_entry)
 
+        if book_ids:
+            self.load_books(Libro.id.in_(list(book_ids)))
+
+    def _build_grid(self):
+        """Agrega la grilla editable y los controles de búsqueda/descarte"""
+        self.ui.titleInput.setPlaceholderText("Buscar por título, autor o estantería")
+        self.ui.titleInput.returnPressed.connect(self.search_books)
+
+        layout = self.layout() or QVBoxLayout(self)
+
+        self.grid = QTableWidget(0, len(GRID_COLUMNS), self)
+        self.grid.setHorizontalHeaderLabels([header for header, _ in GRID_COLUMNS])
+        self.grid.setSelectionBehavior(QAbstractItemView.SelectItems)
+        self.grid.itemChanged.connect(self._on_item_changed)
+        layout.addWidget(self.grid)
+
+        controls = QHBoxLayout()
+        self.search_button = QPushButton("Buscar", self)
+        self.discard_button = QPushButton("Descartar cambios", self)
+        self.status_label = QLabel(self)
+        self.search_button.clicked.connect(self.search_books)
+        self.discard_button.clicked.connect(self.discard_changes)
+        controls.addWidget(self.search_button)
+        controls.addWidget(self.discard_button)
+        controls.addStretch()
+        controls.addWidget(self.status_label)
+        layout.addLayout(controls)
+
+    def search_books(self):
+        """Carga en la grilla los libros que coinciden con el texto buscado"""
+        term = self.ui.titleInput.text().strip()
+        if not term:
+            QMessageBox.warning(
+                self, "Búsqueda Requerida", "Ingrese un texto para buscar."
+            )
+            return
+
+        pattern = f"%{term}%"
+        self.load_books(
+            Libro.titulo.ilike(pattern)
+            | Libro.autor.ilike(pattern)
+            | Libro.estanteria.ilike(pattern)
+        )
+
+    def load_books(self, criterion):
+        """Rellena la grilla; pide confirmación si hay cambios sin guardar"""
+        if self._dirty and not self._confirm_discard():
+            return
+
+        books = (
+            self.session.query(Libro)
+            .filter(criterion)
+            .order_by(Libro.estanteria, Libro.espacio, Libro.titulo)
+            .all()
+        )
+
+        self._original.clear()
+        self._dirty.clear()
+
+        self.grid.blockSignals(True)
+        self.grid.setRowCount(len(books))
+        for row, book in enumerate(books):
+            for col, (_, field) in enumerate(GRID_COLUMNS):
+                value = book.id if field is None else getattr(book, field)
+                item = QTableWidgetItem("" if value is None else str(value))
+                item.setData(Qt.UserRole, book.id)
+                if field is None:
+                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                else:
+                    self._original[(book.id, field)] = value
+                self.grid.setItem(row, col, item)
+        self.grid.blockSignals(False)
+
+        self._update_status()
+
+    def _on_item_changed(self, item):
+        """Registra solo las celdas cuyo valor difiere del original"""
+        field = GRID_COLUMNS[item.column()][1]
+        if field is None:
+            return
+
+        book_id = item.data(Qt.UserRole)
+        original = self._original.get((book_id, field))
+
+        try:
+            value = self._parse_value(field, item.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Valor inválido", str(e))
+            current = self._dirty.get(book_id, {}).get(field, original)
+            self._set_item_text(item, current)
+            return
+
+        changes = self._dirty.setdefault(book_id, {})
+        if value == original:
+            changes.pop(field, None)
+            if not changes:
+                del self._dirty[book_id]
+            item.setBackground(QBrush())
+        else:
+            changes[field] = value
+            item.setBackground(DIRTY_BRUSH)
+
+        self._update_status()
+
+    def _parse_value(self, field, raw):
+        text_value = raw.strip()
+        if field == "numero_paginas":
+            if not text_value:
+                return None
+            if not text_value.isdigit() or int(text_value) <= 0:
+                raise ValueError(
+                    "El número de páginas debe ser un número entero positivo."
+                )
+            return int(text_value)
+        if field in REQUIRED_COLUMNS and not text_value:
+            raise ValueError("El título y el autor no pueden quedar vacíos.")
+        return text_value or None
+
+    def _set_item_text(self, item, value):
+        self.grid.blockSignals(True)
+        item.setText("" if value is None else str(value))
+        self.grid.blockSignals(False)
+
+    def _dirty_cell_count(self):
+        return sum(len(changes) for changes in self._dirty.values())
+
+    def _update_status(self):
+        self.status_label.setText(
+            f"{self.grid.rowCount()} libro(s) — "
+            f"{self._dirty_cell_count()} celda(s) modificadas"
+        )
+
+    def _confirm_discard(self):
+        answer = QMessageBox.question(
+            self,
+            "Cambios sin guardar",
+            "Hay cambios sin guardar. ¿Desea descartarlos?",
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        return answer == QMessageBox.Yes
+
+    def discard_changes(self):
+        """Restaura los valores originales de las celdas modificadas"""
+        self.grid.blockSignals(True)
+        for row in range(self.grid.rowCount()):
+            for col, (_, field) in enumerate(GRID_COLUMNS):
+                item = self.grid.item(row, col)
+                if field is None or item is None:
+                    continue
+                book_id = item.data(Qt.UserRole)
+                if field in self._dirty.get(book_id, {}):
+                    original = self._original[(book_id, field)]
+                    item.setText("" if original is None else str(original))
+                    item.setBackground(QBrush())
+        self.grid.blockSignals(False)
+        self._dirty.clear()
+        self._update_status()
+
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving modify book screen: {value}")
+        """Guarda todas las celdas modificadas en una sola transacción"""
+        if not self._dirty:
+            QMessageBox.information(self, "Sin Cambios", "No hay cambios por guardar.")
+            return
+
+        try:
+            updated_ids = bulk_update_books(self.session, self.user.id, self._dirty)
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            QMessageBox.critical(
+                self, "Error", f"Ocurrió un error al guardar los cambios:\n{e}"
+            )
+            return
+        request_sync()
+
+        # Los valores guardados pasan a ser los nuevos originales
+        for book_id, changes in self._dirty.items():
+            for field, value in changes.items():
+                self._original[(book_id, field)] = value
+        self._dirty.clear()
+
+        self.grid.blockSignals(True)
+        for row in range(self.grid.rowCount()):
+            for col in range(len(GRID_COLUMNS)):
+                item = self.grid.item(row, col)
+                if item is not None:
+                    item.setBackground(QBrush())
+        self.grid.blockSignals(False)
+        self._update_status()
+
+        QMessageBox.information(
+            self, "Éxito", f"{len(updated_ids)} libro(s) actualizados exitosamente."
+        )
+
+    def closeEvent(self, event):
+        if self._dirty and not self._confirm_discard():
+            event.ignore()
+            return
+        self.session.close()
+        super().closeEvent(event)
@@ -1,15 +1,131 @@
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtWidgets import (
+    QWidget,
+    QMessageBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QLabel,
+    QVBoxLayout,
+    QAbstractItemView,
+)
 from ui.screens.ui_CU13_deactivate_book_screen import Ui_deactivate_book_screen
+from db.database import Database
+from db.models import Libro
+from db.hot_queries import state_by_name
+from db.bulk_updates import bulk_set_book_state
+from db.local_replica import request_sync
 
 
 class DeactivateBookScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user=None, book_ids=None):
         super().__init__()
         self.ui = Ui_deactivate_book_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.book_ids = []
+        self.db = Database()
+        self.session = self.db.get_session()
+
+        self._build_bulk_widgets()
         self.ui.saveButton.clicked.connect(self.save_entry)
 
+        self.load_books(book_ids or [])
+
+    def _build_bulk_widgets(self):
+        """Agrega la tabla con los libros que se van a desactivar"""
+        self.ui.titleInput.setPlaceholderText("IDs de libros separados por coma")
+        self.ui.titleInput.returnPressed.connect(self._load_typed_ids)
+
+        layout = self.layout() or QVBoxLayout(self)
+
+        self.books_table = QTableWidget(0, 4, self)
+        self.books_table.setHorizontalHeaderLabels(["ID", "Título", "Autor", "Estado"])
+        self.books_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.books_table.setSelectionMode(QAbstractItemView.NoSelection)
+        layout.addWidget(self.books_table)
+
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
+
+    def _load_typed_ids(self):
+        raw = self.ui.titleInput.text()
+        try:
+            parts = raw.replace(";", ",").split(",")
+            ids = [int(part) for part in parts if part.strip()]
+        except ValueError:
+            self.status_label.setText("Los IDs deben ser números separados por coma.")
+            return
+        self.load_books(ids)
+
+    def _inactive_state(self):
+        return state_by_name(self.session, "Inactivo")
+
+    def load_books(self, book_ids):
+        """Muestra los libros seleccionados que aún no están inactivos"""
+        self.books_table.setRowCount(0)
+        ids = list(book_ids)
+        if not ids:
+            self.book_ids = []
+            self.status_label.setText("No hay libros seleccionados.")
+            return
+
+        query = self.session.query(Libro).filter(Libro.id.in_(ids))
+        inactive = self._inactive_state()
+        if inactive:
+            query = query.filter(Libro.estado_id != inactive.id)
+        books = query.order_by(Libro.titulo).all()
+        self.book_ids = [book.id for book in books]
+
+        self.books_table.setRowCount(len(books))
+        for row, book in enumerate(books):
+            estado_nombre = book.estado.nombre if book.estado else "N/A"
+            self.books_table.setItem(row, 0, QTableWidgetItem(str(book.id)))
+            self.books_table.setItem(row, 1, QTableWidgetItem(book.titulo))
+            self.books_table.setItem(row, 2, QTableWidgetItem(book.autor))
+            self.books_table.setItem(row, 3, QTableWidgetItem(estado_nombre))
+
+        self.status_label.setText(f"{len(books)} libro(s) por desactivar.")
+
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving deactivate book screen: {value}")
+        """Pasa todos los libros listados a 'Inactivo' en una sola transacción"""
+        if not self.book_ids:
+            QMessageBox.warning(
+                self, "Selección Requerida", "No hay libros seleccionados."
+            )
+            return
+
+        inactive = self._inactive_state()
+        if not inactive:
+            QMessageBox.critical(self, "Error", "No se encontró el estado 'Inactivo'.")
+            return
+
+        confirm = QMessageBox.question(
+            self,
+            "Confirmar desactivación",
+            f"¿Desactivar {len(self.book_ids)} libro(s)?",
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        if confirm != QMessageBox.Yes:
+            return
+
+        try:
+            updated_ids = bulk_set_book_state(
+                self.session, self.user.id, self.book_ids, inactive.id
+            )
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            QMessageBox.critical(
+                self, "Error", f"Ocurrió un error al desactivar los libros:\n{e}"
+            )
+            return
+        request_sync()
+
+        QMessageBox.information(
+            self, "Éxito", f"{len(updated_ids)} libro(s) desactivados exitosamente."
+        )
+        self.load_books(self.book_ids)
+
+    def closeEvent(self, event):
+        self.session.close()
+        super().closeEvent(event)
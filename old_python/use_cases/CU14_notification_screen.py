@@ -1,15 +1,101 @@
-from PyQt5.QtWidgets import QWidget
+from datetime import datetime
+
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QWidget, QListWidget, QListWidgetItem, QVBoxLayout
 from ui.screens.ui_CU14_notification_screen import Ui_notification_screen
+from db.database import Database
+from db.catalog_search import load_states
+from db.event_bus import (
+    get_event_bus,
+    BOOK_STATE_CHANGED,
+    BOOKS_MODIFIED,
+    TASK_ASSIGNED,
+    QA_REJECTED,
+    CATALOG_CHANGED,
+)
+
+# Notificaciones que se conservan en pantalla
+MAX_NOTIFICATIONS = 200
+
+
+def _books_text(ids):
+    if not ids:
+        return "varios libros"
+    if len(ids) == 1:
+        return f"el libro {ids[0]}"
+    return f"{len(ids)} libros"
 
 
 class NotificationScreen(QWidget):
-    def __init__(self):
+    """
+    Muestra los eventos del flujo de trabajo a medida que llegan por el bus,
+    sin consultar la base de datos. Las tareas asignadas al usuario actual se
+    destacan en negrita.
+    """
+
+    def __init__(self, user=None):
         super().__init__()
         self.ui = Ui_notification_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.db = Database()
+        self.session = self.db.get_session()
+        self._state_names = dict(load_states(self.session))
+
+        self.notifications_list = QListWidget(self)
+        (self.layout() or QVBoxLayout(self)).addWidget(self.notifications_list)
+
+        self.ui.titleInput.hide()
+        self.ui.saveButton.setText("Limpiar")
         self.ui.saveButton.clicked.connect(self.save_entry)
 
+        self.bus = get_event_bus()
+        self.bus.subscribe(
+            self._on_event,
+            BOOK_STATE_CHANGED,
+            BOOKS_MODIFIED,
+            TASK_ASSIGNED,
+            QA_REJECTED,
+            CATALOG_CHANGED,
+        )
+
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving notification screen: {value}")
+        """Limpia las notificaciones leídas"""
+        self.notifications_list.clear()
+
+    def _describe(self, kind, data):
+        """Retorna (texto, destacado) para un evento"""
+        state = self._state_names.get(data.get("estado_id"), "otro estado")
+        books = _books_text(data.get("ids"))
+        if kind == TASK_ASSIGNED:
+            mine = self.user is not None and data.get("usuario_id") == self.user.id
+            title = data.get("titulo") or f"libro {data.get('libro_id')}"
+            who = "a usted" if mine else f"al usuario {data.get('usuario_id')}"
+            return f"Nueva tarea sobre '{title}' asignada {who}", mine
+        if kind == QA_REJECTED:
+            return f"Control de calidad rechazó {books} (vuelve a '{state}')", False
+        if kind == BOOK_STATE_CHANGED:
+            ids = data.get("ids")
+            verb = "pasó" if ids and len(ids) == 1 else "pasaron"
+            return f"{books.capitalize()} {verb} a '{state}'", False
+        if kind == BOOKS_MODIFIED:
+            return f"Se modificaron los datos de {books}", False
+        self._state_names = dict(load_states(self.session))
+        return "Se actualizaron las categorías o estados del catálogo", False
+
+    def _on_event(self, kind, data):
+        text, highlighted = self._describe(kind, data)
+        item = QListWidgetItem(f"{datetime.now():%H:%M:%S}  {text}")
+        if highlighted:
+            font = QFont()
+            font.setBold(True)
+            item.setFont(font)
+        self.notifications_list.insertItem(0, item)
+        while self.notifications_list.count() > MAX_NOTIFICATIONS:
+            self.notifications_list.takeItem(self.notifications_list.count() - 1)
+
+    def closeEvent(self, event):
+        self.bus.unsubscribe(self._on_event)
+        self.session.close()
+        super().closeEvent(event)
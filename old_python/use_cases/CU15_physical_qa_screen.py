@@ -1,15 +1,67 @@
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtWidgets import QWidget, QMessageBox, QVBoxLayout
 from ui.screens.ui_CU15_physical_qa_screen import Ui_physical_qa_screen
+from db.database import Database
+from utils.review_queue import ReviewQueuePanel, review_state_ids
+
+# Estados del flujo de revisión física
+SOURCE_STATE = "Restaurado"
+APPROVE_STATE = "En digitalización"
+REJECT_STATE = "En restauración"
 
 
 class PhysicalQaScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user):
         super().__init__()
         self.ui = Ui_physical_qa_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.db = Database()
+        self.session = self.db.get_session()
+        self.review_panel = None
+
+        self.ui.titleInput.hide()
+        self.ui.saveButton.setText("Iniciar revisión")
         self.ui.saveButton.clicked.connect(self.save_entry)
 
+    def _load_states(self):
+        """Retorna los ids de los estados de origen, aprobación y rechazo"""
+        return review_state_ids(self.session, SOURCE_STATE, APPROVE_STATE, REJECT_STATE)
+
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving physical qa screen: {value}")
+        """Inicia el modo de revisión rápida"""
+        if self.review_panel is not None:
+            self.review_panel.setFocus()
+            return
+        if self.user is None:
+            # Las decisiones se guardan a nombre del usuario
+            QMessageBox.warning(
+                self, "Sin usuario", "Inicie sesión para registrar revisiones."
+            )
+            return
+
+        try:
+            source_id, approve_id, reject_id = self._load_states()
+        except LookupError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        self.review_panel = ReviewQueuePanel(
+            self.user,
+            source_id,
+            approve_id,
+            reject_id,
+            with_pdf=False,
+            observation_prefix="Control de calidad físico",
+            parent=self,
+        )
+        (self.layout() or QVBoxLayout(self)).addWidget(self.review_panel)
+        self.ui.saveButton.setEnabled(False)
+        self.review_panel.start()
+        self.review_panel.setFocus()
+
+    def closeEvent(self, event):
+        if self.review_panel is not None:
+            self.review_panel.stop()
+        self.session.close()
+        super().closeEvent(event)
@@ -1,20 +1,51 @@
-from PyQt5.QtWidgets import QWidget, QTableWidgetItem
-from sqlalchemy import text
+from PyQt5.QtWidgets import (
+    QWidget,
+    QTableWidgetItem,
+    QPushButton,
+    QLabel,
+    QLineEdit,
+    QHBoxLayout,
+    QVBoxLayout,
+    QMessageBox,
+    QAbstractItemView,
+)
+from PyQt5.QtGui import QIcon
 from ui.screens.ui_CU17_search_books_screen import Ui_search_books_screen
 from db.database import Database
-from db.models import Libro, EstadoLibro
+from db import catalog_search
+from db.event_bus import CATALOG_CHANGED
+from db.hot_queries import book_export_query
+from use_cases.CU12_modify_book_screen import ModifyBookScreen
+from use_cases.CU13_deactivate_book_screen import DeactivateBookScreen
+from utils.cover_cache import cover_service, THUMB_SMALL
+from utils.pdf_text_search import search_pdf_text, format_pages
+from utils.result_export import start_export
+
+PAGES_COLUMN = 6
 
 
 class SearchBooksScreen(QWidget):
-    def __init__(self):
+    # Eventos que dejan desactualizados los combos (ver utils.screen_pool)
+    REFRESH_ON = (CATALOG_CHANGED,)
+
+    def __init__(self, user=None):
         super().__init__()
         self.ui = Ui_search_books_screen()
         self.ui.setupUi(self)
 
+        self.user = user
         self.db = Database()
         self.session = self.db.get_session()
+        self._bulk_window = None
+        self._export_thread = None
+        self.covers = cover_service()
+        self._title_items_by_cover = {}  # directorio_img -> [QTableWidgetItem]
+        self.covers.cover_ready.connect(self._on_cover_ready)
 
         self.ui.search_button.clicked.connect(self.search_books)
+        self._build_content_search()
+        self._build_bulk_actions()
+        self._build_export_action()
 
         try:
             self._load_combos()
@@ -22,66 +53,164 @@ class SearchBooksScreen(QWidget):
             # Este error ya no debería ocurrir con el código corregido
             print(f"ADVERTENCIA (CU17): No se pudieron cargar los combos. Error: {e}")
 
+    def _build_content_search(self):
+        """Agrega el filtro por texto dentro del PDF y la columna de páginas"""
+        self.content_input = QLineEdit(self)
+        self.content_input.setPlaceholderText(
+            "Palabras dentro del PDF (se admite prefijo: restaur*)"
+        )
+        self.content_input.returnPressed.connect(self.search_books)
+
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Texto en el PDF:", self))
+        row.addWidget(self.content_input, 1)
+        (self.layout() or QVBoxLayout(self)).addLayout(row)
+
+        self.ui.results_table.setColumnCount(PAGES_COLUMN + 1)
+        self.ui.results_table.setHorizontalHeaderItem(
+            PAGES_COLUMN, QTableWidgetItem("Páginas")
+        )
+
+    def _build_bulk_actions(self):
+        """
+        Habilita la selección múltiple de resultados y agrega las acciones
+        de modificación (CU12) y desactivación (CU13) en lote.
+        """
+        self.ui.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.ui.results_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+
+        self.modify_selected_button = QPushButton("Modificar seleccionados", self)
+        self.deactivate_selected_button = QPushButton("Desactivar seleccionados", self)
+        self.modify_selected_button.clicked.connect(self.modify_selected_books)
+        self.deactivate_selected_button.clicked.connect(self.deactivate_selected_books)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self.modify_selected_button)
+        buttons.addWidget(self.deactivate_selected_button)
+        (self.layout() or QVBoxLayout(self)).addLayout(buttons)
+
+    def _build_export_action(self):
+        """Agrega la exportación de todos los resultados (CSV/XLSX/Parquet)"""
+        self.export_button = QPushButton("Exportar resultados...", self)
+        self.export_button.clicked.connect(self.export_results)
+
+        row = QHBoxLayout()
+        row.addStretch()
+        row.addWidget(self.export_button)
+        (self.layout() or QVBoxLayout(self)).addLayout(row)
+
+    def export_results(self):
+        """Exporta los libros que cumplen los filtros actuales, sin límite"""
+        if self._export_thread is not None and self._export_thread.isRunning():
+            QMessageBox.information(
+                self, "Exportar", "Ya hay una exportación en curso."
+            )
+            return
+
+        filters, _pages = self._current_filters()
+        if filters["ids"] == []:
+            QMessageBox.information(
+                self, "Exportar", "No hay libros que cumplan los filtros."
+            )
+            return
+
+        statement, params = book_export_query(**filters)
+        thread = start_export(self, statement, params, "libros.csv")
+        if thread is not None:
+            self._export_thread = thread
+
+    def selected_book_ids(self):
+        """Retorna los ids (columna 0) de las filas seleccionadas"""
+        rows = {index.row() for index in self.ui.results_table.selectedIndexes()}
+        ids = []
+        for row in sorted(rows):
+            item = self.ui.results_table.item(row, 0)
+            if item is not None:
+                ids.append(int(item.text()))
+        return ids
+
+    def modify_selected_books(self):
+        self._open_bulk_window(ModifyBookScreen)
+
+    def deactivate_selected_books(self):
+        self._open_bulk_window(DeactivateBookScreen)
+
+    def _open_bulk_window(self, screen_class):
+        book_ids = self.selected_book_ids()
+        if not book_ids:
+            QMessageBox.warning(
+                self,
+                "Selección Requerida",
+                "Seleccione uno o más libros en los resultados.",
+            )
+            return
+
+        self._bulk_window = screen_class(user=self.user, book_ids=book_ids)
+        self._bulk_window.show()
+
+    def _refresh_data(self):
+        self.ui.categoria_combo.clear()
+        self.ui.estado_combo.clear()
+        self._load_combos()
+
     def _load_combos(self):
         """
         Carga las categorías y estados desde la base de datos.
         """
-        # Cargar categorías usando una consulta SQL directa para asegurar compatibilidad
+        # Desde la réplica local si está activa; si no, desde el servidor
         self.ui.categoria_combo.addItem("Todas", 0)
+        for categoria_id, nombre in catalog_search.load_categories(self.session):
+            self.ui.categoria_combo.addItem(nombre, categoria_id)
 
-        # CORRECCIÓN: Se usa SQL directo para consultar la tabla 'categoria' (singular)
-        sql_query = text("SELECT id, nombre FROM categoria ORDER BY nombre")
-        result = self.session.execute(sql_query)
-        for row in result:
-            self.ui.categoria_combo.addItem(row.nombre, row.id)
-
-        # Cargar estados
         self.ui.estado_combo.addItem("Todos", 0)
-        estados = self.session.query(EstadoLibro).order_by(EstadoLibro.orden).all()
-        for est in estados:
-            self.ui.estado_combo.addItem(est.nombre, est.id)
+        for estado_id, nombre in catalog_search.load_states(self.session):
+            self.ui.estado_combo.addItem(nombre, estado_id)
+
+    def _current_filters(self):
+        """
+        Filtros de la búsqueda y {libro_id: [páginas]} del texto en el PDF.
+        Con texto en el PDF, `ids` limita la búsqueda a esos libros.
+        """
+        content = self.content_input.text().strip()
+        # Primero el índice de texto: limita la búsqueda a esos libros
+        pages_by_book = search_pdf_text(content) if content else {}
+        filters = dict(
+            titulo=self.ui.titulo_input.text().strip(),
+            autor=self.ui.autor_input.text().strip(),
+            isbn=self.ui.isbn_input.text().strip(),
+            categoria_id=self.ui.categoria_combo.currentData() or None,
+            estado_id=self.ui.estado_combo.currentData() or None,
+            ids=list(pages_by_book) if content else None,
+        )
+        return filters, pages_by_book
 
     def search_books(self):
         """
         Ejecuta la búsqueda de libros.
         """
         self.ui.results_table.setRowCount(0)
+        self.covers.cancel_pending()
+        self._title_items_by_cover.clear()
 
         try:
-            query = self.session.query(Libro)
-
-            titulo = self.ui.titulo_input.text().strip()
-            autor = self.ui.autor_input.text().strip()
-            isbn = self.ui.isbn_input.text().strip()
-            categoria_id = self.ui.categoria_combo.currentData()
-            estado_id = self.ui.estado_combo.currentData()
-
-            if titulo:
-                query = query.filter(Libro.titulo.ilike(f"%{titulo}%"))
-            if autor:
-                query = query.filter(Libro.autor.ilike(f"%{autor}%"))
-            if isbn:
-                query = query.filter(Libro.isbn.ilike(f"%{isbn}%"))
-            if categoria_id and categoria_id != 0:
-                query = query.filter(Libro.categoria_id == categoria_id)
-            if estado_id and estado_id != 0:
-                query = query.filter(Libro.estado_id == estado_id)
-
-            libros_encontrados = query.all()
+            filters, pages_by_book = self._current_filters()
+            if filters["ids"] == []:
+                return
+
+            libros_encontrados = catalog_search.search_books(self.session, **filters)
 
             for libro in libros_encontrados:
                 row_position = self.ui.results_table.rowCount()
                 self.ui.results_table.insertRow(row_position)
 
-                categoria_nombre = libro.categoria.nombre if libro.categoria else "N/A"
-                estado_nombre = libro.estado.nombre if libro.estado else "N/A"
+                categoria_nombre = libro.categoria_nombre or "N/A"
+                estado_nombre = libro.estado_nombre or "N/A"
 
                 self.ui.results_table.setItem(
                     row_position, 0, QTableWidgetItem(str(libro.id))
                 )
-                self.ui.results_table.setItem(
-                    row_position, 1, QTableWidgetItem(libro.titulo)
-                )
+                self.ui.results_table.setItem(row_position, 1, self._title_item(libro))
                 self.ui.results_table.setItem(
                     row_position, 2, QTableWidgetItem(libro.autor)
                 )
@@ -94,10 +223,42 @@ class SearchBooksScreen(QWidget):
                 self.ui.results_table.setItem(
                     row_position, 5, QTableWidgetItem(estado_nombre)
                 )
+                pages = pages_by_book.get(libro.id)
+                if pages:
+                    self.ui.results_table.setItem(
+                        row_position,
+                        PAGES_COLUMN,
+                        QTableWidgetItem(format_pages(pages)),
+                    )
 
         except Exception as e:
             print(f"Error durante la búsqueda de libros: {e}")
 
+    def _title_item(self, libro):
+        """Celda de título con la miniatura de portada (cargada en segundo plano)"""
+        item = QTableWidgetItem(libro.titulo)
+        cover = getattr(libro, "directorio_img", None)
+        if cover:
+            pixmap = self.covers.pixmap(cover, THUMB_SMALL)
+            if pixmap is not None:
+                item.setIcon(QIcon(pixmap))
+            else:
+                self._title_items_by_cover.setdefault(cover, []).append(item)
+        return item
+
+    def _on_cover_ready(self, filename, width, height):
+        if (width, height) != THUMB_SMALL:
+            return
+        pixmap = self.covers.pixmap(filename, THUMB_SMALL)
+        if pixmap is None:
+            return
+        for item in self._title_items_by_cover.pop(filename, []):
+            item.setIcon(QIcon(pixmap))
+
     def closeEvent(self, event):
+        if self._export_thread is not None and self._export_thread.isRunning():
+            self._export_thread.cancel()
+            self._export_thread.wait()
+        self.covers.cover_ready.disconnect(self._on_cover_ready)
         self.session.close()
         super().closeEvent(event)
@@ -1,20 +1,118 @@
-from PyQt5.QtWidgets import QWidget, QTableWidgetItem
+from PyQt5.QtWidgets import (
+    QWidget,
+    QTableWidgetItem,
+    QPushButton,
+    QHBoxLayout,
+    QVBoxLayout,
+    QMessageBox,
+    QAbstractItemView,
+)
+from PyQt5.QtCore import Qt
 from ui.screens.ui_CU18_search_users_screen import Ui_search_users_screen
 from db.database import Database
-from db.models import Usuario, Rol
+from db import hot_queries
+from db.warm_cache import load_roles
+from use_cases.CU10_edit_user_screen import EditUserScreen
+from use_cases.CU11_deactivate_user_screen import DeactivateUserScreen
+from utils.result_export import start_export
 
 
 class SearchUsersScreen(QWidget):
-    def __init__(self):
+    # Los roles no cambian desde la aplicación; se recargan solo al
+    # resincronizar (ver utils.screen_pool)
+    REFRESH_ON = ()
+
+    def __init__(self, user=None):
         super().__init__()
         self.ui = Ui_search_users_screen()
         self.ui.setupUi(self)
 
+        self.user = user
         self.db = Database()
         self.session = self.db.get_session()
+        self._bulk_window = None
+        self._export_thread = None
 
         self.ui.search_button.clicked.connect(self.search_users)
         self._load_combos()
+        self._build_bulk_actions()
+        self._build_export_action()
+
+    def _build_bulk_actions(self):
+        """
+        Habilita la selección múltiple de resultados y agrega las acciones
+        de edición (CU10) y desactivación (CU11) en lote.
+        """
+        self.ui.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.ui.results_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+
+        self.edit_selected_button = QPushButton("Editar seleccionados", self)
+        self.deactivate_selected_button = QPushButton("Desactivar seleccionados", self)
+        self.edit_selected_button.clicked.connect(self.edit_selected_users)
+        self.deactivate_selected_button.clicked.connect(self.deactivate_selected_users)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self.edit_selected_button)
+        buttons.addWidget(self.deactivate_selected_button)
+        (self.layout() or QVBoxLayout(self)).addLayout(buttons)
+
+    def _build_export_action(self):
+        """Agrega la exportación de todos los resultados (CSV/XLSX/Parquet)"""
+        self.export_button = QPushButton("Exportar resultados...", self)
+        self.export_button.clicked.connect(self.export_results)
+
+        row = QHBoxLayout()
+        row.addStretch()
+        row.addWidget(self.export_button)
+        (self.layout() or QVBoxLayout(self)).addLayout(row)
+
+    def export_results(self):
+        """Exporta los usuarios que cumplen los filtros actuales, sin límite"""
+        if self._export_thread is not None and self._export_thread.isRunning():
+            QMessageBox.information(
+                self, "Exportar", "Ya hay una exportación en curso."
+            )
+            return
+
+        statement, params = hot_queries.user_export_query(**self._current_filters())
+        thread = start_export(self, statement, params, "usuarios.csv")
+        if thread is not None:
+            self._export_thread = thread
+
+    def selected_user_ids(self):
+        """Retorna los ids de las filas seleccionadas en la tabla de resultados"""
+        rows = {index.row() for index in self.ui.results_table.selectedIndexes()}
+        ids = []
+        for row in sorted(rows):
+            item = self.ui.results_table.item(row, 0)
+            if item is not None:
+                ids.append(item.data(Qt.UserRole))
+        return ids
+
+    def edit_selected_users(self):
+        self._open_bulk_window(EditUserScreen)
+
+    def deactivate_selected_users(self):
+        self._open_bulk_window(DeactivateUserScreen)
+
+    def _open_bulk_window(self, screen_class):
+        user_ids = self.selected_user_ids()
+        if not user_ids:
+            QMessageBox.warning(
+                self,
+                "Selección Requerida",
+                "Seleccione uno o más usuarios en los resultados.",
+            )
+            return
+
+        self._bulk_window = screen_class(user=self.user, user_ids=user_ids)
+        self._bulk_window.show()
+
+    def _refresh_data(self):
+        self.ui.rol_combo.clear()
+        self.ui.estado_combo.clear()
+        self._load_combos()
 
     def _load_combos(self):
         """
@@ -23,8 +121,7 @@ class SearchUsersScreen(QWidget):
         try:
             # Cargar roles
             self.ui.rol_combo.addItem("Todos", 0)  # Opción para no filtrar por rol
-            roles = self.session.query(Rol).order_by(Rol.nombre).all()
-            for rol in roles:
+            for rol in load_roles(self.session):
                 self.ui.rol_combo.addItem(rol.nombre, rol.id)
 
             # Cargar estados (Activo/Inactivo)
@@ -35,6 +132,18 @@ class SearchUsersScreen(QWidget):
         except Exception as e:
             print(f"Error al cargar combos de búsqueda de usuarios: {e}")
 
+    def _current_filters(self):
+        """Filtros de la búsqueda según los campos y combos"""
+        rol_id = self.ui.rol_combo.currentData()
+        estado = self.ui.estado_combo.currentData()
+        return dict(
+            nombres=self.ui.nombres_input.text().strip(),
+            apellidos=self.ui.apellidos_input.text().strip(),
+            correo=self.ui.correo_input.text().strip(),
+            rol_id=rol_id if rol_id != 0 else None,
+            estado=estado if estado != "all" else None,
+        )
+
     def search_users(self):
         """
         Busca usuarios en la base de datos según los filtros
@@ -43,29 +152,10 @@ class SearchUsersScreen(QWidget):
         self.ui.results_table.setRowCount(0)
 
         try:
-            query = self.session.query(Usuario)
-
-            # Obtener criterios de la UI
-            nombres = self.ui.nombres_input.text().strip()
-            apellidos = self.ui.apellidos_input.text().strip()
-            correo = self.ui.correo_input.text().strip()
-            rol_id = self.ui.rol_combo.currentData()
-            estado = self.ui.estado_combo.currentData()
-
-            # Aplicar filtros dinámicos
-            if nombres:
-                query = query.filter(Usuario.nombres.ilike(f"%{nombres}%"))
-            if apellidos:
-                query = query.filter(Usuario.apellidos.ilike(f"%{apellidos}%"))
-            if correo:
-                query = query.filter(Usuario.correo_electronico.ilike(f"%{correo}%"))
-            if rol_id != 0:
-                query = query.filter(Usuario.rol_id == rol_id)
-            if estado != "all":
-                query = query.filter(Usuario.estado == estado)
-
-            # Ejecutar consulta
-            usuarios_encontrados = query.all()
+            # Filtros dinámicos con sentencias ya compiladas
+            usuarios_encontrados = hot_queries.search_users(
+                self.session, **self._current_filters()
+            )
 
             # Poblar la tabla
             for usuario in usuarios_encontrados:
@@ -75,9 +165,9 @@ class SearchUsersScreen(QWidget):
                 rol_nombre = usuario.rol.nombre if usuario.rol else "N/A"
                 estado_texto = "Activo" if usuario.estado else "Inactivo"
 
-                self.ui.results_table.setItem(
-                    row_position, 0, QTableWidgetItem(usuario.nombres)
-                )
+                nombres_item = QTableWidgetItem(usuario.nombres)
+                nombres_item.setData(Qt.UserRole, usuario.id)
+                self.ui.results_table.setItem(row_position, 0, nombres_item)
                 self.ui.results_table.setItem(
                     row_position, 1, QTableWidgetItem(usuario.apellidos)
                 )
@@ -95,5 +185,8 @@ class SearchUsersScreen(QWidget):
             print(f"Error durante la búsqueda de usuarios: {e}")
 
     def closeEvent(self, event):
+        if self._export_thread is not None and self._export_thread.isRunning():
+            self._export_thread.cancel()
+            self._export_thread.wait()
         self.session.close()
         super().closeEvent(event)
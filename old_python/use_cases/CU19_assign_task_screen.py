@@ -1,15 +1,152 @@
-from PyQt5.QtWidgets import QWidget
+from datetime import datetime
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QWidget,
+    QListWidget,
+    QListWidgetItem,
+    QComboBox,
+    QLineEdit,
+    QLabel,
+    QFormLayout,
+    QVBoxLayout,
+    QMessageBox,
+)
 from ui.screens.ui_CU19_assign_task_screen import Ui_assign_task_screen
+from db.database import Database
+from db.models import Tarea, Usuario
+from db.catalog_search import search_books
+from db.event_bus import publish, TASK_ASSIGNED, USERS_CHANGED
+from utils.bulk_history_logger import write_many_to_historial
+import db.lookup_cache as lookup
 
 
 class AssignTaskScreen(QWidget):
-    def __init__(self):
+    # La lista de responsables solo cambia al crear, editar o desactivar
+    # usuarios (ver utils.screen_pool)
+    REFRESH_ON = (USERS_CHANGED,)
+
+    def __init__(self, user=None):
         super().__init__()
         self.ui = Ui_assign_task_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.db = Database()
+        self.session = self.db.get_session()
+
+        self._build_assignment_form()
+        self._load_users()
+        self.ui.titleInput.setPlaceholderText("Buscar libro por título, autor o ISBN")
+        self.ui.titleInput.returnPressed.connect(self.search_books)
+        self.ui.saveButton.setText("Asignar tarea")
         self.ui.saveButton.clicked.connect(self.save_entry)
 
+    def _build_assignment_form(self):
+        """Agrega la lista de libros, el responsable y las observaciones"""
+        self.books_list = QListWidget(self)
+        self.user_combo = QComboBox(self)
+        self.observations_input = QLineEdit(self)
+        self.observations_input.setPlaceholderText("Instrucciones para la tarea")
+
+        form = QFormLayout()
+        form.addRow(QLabel("Responsable", self), self.user_combo)
+        form.addRow(QLabel("Observaciones", self), self.observations_input)
+
+        layout = self.layout() or QVBoxLayout(self)
+        layout.addWidget(self.books_list)
+        layout.addLayout(form)
+
+    def _refresh_data(self):
+        self._load_users()
+
+    def _load_users(self):
+        self.user_combo.clear()
+        self.user_combo.addItem("Seleccione un usuario", -1)
+        usuarios = (
+            self.session.query(Usuario)
+            .filter(Usuario.estado.is_(True))
+            .order_by(Usuario.nombres, Usuario.apellidos)
+        )
+        for usuario in usuarios:
+            self.user_combo.addItem(
+                f"{usuario.nombres} {usuario.apellidos}", usuario.id
+            )
+
+    def search_books(self):
+        term = self.ui.titleInput.text().strip()
+        self.books_list.clear()
+        if not term:
+            return
+        for book in search_books(self.session, any_text=term):
+            item = QListWidgetItem(
+                f"{book.titulo} — {book.autor} ({book.estado_nombre})"
+            )
+            item.setData(Qt.UserRole, book.id)
+            item.setData(Qt.UserRole + 1, book.titulo)
+            self.books_list.addItem(item)
+
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving assign task screen: {value}")
+        """Crea la tarea y avisa al responsable a través del bus de eventos"""
+        item = self.books_list.currentItem()
+        assignee_id = self.user_combo.currentData()
+        if item is None:
+            QMessageBox.warning(
+                self, "Selección Requerida", "Por favor, seleccione un libro."
+            )
+            return
+        if assignee_id == -1:
+            QMessageBox.warning(
+                self, "Selección Requerida", "Por favor, seleccione un responsable."
+            )
+            return
+
+        book_id = item.data(Qt.UserRole)
+        try:
+            tarea = Tarea(
+                libro_id=book_id,
+                usuario_id=assignee_id,
+                fecha_asignacion=datetime.now(),
+                observaciones=self.observations_input.text().strip() or None,
+            )
+            self.session.add(tarea)
+            self.session.flush()
+            write_many_to_historial(
+                self.session,
+                inserted_usuario_id=self.user.id,
+                inserted_accion_id=lookup.accion_crear.id,
+                inserted_target_type_id=lookup.tt_libro.id,
+                inserted_target_ids=[book_id],
+            )
+            publish(
+                self.session,
+                TASK_ASSIGNED,
+                tarea_id=tarea.id,
+                libro_id=book_id,
+                titulo=item.data(Qt.UserRole + 1),
+                usuario_id=assignee_id,
+                asignado_por=self.user.id,
+                observaciones=tarea.observaciones,
+            )
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            QMessageBox.critical(
+                self, "Error", f"Ocurrió un error al asignar la tarea:\n{str(e)}"
+            )
+            return
+
+        QMessageBox.information(
+            self, "Éxito", f"Tarea asignada a {self.user_combo.currentText()}."
+        )
+        self._clear_form()
+
+    def _clear_form(self):
+        self.books_list.clear()
+        self.ui.titleInput.clear()
+        self.user_combo.setCurrentIndex(0)
+        self.observations_input.clear()
+
+    def closeEvent(self, event):
+        self.session.close()
+        super().closeEvent(event)
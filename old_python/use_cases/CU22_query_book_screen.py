@@ -1,15 +1,272 @@
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QIcon, QPixmap
+from PyQt5.QtWidgets import (
+    QApplication,
+    QWidget,
+    QListWidget,
+    QListWidgetItem,
+    QListView,
+    QLabel,
+    QCheckBox,
+    QHBoxLayout,
+    QVBoxLayout,
+)
 from ui.screens.ui_CU22_query_book_screen import Ui_query_book_screen
+from db.database import Database
+from db.catalog_search import search_books, get_book_details, find_books_by_isbn
+from utils.cover_cache import cover_service, THUMB_GRID, THUMB_DETAIL
+from utils.pdf_text_search import search_pdf_text, format_pages
+from utils.pdf_preview import PdfPreviewPanel
+
+# Filas adicionales a las visibles para las que se piden miniaturas
+PREFETCH_MARGIN = 20
+# Libros escaneados que se conservan en la grilla en modo lector
+MAX_SCANNED = 100
+SEARCH_PLACEHOLDER = "Buscar por título, autor, ISBN o texto del PDF"
+SCAN_PLACEHOLDER = "Escanee el código de barras (ISBN) del libro"
 
 
 class QueryBookScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user=None):
         super().__init__()
         self.ui = Ui_query_book_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.db = Database()
+        self.session = self.db.get_session()
+        self.covers = cover_service()
+        self._items_by_cover = {}  # directorio_img -> [QListWidgetItem]
+        self._current_book = None
+        self._pages_by_book = {}  # libro_id -> páginas del PDF con el término
+
+        self._build_results_view()
+        self._build_scan_mode()
+        self.ui.titleInput.setPlaceholderText(SEARCH_PLACEHOLDER)
+        self.ui.titleInput.returnPressed.connect(self.save_entry)
+        self.ui.saveButton.setText("Buscar")
         self.ui.saveButton.clicked.connect(self.save_entry)
+        self.covers.cover_ready.connect(self._on_cover_ready)
+
+    def _build_results_view(self):
+        """Agrega la grilla de resultados con portadas y el panel de detalle"""
+        self.results_list = QListWidget(self)
+        self.results_list.setViewMode(QListView.IconMode)
+        self.results_list.setIconSize(QSize(*THUMB_GRID))
+        self.results_list.setResizeMode(QListView.Adjust)
+        self.results_list.setUniformItemSizes(True)
+        self.results_list.setMovement(QListView.Static)
+        self.results_list.setWordWrap(True)
+        self.results_list.currentItemChanged.connect(self._show_details)
+        self.results_list.verticalScrollBar().valueChanged.connect(
+            self._request_visible_covers
+        )
+
+        self.cover_label = QLabel(self)
+        self.cover_label.setFixedSize(*THUMB_DETAIL)
+        self.cover_label.setAlignment(Qt.AlignCenter)
+        self.details_label = QLabel(self)
+        self.details_label.setWordWrap(True)
+        self.details_label.setAlignment(Qt.AlignTop)
+
+        self.preview = PdfPreviewPanel(self)
+
+        details = QVBoxLayout()
+        details.addWidget(self.cover_label)
+        details.addWidget(self.details_label, 1)
+        details.addWidget(self.preview)
+
+        content = QHBoxLayout()
+        content.addWidget(self.results_list, 1)
+        content.addLayout(details)
+        (self.layout() or QVBoxLayout(self)).addLayout(content)
+
+    def _build_scan_mode(self):
+        """
+        Agrega el modo lector de códigos: cada lectura (el lector escribe el
+        ISBN y Enter) se resuelve con una consulta por la clave ISBN-13 y el
+        campo queda listo para la siguiente.
+        """
+        self.scan_mode_check = QCheckBox("Modo lector de códigos", self)
+        self.scan_mode_check.toggled.connect(self._set_scan_mode)
+        self.scan_status_label = QLabel(self)
+
+        row = QHBoxLayout()
+        row.addWidget(self.scan_mode_check)
+        row.addWidget(self.scan_status_label, 1)
+        (self.layout() or QVBoxLayout(self)).addLayout(row)
+
+    def _set_scan_mode(self, enabled):
+        self.ui.titleInput.clear()
+        self.ui.titleInput.setPlaceholderText(
+            SCAN_PLACEHOLDER if enabled else SEARCH_PLACEHOLDER
+        )
+        self.ui.saveButton.setEnabled(not enabled)
+        self.scan_status_label.clear()
+        self.show_books([])
+        self.ui.titleInput.setFocus()
 
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving query book screen: {value}")
+        """Busca libros por título, autor o ISBN y por el texto de sus PDFs"""
+        term = self.ui.titleInput.text().strip()
+        if not term:
+            return
+        if self.scan_mode_check.isChecked():
+            self.scan_isbn(term)
+            return
+
+        books = search_books(self.session, any_text=term)
+        pages_by_book = search_pdf_text(term)
+        found_ids = {book.id for book in books}
+        mentioned_ids = [
+            book_id for book_id in pages_by_book if book_id not in found_ids
+        ]
+        if mentioned_ids:
+            books += search_books(self.session, ids=mentioned_ids)
+        self.show_books(books, pages_by_book)
+
+    def scan_isbn(self, code):
+        """Agrega al inicio de la grilla los ejemplares con ese ISBN y los muestra"""
+        self.ui.titleInput.clear()
+        books = find_books_by_isbn(self.session, code)
+        if not books:
+            QApplication.beep()
+            self.scan_status_label.setText(f"Sin coincidencias para el código {code}")
+            return
+
+        status = f"Último: {books[0].titulo}"
+        if len(books) > 1:
+            status += f" ({len(books)} ejemplares)"
+        self.scan_status_label.setText(status)
+        scanned_ids = {book.id for book in books}
+        for row in reversed(range(self.results_list.count())):
+            if self.results_list.item(row).data(Qt.UserRole) in scanned_ids:
+                self.results_list.takeItem(row)
+        for book in reversed(books):
+            self.results_list.insertItem(0, self._book_item(book, self._placeholder()))
+        while self.results_list.count() > MAX_SCANNED:
+            self.results_list.takeItem(self.results_list.count() - 1)
+        self.results_list.setCurrentRow(0)
+        self._request_visible_covers()
+
+    def _placeholder(self):
+        blank = QPixmap(*THUMB_GRID)
+        blank.fill(Qt.lightGray)
+        return QIcon(blank)
+
+    def _book_item(self, book, placeholder):
+        item = QListWidgetItem(placeholder, f"{book.titulo}\n{book.autor}")
+        item.setData(Qt.UserRole, book.id)
+        cover = getattr(book, "directorio_img", None)
+        item.setData(Qt.UserRole + 1, cover)
+        if cover:
+            self._items_by_cover.setdefault(cover, []).append(item)
+        return item
+
+    def show_books(self, books, pages_by_book=None):
+        """Rellena la grilla; las portadas se piden solo para las filas visibles"""
+        self._pages_by_book = pages_by_book or {}
+        self.covers.cancel_pending()
+        self.results_list.clear()
+        self._items_by_cover.clear()
+        self._show_details(None)
+
+        placeholder = self._placeholder()
+        for book in books:
+            self.results_list.addItem(self._book_item(book, placeholder))
+
+        self._request_visible_covers()
+
+    def _visible_rows(self):
+        count = self.results_list.count()
+        if not count:
+            return range(0)
+        viewport = self.results_list.viewport().rect()
+        first = max(self.results_list.indexAt(viewport.topLeft()).row(), 0)
+        # En IconMode indexAt() da -1 sobre el espacio vacío (entre celdas o
+        # tras la última), así que el final se calcula con el tamaño de las
+        # celdas, que son uniformes, y no con la esquina inferior
+        cell = self.results_list.visualItemRect(self.results_list.item(first))
+        spacing = self.results_list.spacing()
+        columns = max(viewport.width() // max(cell.width() + spacing, 1), 1)
+        # +2: las filas cortadas arriba y abajo
+        rows = viewport.height() // max(cell.height() + spacing, 1) + 2
+        last = first + columns * rows - 1
+        return range(first, min(last + PREFETCH_MARGIN, count - 1) + 1)
+
+    def _request_visible_covers(self, *_):
+        """Pide (o toma de la caché) las miniaturas de las filas visibles"""
+        for row in self._visible_rows():
+            item = self.results_list.item(row)
+            cover = item.data(Qt.UserRole + 1)
+            pixmap = self.covers.pixmap(cover, THUMB_GRID)
+            if pixmap is not None:
+                item.setIcon(QIcon(pixmap))
+
+    def _on_cover_ready(self, filename, width, height):
+        size = (width, height)
+        if size == THUMB_GRID:
+            pixmap = self.covers.pixmap(filename, size)
+            if pixmap is not None:
+                for item in self._items_by_cover.get(filename, []):
+                    item.setIcon(QIcon(pixmap))
+        elif size == THUMB_DETAIL and self._current_book is not None:
+            if getattr(self._current_book, "directorio_img", None) == filename:
+                self._set_detail_cover(filename)
+
+    def _set_detail_cover(self, filename):
+        pixmap = self.covers.pixmap(filename, THUMB_DETAIL)
+        if pixmap is None:
+            self.cover_label.setPixmap(QPixmap())
+            self.cover_label.setText(
+                "Cargando portada..." if filename else "Sin portada"
+            )
+        else:
+            self.cover_label.setPixmap(pixmap)
+
+    def _show_details(self, item, _previous=None):
+        if item is None:
+            self._current_book = None
+            self.cover_label.clear()
+            self.details_label.clear()
+            self.preview.show_pdf(None)
+            return
+
+        book = get_book_details(self.session, item.data(Qt.UserRole))
+        self._current_book = book
+        if book is None:
+            self.details_label.setText("El libro ya no existe.")
+            self.preview.show_pdf(None)
+            return
+
+        self._set_detail_cover(getattr(book, "directorio_img", None))
+        categoria = book.categoria_nombre or "N/A"
+        estado = book.estado_nombre or "N/A"
+        self.details_label.setText(
+            f"<b>{book.titulo}</b><br>{book.autor}<br>"
+            f"ISBN: {book.isbn or 'N/A'}<br>"
+            f"Fecha: {book.fecha or 'N/A'} — "
+            f"Páginas: {book.numero_paginas or 'N/A'}<br>"
+            f"Categoría: {categoria}<br>Estado: {estado}<br>"
+            f"Ubicación: {book.estanteria or '-'} / {book.espacio or '-'}"
+            + self._mentions_text(book.id)
+        )
+        # Si la búsqueda encontró el término en el PDF, se abre en esa página
+        mentions = self._pages_by_book.get(book.id)
+        self.preview.show_pdf(book.directorio_pdf, page=mentions[0] if mentions else 1)
+
+    def _mentions_text(self, book_id):
+        pages = self._pages_by_book.get(book_id)
+        if not pages:
+            return ""
+        return f"<br>Menciones en el PDF, páginas: {format_pages(pages)}"
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._request_visible_covers()
+
+    def closeEvent(self, event):
+        self.covers.cover_ready.disconnect(self._on_cover_ready)
+        self.preview.release()
+        self.session.close()
+        super().closeEvent(event)
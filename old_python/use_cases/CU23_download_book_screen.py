@@ -1,15 +1,198 @@
-from PyQt5.QtWidgets import QWidget
+import shutil
+
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import (
+    QWidget,
+    QListWidget,
+    QListWidgetItem,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QFileDialog,
+    QMessageBox,
+    QHBoxLayout,
+    QVBoxLayout,
+)
 from ui.screens.ui_CU23_download_book_screen import Ui_download_book_screen
+from db.database import Database
+from db.catalog_search import search_books, get_book_details
+from utils.pdf_preview import PdfPreviewPanel, extract_pages
+from utils.pdf_store import resolve_pdf
+
+
+class PageExtractThread(QThread):
+    """Copia el libro completo o un rango de páginas fuera del hilo de UI"""
+
+    done = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, filename, destination, page_range=None, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.destination = destination
+        self.page_range = page_range
+
+    def run(self):
+        try:
+            if self.page_range is None:
+                shutil.copyfile(resolve_pdf(self.filename), self.destination)
+            else:
+                extract_pages(self.filename, self.destination, *self.page_range)
+            self.done.emit(self.destination)
+        except Exception as e:
+            self.failed.emit(str(e))
 
 
 class DownloadBookScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user=None):
         super().__init__()
         self.ui = Ui_download_book_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.db = Database()
+        self.session = self.db.get_session()
+        self._book = None
+        self._extract_thread = None
+
+        self._build_download_view()
+        self.ui.titleInput.setPlaceholderText("Buscar por título, autor o ISBN")
+        self.ui.titleInput.returnPressed.connect(self.save_entry)
+        self.ui.saveButton.setText("Buscar")
         self.ui.saveButton.clicked.connect(self.save_entry)
 
+    def _build_download_view(self):
+        """Agrega los resultados, la vista previa y las opciones de descarga"""
+        self.results_list = QListWidget(self)
+        self.results_list.currentItemChanged.connect(self._select_book)
+        self.preview = PdfPreviewPanel(self)
+        self.preview.loaded.connect(self._on_preview_loaded)
+
+        self.first_page_spin = QSpinBox(self)
+        self.last_page_spin = QSpinBox(self)
+        for spin in (self.first_page_spin, self.last_page_spin):
+            spin.setMinimum(1)
+        self.range_button = QPushButton("Descargar páginas", self)
+        self.full_button = QPushButton("Descargar libro completo", self)
+        self.range_button.clicked.connect(self.download_range)
+        self.full_button.clicked.connect(self.download_full)
+
+        options = QHBoxLayout()
+        options.addWidget(QLabel("Desde", self))
+        options.addWidget(self.first_page_spin)
+        options.addWidget(QLabel("hasta", self))
+        options.addWidget(self.last_page_spin)
+        options.addWidget(self.range_button)
+        options.addStretch()
+        options.addWidget(self.full_button)
+
+        content = QHBoxLayout()
+        content.addWidget(self.results_list, 1)
+        content.addWidget(self.preview)
+
+        layout = self.layout() or QVBoxLayout(self)
+        layout.addLayout(content)
+        layout.addLayout(options)
+        self._set_download_enabled(False)
+
+    def _set_download_enabled(self, enabled):
+        for widget in (
+            self.first_page_spin,
+            self.last_page_spin,
+            self.range_button,
+            self.full_button,
+        ):
+            widget.setEnabled(enabled)
+
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving download book screen: {value}")
+        """Busca libros por título, autor o ISBN"""
+        term = self.ui.titleInput.text().strip()
+        if not term:
+            return
+        self.results_list.clear()
+        for book in search_books(self.session, any_text=term):
+            item = QListWidgetItem(f"{book.titulo} — {book.autor}")
+            item.setData(Qt.UserRole, book.id)
+            self.results_list.addItem(item)
+        if self.results_list.count() == 0:
+            self.preview.show_pdf(None)
+            self._set_download_enabled(False)
+
+    def _select_book(self, item, _previous=None):
+        self._book = None
+        if item is not None:
+            self._book = get_book_details(self.session, item.data(Qt.UserRole))
+        filename = getattr(self._book, "directorio_pdf", None)
+        self._set_download_enabled(False)
+        # La cantidad de páginas llega con el primer render (_on_preview_loaded)
+        self.preview.show_pdf(filename)
+
+    def _on_preview_loaded(self, page_count):
+        if self._extract_thread is not None:
+            return
+        self._set_download_enabled(page_count > 0)
+        if page_count:
+            self.first_page_spin.setMaximum(page_count)
+            self.last_page_spin.setMaximum(page_count)
+            self.first_page_spin.setValue(1)
+            self.last_page_spin.setValue(page_count)
+
+    def _ask_destination(self, suggested):
+        destination, _ = QFileDialog.getSaveFileName(
+            self, "Guardar PDF", suggested, "PDF (*.pdf)"
+        )
+        return destination
+
+    def download_full(self):
+        if self._book is None:
+            return
+        destination = self._ask_destination(self._book.directorio_pdf)
+        if destination:
+            self._start_extract(destination, None)
+
+    def download_range(self):
+        if self._book is None:
+            return
+        first = self.first_page_spin.value()
+        last = self.last_page_spin.value()
+        if first > last:
+            QMessageBox.warning(
+                self, "Rango inválido", "La página inicial es mayor que la final."
+            )
+            return
+        base = self._book.directorio_pdf.rsplit(".", 1)[0]
+        destination = self._ask_destination(f"{base}_p{first}-{last}.pdf")
+        if destination:
+            self._start_extract(destination, (first, last))
+
+    def _start_extract(self, destination, page_range):
+        if self._extract_thread is not None:
+            return
+        self._set_download_enabled(False)
+        self._extract_thread = PageExtractThread(
+            self._book.directorio_pdf, destination, page_range, self
+        )
+        self._extract_thread.done.connect(self._on_extract_done)
+        self._extract_thread.failed.connect(self._on_extract_failed)
+        self._extract_thread.start()
+
+    def _finish_extract(self):
+        self._extract_thread = None
+        self._set_download_enabled(self.preview.page_count > 0)
+
+    def _on_extract_done(self, destination):
+        self._finish_extract()
+        QMessageBox.information(self, "Éxito", f"PDF guardado en:\n{destination}")
+
+    def _on_extract_failed(self, message):
+        self._finish_extract()
+        QMessageBox.critical(
+            self, "Error", f"Ocurrió un error al guardar el PDF:\n{message}"
+        )
+
+    def closeEvent(self, event):
+        if self._extract_thread is not None:
+            self._extract_thread.wait()
+        self.preview.release()
+        self.session.close()
+        super().closeEvent(event)
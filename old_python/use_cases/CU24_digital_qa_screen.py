@@ -1,15 +1,204 @@
-from PyQt5.QtWidgets import QWidget
+import os
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtWidgets import (
+    QWidget,
+    QMessageBox,
+    QVBoxLayout,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+)
 from ui.screens.ui_CU24_digital_qa_screen import Ui_digital_qa_screen
+from db.database import Database
+from db.models import Libro
+from utils.cache_paths import get_cache_dir
+from utils.pdf_store import resolve_pdfs
+from utils.pdf_quality import PdfQualityEngine
+from utils.review_queue import ReviewQueuePanel, review_state_ids
+
+# Estados del flujo de revisión digital
+SOURCE_STATE = "Digitalizado"
+APPROVE_STATE = "Aprobado por control de calidad"
+REJECT_STATE = "En digitalización"
+
+
+class PdfQualityScanThread(QThread):
+    """Ejecuta el análisis automático de PDFs sin bloquear la interfaz"""
+
+    finished_scan = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, books, parent=None):
+        super().__init__(parent)
+        self.books = books  # [(libro_id, directorio_pdf, numero_paginas)]
+
+    def run(self):
+        try:
+            # Las rutas del almacén se resuelven aquí, en una sola consulta
+            paths = resolve_pdfs(filename for _, filename, _ in self.books)
+            jobs = [
+                (book_id, paths.get(filename), pages)
+                for book_id, filename, pages in self.books
+            ]
+            engine = PdfQualityEngine(
+                os.path.join(get_cache_dir("pdf_quality"), "results.json")
+            )
+            self.finished_scan.emit(engine.scan(jobs))
+        except Exception as e:
+            self.failed.emit(str(e))
 
 
 class DigitalQaScreen(QWidget):
-    def __init__(self):
+    def __init__(self, user):
         super().__init__()
         self.ui = Ui_digital_qa_screen()
         self.ui.setupUi(self)
 
+        self.user = user
+        self.db = Database()
+        self.session = self.db.get_session()
+        self.review_panel = None
+        self._scan_thread = None
+        self._reports = []
+        self._titles = {}
+
+        self.ui.titleInput.hide()
+        self.ui.saveButton.setText("Iniciar revisión")
         self.ui.saveButton.clicked.connect(self.save_entry)
+        self._build_analysis_widgets()
+
+    def _build_analysis_widgets(self):
+        """Agrega el análisis automático y la tabla de prioridades"""
+        layout = self.layout() or QVBoxLayout(self)
+
+        self.analyze_button = QPushButton("Análisis automático", self)
+        self.analyze_button.clicked.connect(self.run_analysis)
+        layout.addWidget(self.analyze_button)
+
+        self.analysis_table = QTableWidget(0, 4, self)
+        self.analysis_table.setHorizontalHeaderLabels(
+            ["ID", "Título", "Prioridad", "Problemas"]
+        )
+        self.analysis_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.analysis_table.hide()
+        layout.addWidget(self.analysis_table)
+
+    def _load_states(self):
+        """Retorna los ids de los estados de origen, aprobación y rechazo"""
+        return review_state_ids(self.session, SOURCE_STATE, APPROVE_STATE, REJECT_STATE)
+
+    def run_analysis(self):
+        """Analiza en segundo plano los PDFs de los libros pendientes de revisión"""
+        if self._scan_thread is not None:
+            return
+
+        try:
+            source_id, _, _ = self._load_states()
+        except LookupError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        books = (
+            self.session.query(
+                Libro.id, Libro.titulo, Libro.directorio_pdf, Libro.numero_paginas
+            )
+            .filter(Libro.estado_id == source_id)
+            .all()
+        )
+        self._titles = {book.id: book.titulo for book in books}
+        jobs = [(book.id, book.directorio_pdf, book.numero_paginas) for book in books]
+
+        self.analyze_button.setEnabled(False)
+        self.analyze_button.setText("Analizando...")
+        self._scan_thread = PdfQualityScanThread(jobs)
+        self._scan_thread.finished_scan.connect(self._on_analysis_finished)
+        self._scan_thread.failed.connect(self._on_analysis_failed)
+        self._scan_thread.start()
+
+    def _reset_analysis_button(self):
+        self._scan_thread = None
+        self.analyze_button.setEnabled(True)
+        self.analyze_button.setText("Análisis automático")
+
+    def _on_analysis_failed(self, message):
+        self._reset_analysis_button()
+        QMessageBox.critical(
+            self, "Error", f"No se pudo completar el análisis automático:\n{message}"
+        )
+
+    def _on_analysis_finished(self, reports):
+        self._reset_analysis_button()
+        self._reports = reports
+
+        self.analysis_table.setRowCount(len(reports))
+        for row, report in enumerate(reports):
+            book_id = report["book_id"]
+            issues = "; ".join(
+                (
+                    f"p.{issue['page']}: {issue['detail']}"
+                    if issue["page"]
+                    else issue["detail"]
+                )
+                for issue in report["issues"]
+            )
+            self.analysis_table.setItem(row, 0, QTableWidgetItem(str(book_id)))
+            self.analysis_table.setItem(
+                row, 1, QTableWidgetItem(self._titles.get(book_id, ""))
+            )
+            self.analysis_table.setItem(row, 2, QTableWidgetItem(str(report["score"])))
+            self.analysis_table.setItem(
+                row, 3, QTableWidgetItem(issues or "Sin problemas")
+            )
+        self.analysis_table.show()
+
+    def _priority_annotations(self):
+        annotations = {}
+        for report in self._reports:
+            if report["issues"]:
+                annotations[report["book_id"]] = "Análisis automático: " + "; ".join(
+                    issue["detail"] for issue in report["issues"][:5]
+                )
+        return annotations
 
     def save_entry(self):
-        value = self.ui.titleInput.text()
-        print(f"✅ Saving digital qa screen: {value}")
+        """Inicia la revisión rápida, en orden de prioridad si hay análisis"""
+        if self.review_panel is not None:
+            self.review_panel.setFocus()
+            return
+        if self.user is None:
+            # Las decisiones se guardan a nombre del usuario
+            QMessageBox.warning(
+                self, "Sin usuario", "Inicie sesión para registrar revisiones."
+            )
+            return
+
+        try:
+            source_id, approve_id, reject_id = self._load_states()
+        except LookupError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        self.review_panel = ReviewQueuePanel(
+            self.user,
+            source_id,
+            approve_id,
+            reject_id,
+            with_pdf=True,
+            observation_prefix="Control de calidad digital",
+            book_ids=[report["book_id"] for report in self._reports] or None,
+            annotations=self._priority_annotations(),
+            parent=self,
+        )
+        (self.layout() or QVBoxLayout(self)).addWidget(self.review_panel)
+        self.ui.saveButton.setEnabled(False)
+        self.review_panel.start()
+        self.review_panel.setFocus()
+
+    def closeEvent(self, event):
+        if self.review_panel is not None:
+            self.review_panel.stop()
+        if self._scan_thread is not None:
+            self._scan_thread.wait()
+        self.session.close()
+        super().closeEvent(event)
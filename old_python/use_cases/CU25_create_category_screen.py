@@ -4,6 +4,7 @@ from ui.screens.ui_CU25_create_category_screen import Ui_create_category_screen
 from db.database import Database
 from db.models import Categoria
 from utils.history_logger import write_to_historial
+from db.event_bus import publish, CATALOG_CHANGED
 import db.lookup_cache as lookup
 
 session = Database().get_session()
@@ -50,6 +51,7 @@ class CreateCategoryScreen(QWidget):
             )
 
             session.add(nueva_categoria)
+            publish(session, CATALOG_CHANGED, tabla="categoria")
             session.commit()
 
             nueva_categoria = (
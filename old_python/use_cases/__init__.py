@@ -0,0 +1,19 @@
+import os
+
+from utils import ui_diagnostics
+
+# Modo de diagnóstico (latencia de slots y congelamientos de la interfaz)
+if ui_diagnostics.diagnostics_enabled():
+    ui_diagnostics.enable(__name__)
+
+# Captura de sentencias SQL para db.query_plans
+if os.environ.get("ARCHIBOX_SQL_CAPTURE"):
+    from db.query_plans import capture_to_file
+
+    capture_to_file(os.environ["ARCHIBOX_SQL_CAPTURE"])
+
+# Grabación de sesiones para benchmarks/replay_sessions.py
+if os.environ.get("ARCHIBOX_SESSION_RECORD"):
+    from utils.session_recorder import start_recording
+
+    start_recording(os.environ["ARCHIBOX_SESSION_RECORD"], __name__)
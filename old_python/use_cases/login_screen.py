@@ -1,7 +1,7 @@
 from PyQt5.QtWidgets import QWidget
 from ui.screens.ui_login_screen import Ui_login_screen
 from db.database import Database
-from db.models import Usuario
+from db.hot_queries import user_by_email
 
 
 class LoginScreen(QWidget):
@@ -25,11 +25,7 @@ class LoginScreen(QWidget):
             return
 
         session = Database().get_session()
-        user = (
-            session.query(Usuario)
-            .filter_by(correo_electronico=email, estado=True)
-            .first()
-        )
+        user = user_by_email(session, email)
 
         if user and user.verify_password(password):
             self.ui.err_display.setText("")
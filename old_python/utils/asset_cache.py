@@ -0,0 +1,118 @@
+"""
+Imágenes ya decodificadas en disco (banner del login, íconos y miniaturas
+de portadas), para no decodificar PNG/JPEG en cada arranque.
+
+Se guarda el búfer de píxeles de la QImage convertida a ARGB32
+premultiplicado, el formato que QPixmap usa internamente, detrás de una
+cabecera con la versión y las dimensiones. Leerla es un read() y una copia;
+no hay descompresión ni conversión de formato.
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QIcon, QImage, QImageReader, QPixmap
+from utils.cache_paths import get_cache_dir
+from utils.path_utils import get_asset_path
+
+# Subir este número invalida todas las imágenes guardadas
+ASSET_CACHE_VERSION = 1
+RAW_EXTENSION = ".argb"
+
+_MAGIC = b"ABXI"
+_HEADER = struct.Struct("<4sIIII")  # firma, versión, ancho, alto, bytes por línea
+_FORMAT = QImage.Format_ARGB32_Premultiplied
+
+
+def write_image(path, image):
+    """Guarda `image` sin comprimir; escribe aparte y reemplaza al terminar"""
+    image = image.convertToFormat(_FORMAT)
+    header = _HEADER.pack(
+        _MAGIC,
+        ASSET_CACHE_VERSION,
+        image.width(),
+        image.height(),
+        image.bytesPerLine(),
+    )
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=RAW_EXTENSION)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(image.constBits().asstring(image.sizeInBytes()))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_image(path):
+    """QImage guardada con write_image(), o None si falta o no es válida"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return None
+            magic, version, width, height, bytes_per_line = _HEADER.unpack(header)
+            if magic != _MAGIC or version != ASSET_CACHE_VERSION:
+                return None
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) != bytes_per_line * height:
+        return None
+    # copy(): la QImage no debe seguir apuntando al búfer de Python
+    return QImage(data, width, height, bytes_per_line, _FORMAT).copy()
+
+
+def decode_image(source_path, size=None):
+    """
+    Decodifica `source_path`; con `size` (ancho, alto) reduce durante la
+    decodificación, manteniendo la proporción.
+    """
+    reader = QImageReader(source_path)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if size is not None and original.isValid():
+        reader.setScaledSize(original.scaled(size[0], size[1], Qt.KeepAspectRatio))
+    image = reader.read()
+    return None if image.isNull() else image
+
+
+def _cached_path(source_path, size):
+    """Depende de la ruta, el tamaño y la fecha del original"""
+    stat = os.stat(source_path)
+    key = f"{os.path.abspath(source_path)}:{stat.st_size}:{stat.st_mtime}:{size}"
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(get_cache_dir("assets"), f"{name}{RAW_EXTENSION}")
+
+
+def load_image(source_path, size=None):
+    """QImage de `source_path`, desde la caché si el original no cambió"""
+    if not os.path.exists(source_path):
+        return None
+    cached_path = _cached_path(source_path, size)
+    image = read_image(cached_path)
+    if image is not None:
+        return image
+    image = decode_image(source_path, size)
+    if image is not None:
+        try:
+            write_image(cached_path, image)
+        except OSError as e:
+            print(f"ADVERTENCIA: No se pudo guardar {cached_path}: {e}")
+    return image
+
+
+def load_pixmap(name, size=None):
+    """QPixmap de un archivo de assets/; vacío si no existe"""
+    image = load_image(get_asset_path(name), size)
+    return QPixmap() if image is None else QPixmap.fromImage(image)
+
+
+def load_icon(name):
+    return QIcon(load_pixmap(name))
@@ -0,0 +1,39 @@
+from sqlalchemy import text
+
+# Una sola sentencia inserta una fila de historial por cada target_id.
+_INSERT_HISTORIAL_BULK = text("""
+    INSERT INTO historial (usuario_id, accion_id, target_type_id, target_id)
+    SELECT :usuario_id, :accion_id, :target_type_id, target_id
+    FROM unnest(CAST(:target_ids AS INTEGER[])) AS t(target_id)
+    """)
+
+
+def write_many_to_historial(
+    session,
+    inserted_usuario_id,
+    inserted_accion_id,
+    inserted_target_type_id,
+    inserted_target_ids,
+):
+    """
+    Registra en el historial la misma acción sobre varios objetos.
+
+    A diferencia de write_to_historial no hace commit: el INSERT se ejecuta
+    en la transacción de `session`, de modo que la operación masiva y su
+    auditoría se confirman (o se revierten) juntas.
+    Retorna el número de filas registradas.
+    """
+    target_ids = [int(target_id) for target_id in inserted_target_ids]
+    if not target_ids:
+        return 0
+
+    session.execute(
+        _INSERT_HISTORIAL_BULK,
+        {
+            "usuario_id": inserted_usuario_id,
+            "accion_id": inserted_accion_id,
+            "target_type_id": inserted_target_type_id,
+            "target_ids": target_ids,
+        },
+    )
+    return len(target_ids)
@@ -0,0 +1,14 @@
+import os
+
+
+def get_cache_dir(*parts):
+    """
+    Retorna (y crea si no existe) un directorio dentro de la caché local del
+    cliente. Se puede reubicar con la variable de entorno ARCHIBOX_CACHE_DIR.
+    """
+    base = os.environ.get("ARCHIBOX_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "archibox"
+    )
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,227 @@
+import hashlib
+import os
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap, QPixmapCache
+from utils.asset_cache import RAW_EXTENSION, decode_image, read_image, write_image
+from utils.cache_paths import get_cache_dir
+from utils.path_utils import get_books_path
+
+# Tamaños usados por las pantallas (ancho, alto)
+THUMB_SMALL = (32, 48)
+THUMB_GRID = (120, 180)
+THUMB_DETAIL = (240, 360)
+
+DISK_CACHE_MAX_BYTES = 200 * 1024 * 1024
+PIXMAP_CACHE_LIMIT_KB = 64 * 1024
+
+
+def get_cover_path(filename):
+    """Las portadas viven en `covers/`, junto a la carpeta de libros"""
+    books_dir = os.path.dirname(get_books_path(filename))
+    return os.path.join(os.path.dirname(books_dir), "covers", filename)
+
+
+class ThumbnailDiskCache:
+    """
+    Miniaturas en disco indexadas por el SHA-256 de la portada original y el
+    tamaño pedido, ya decodificadas (utils.asset_cache). Al superar
+    `max_bytes` se eliminan las menos usadas (se usa la fecha de
+    modificación como marca de último acceso).
+    """
+
+    def __init__(self, directory, max_bytes=DISK_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hashes = {}  # (ruta, tamaño, mtime) -> sha256
+        self._total_bytes = None
+
+    def _content_hash(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime)
+        with self._lock:
+            cached = self._hashes.get(key)
+        if cached:
+            return cached
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        with self._lock:
+            self._hashes[key] = sha256
+        return sha256
+
+    def thumbnail_path(self, sha256, size):
+        width, height = size
+        return os.path.join(
+            self.directory, sha256[:2], f"{sha256}_{width}x{height}{RAW_EXTENSION}"
+        )
+
+    def load(self, source_path, size):
+        """Retorna la miniatura de `source_path`, generándola si no existe"""
+        sha256 = self._content_hash(source_path)
+        thumb_path = self.thumbnail_path(sha256, size)
+
+        image = read_image(thumb_path)
+        if image is not None:
+            os.utime(thumb_path)
+            return image
+
+        # Con JPEG, QImageReader reduce durante la decodificación sin crear
+        # la imagen completa
+        image = decode_image(source_path, size)
+        if image is None:
+            return None
+
+        try:
+            write_image(thumb_path, image)
+        except OSError as e:
+            print(f"ADVERTENCIA: No se pudo guardar la miniatura {thumb_path}: {e}")
+        else:
+            self._account(os.path.getsize(thumb_path))
+        return image
+
+    def _account(self, added_bytes):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += added_bytes
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        """Borra las miniaturas menos usadas hasta quedar en el 90% del límite"""
+        target = self.max_bytes * 0.9
+        for path, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+
+_disk_cache = None
+_disk_cache_lock = threading.Lock()
+
+
+def _get_disk_cache():
+    global _disk_cache
+    with _disk_cache_lock:
+        if _disk_cache is None:
+            _disk_cache = ThumbnailDiskCache(get_cache_dir("covers"))
+        return _disk_cache
+
+
+def load_cover_thumbnail(filename, size):
+    """
+    Carga la miniatura de una portada (QImage) de forma síncrona.
+    Es segura fuera del hilo de UI; no usa QPixmap.
+    """
+    if not filename:
+        return None
+    path = get_cover_path(filename)
+    if not os.path.exists(path):
+        return None
+    return _get_disk_cache().load(path, size)
+
+
+def _pixmap_key(filename, size):
+    return f"cover:{filename}:{size[0]}x{size[1]}"
+
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, service, filename, size):
+        super().__init__()
+        self.service = service
+        self.filename = filename
+        self.size = size
+
+    def run(self):
+        try:
+            image = load_cover_thumbnail(self.filename, self.size)
+        except Exception as e:
+            print(
+                f"ADVERTENCIA: No se pudo generar la miniatura de {self.filename}: {e}"
+            )
+            image = None
+        self.service._loaded.emit(
+            self.filename, self.size[0], self.size[1], image or QImage()
+        )
+
+
+class CoverThumbnailService(QObject):
+    """
+    Entrega miniaturas de portadas sin decodificar imágenes en el hilo de UI.
+
+    pixmap() responde desde QPixmapCache o, si no está, encola la generación
+    en segundo plano y retorna None; cuando la miniatura está lista se emite
+    cover_ready(filename, ancho, alto) y basta con volver a llamar a pixmap().
+    """
+
+    cover_ready = pyqtSignal(str, int, int)
+    _loaded = pyqtSignal(str, int, int, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        QPixmapCache.setCacheLimit(
+            max(QPixmapCache.cacheLimit(), PIXMAP_CACHE_LIMIT_KB)
+        )
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._pending = set()
+        self._missing = set()
+        self._loaded.connect(self._on_loaded)
+
+    def pixmap(self, filename, size):
+        if not filename:
+            return None
+        key = _pixmap_key(filename, size)
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            return pixmap
+        if key not in self._pending and key not in self._missing:
+            self._pending.add(key)
+            self._pool.start(_ThumbnailJob(self, filename, size))
+        return None
+
+    def cancel_pending(self):
+        """Descarta las miniaturas encoladas que todavía no empezaron"""
+        self._pool.clear()
+        self._pending.clear()
+
+    def _on_loaded(self, filename, width, height, image):
+        key = _pixmap_key(filename, (width, height))
+        self._pending.discard(key)
+        if image.isNull():
+            self._missing.add(key)
+            return
+        QPixmapCache.insert(key, QPixmap.fromImage(image))
+        self.cover_ready.emit(filename, width, height)
+
+
+_service = None
+
+
+def cover_service():
+    """Instancia compartida; debe crearse después de la QApplication"""
+    global _service
+    if _service is None:
+        _service = CoverThumbnailService()
+    return _service
@@ -0,0 +1,48 @@
+import re
+
+_NON_ISBN_CHARS = re.compile(r"[^0-9X]")
+# "ISBN", "ISBN-13:", "ISBN 978-..." seguido de dígitos con guiones o espacios
+_ISBN_IN_TEXT = re.compile(r"ISBN(?:-1[03])?:?\s*([0-9][0-9X\- ]{8,16}[0-9X])", re.I)
+
+
+def _isbn10_is_valid(digits):
+    total = 0
+    for position, char in enumerate(digits):
+        value = 10 if char == "X" else int(char)
+        if char == "X" and position != 9:
+            return False
+        total += (10 - position) * value
+    return total % 11 == 0
+
+
+def _isbn13_check_digit(first12):
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn(raw):
+    """
+    Retorna el ISBN-13 (solo dígitos) de `raw`, aceptando ISBN-10 o 13 con
+    guiones o espacios. Retorna None si no es un ISBN válido.
+    """
+    if not raw:
+        return None
+    digits = _NON_ISBN_CHARS.sub("", str(raw).upper())
+    if len(digits) == 13 and digits.isdigit():
+        if _isbn13_check_digit(digits[:12]) == digits[12]:
+            return digits
+        return None
+    if len(digits) == 10 and _isbn10_is_valid(digits):
+        first12 = "978" + digits[:9]
+        return first12 + _isbn13_check_digit(first12)
+    return None
+
+
+def find_isbns(text):
+    """ISBN-13 válidos mencionados en un texto (p. ej. la página de créditos)"""
+    found = []
+    for match in _ISBN_IN_TEXT.finditer(text or ""):
+        isbn = normalize_isbn(match.group(1))
+        if isbn and isbn not in found:
+            found.append(isbn)
+    return found
@@ -0,0 +1,483 @@
+"""
+Vista previa de PDFs por página (CU22/CU23) y extracción de rangos.
+
+Al ingresar un PDF se genera en segundo plano un "sidecar" con la primera
+página ya renderizada y la cantidad de páginas, así abrir un libro de cientos
+de páginas muestra la portada leyendo solo un PNG pequeño. Los sidecars se
+guardan junto al almacén de PDFs (`pdf_store/previews/`), de modo que cada
+PDF se renderiza una sola vez para todos los clientes. El resto de las
+páginas se renderiza bajo demanda en segundo plano: MuPDF ubica cada página
+por la tabla xref del archivo y lee solo sus objetos, sin cargar el escaneo
+completo. Las imágenes renderizadas quedan en una LRU acotada por bytes.
+
+Nada de esto corre en el hilo de UI: la cantidad de páginas también llega
+con el resultado del render (document_ready).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import (
+    QWidget,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QHBoxLayout,
+    QVBoxLayout,
+)
+from utils.pdf_store import get_pdf_store, get_store_root, resolve_pdf
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+PREVIEW_DPI = 110
+PAGE_CACHE_BYTES = 128 * 1024 * 1024
+MAX_OPEN_DOCUMENTS = 4
+# Páginas que se renderizan por adelantado alrededor de la que se muestra
+PREFETCH_PAGES = 2
+PANEL_SIZE = (300, 400)
+
+
+def _preview_key(filename, path):
+    """SHA-256 del almacén si el PDF ya está ingresado; si no, ruta+tamaño+fecha"""
+    try:
+        sha256 = get_pdf_store().lookup(filename)
+    except Exception:
+        sha256 = None
+    if sha256:
+        return sha256
+    stat = os.stat(path)
+    return hashlib.sha1(
+        f"{path}:{stat.st_size}:{stat.st_mtime}".encode("utf-8")
+    ).hexdigest()
+
+
+def _sidecar_paths(key):
+    directory = os.path.join(get_store_root(), "previews", key[:2])
+    os.makedirs(directory, exist_ok=True)
+    return (
+        os.path.join(directory, f"{key}.json"),
+        os.path.join(directory, f"{key}_p1.png"),
+    )
+
+
+def _zoom():
+    return PREVIEW_DPI / 72.0
+
+
+def build_preview(filename):
+    """
+    Genera el sidecar de un PDF (página 1 en PNG y cantidad de páginas).
+    Se llama al ingresarlo; no usa Qt, así que puede correr en cualquier hilo.
+    """
+    if fitz is None or not filename:
+        return None
+    path = resolve_pdf(filename)
+    if not path or not os.path.exists(path):
+        return None
+    key = _preview_key(filename, path)
+    meta_path, png_path = _sidecar_paths(key)
+    if os.path.exists(meta_path) and os.path.exists(png_path):
+        return key
+
+    with fitz.open(path) as document:
+        meta = {"page_count": document.page_count, "repaired": document.is_repaired}
+        if document.page_count:
+            zoom = _zoom()
+            pixmap = document.load_page(0).get_pixmap(
+                matrix=fitz.Matrix(zoom, zoom), alpha=False
+            )
+            fd, tmp_png = tempfile.mkstemp(dir=os.path.dirname(png_path), suffix=".png")
+            os.close(fd)
+            pixmap.save(tmp_png)
+            os.replace(tmp_png, png_path)
+
+    fd, tmp_meta = tempfile.mkstemp(dir=os.path.dirname(meta_path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, meta_path)
+    return key
+
+
+def build_preview_quietly(filename):
+    """build_preview para flujos de ingreso: un error no debe interrumpirlos"""
+    try:
+        return build_preview(filename)
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo generar la vista previa de {filename}: {e}")
+        return None
+
+
+class _BuildJob(QRunnable):
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+
+    def run(self):
+        build_preview_quietly(self.filename)
+
+
+def build_preview_in_background(filename):
+    """Encola build_preview en el pool global de Qt (para el hilo de UI)"""
+    QThreadPool.globalInstance().start(_BuildJob(filename))
+
+
+def extract_pages(filename, destination, first_page, last_page):
+    """
+    Copia las páginas `first_page`..`last_page` (desde 1, inclusive) a un PDF
+    nuevo en `destination`. Solo se leen los objetos de esas páginas.
+    """
+    if fitz is None:
+        raise RuntimeError("PyMuPDF (fitz) no está instalado.")
+    source_path = resolve_pdf(filename)
+    directory = os.path.dirname(os.path.abspath(destination))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".pdf")
+    os.close(fd)
+    try:
+        with fitz.open(source_path) as source, fitz.open() as extracted:
+            extracted.insert_pdf(
+                source, from_page=first_page - 1, to_page=last_page - 1
+            )
+            extracted.save(tmp_path, garbage=3, deflate=True)
+        os.replace(tmp_path, destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class PageImageCache:
+    """LRU de QImage acotada por la memoria que ocupan las imágenes"""
+
+    def __init__(self, max_bytes=PAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            previous = self._images.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.sizeInBytes()
+            self._images[key] = image
+            self._bytes += image.sizeInBytes()
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.sizeInBytes()
+
+
+class _DocumentPool:
+    """
+    Documentos abiertos recientemente, para no reabrir (ni reparar) el PDF en
+    cada página. MuPDF no admite usar un documento desde dos hilos a la vez,
+    por eso cada uno tiene su propio lock.
+    """
+
+    def __init__(self, size=MAX_OPEN_DOCUMENTS):
+        self.size = size
+        self._documents = OrderedDict()  # ruta -> (documento, lock)
+        self._lock = threading.Lock()
+
+    def acquire(self, path):
+        with self._lock:
+            entry = self._documents.get(path)
+            if entry is None:
+                entry = (fitz.open(path), threading.Lock())
+                self._documents[path] = entry
+                while len(self._documents) > self.size:
+                    _, (document, lock) = self._documents.popitem(last=False)
+                    with lock:
+                        document.close()
+            else:
+                self._documents.move_to_end(path)
+            return entry
+
+
+_documents = _DocumentPool()
+
+
+def render_page(path, page_number):
+    """
+    Renderiza una página (desde 1); retorna (QImage, cantidad de páginas).
+    Seguro fuera del hilo de UI.
+    """
+    zoom = _zoom()
+    while True:
+        document, lock = _documents.acquire(path)
+        with lock:
+            # Pudo cerrarse por desalojo del pool entre acquire() y el lock
+            if document.is_closed:
+                continue
+            pixmap = document.load_page(page_number - 1).get_pixmap(
+                matrix=fitz.Matrix(zoom, zoom), alpha=False
+            )
+            image = QImage(
+                pixmap.samples,
+                pixmap.width,
+                pixmap.height,
+                pixmap.stride,
+                QImage.Format_RGB888,
+            ).copy()  # copy(): los bytes de PyMuPDF se liberan con el pixmap
+            return image, document.page_count
+
+
+def load_first_page(filename):
+    """
+    Primera página y cantidad de páginas desde el sidecar (generándolo si
+    falta), o None
+    """
+    if fitz is None or not filename:
+        return None
+    key = build_preview_quietly(filename)
+    if key is None:
+        return None
+    meta_path, png_path = _sidecar_paths(key)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            page_count = json.load(f)["page_count"]
+    except (OSError, ValueError, KeyError):
+        return None
+    image = QImage(png_path)
+    return None if image.isNull() else (image, page_count)
+
+
+class _RenderJob(QRunnable):
+    def __init__(self, service, filename, page_number):
+        super().__init__()
+        self.service = service
+        self.filename = filename
+        self.page_number = page_number
+
+    def run(self):
+        result = None
+        try:
+            if self.page_number == 1:
+                result = load_first_page(self.filename)
+            if result is None:
+                # Sin sidecar (p. ej. el almacén no admite escritura): directo
+                result = render_page(resolve_pdf(self.filename), self.page_number)
+        except Exception as e:
+            print(
+                f"ADVERTENCIA: No se pudo renderizar la página {self.page_number} "
+                f"de {self.filename}: {e}"
+            )
+        image, page_count = result or (QImage(), 0)
+        self.service._rendered.emit(self.filename, self.page_number, image, page_count)
+
+
+class PdfPreviewService(QObject):
+    """
+    Entrega páginas renderizadas sin bloquear la UI. page() responde desde la
+    LRU o encola el render y retorna None; al terminar se emite
+    page_ready(filename, página) y basta con volver a llamar a page(). El
+    primer render de un PDF emite además document_ready(filename, páginas),
+    con 0 si no se pudo abrir.
+    """
+
+    page_ready = pyqtSignal(str, int)
+    document_ready = pyqtSignal(str, int)
+    _rendered = pyqtSignal(str, int, QImage, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cache = PageImageCache()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._pending = set()
+        self._page_counts = {}
+        self._rendered.connect(self._on_rendered)
+
+    def available(self):
+        return fitz is not None
+
+    def page_count(self, filename):
+        """
+        Cantidad de páginas si ya se renderizó alguna página del PDF, o None.
+        No toca el disco: para conocerla se pide page(filename, 1) y se
+        espera document_ready.
+        """
+        return self._page_counts.get(filename)
+
+    def page(self, filename, page_number, prefetch=PREFETCH_PAGES):
+        key = (filename, page_number)
+        image = self.cache.get(key)
+        last_page = self._page_counts.get(filename, page_number)
+        for ahead in range(1, prefetch + 1):
+            if page_number + ahead <= last_page:
+                self._request((filename, page_number + ahead))
+        if image is not None:
+            return QPixmap.fromImage(image)
+        self._request(key)
+        return None
+
+    def _request(self, key):
+        if key in self._pending or self.cache.get(key) is not None:
+            return
+        self._pending.add(key)
+        filename, page_number = key
+        self._pool.start(_RenderJob(self, filename, page_number))
+
+    def cancel_pending(self):
+        self._pool.clear()
+        self._pending.clear()
+
+    def _on_rendered(self, filename, page_number, image, page_count):
+        self._pending.discard((filename, page_number))
+        if filename not in self._page_counts and (page_count or page_number == 1):
+            if page_count:
+                self._page_counts[filename] = page_count
+            self.document_ready.emit(filename, page_count)
+        if image.isNull():
+            return
+        self.cache.put((filename, page_number), image)
+        self.page_ready.emit(filename, page_number)
+
+
+_service = None
+
+
+def preview_service():
+    """Instancia compartida; debe crearse después de la QApplication"""
+    global _service
+    if _service is None:
+        _service = PdfPreviewService()
+    return _service
+
+
+class PdfPreviewPanel(QWidget):
+    """
+    Visor de páginas con navegación; muestra la primera página al instante.
+    Emite loaded(páginas) cuando se conoce la cantidad de páginas del PDF
+    mostrado (0 si no hay PDF o no se pudo abrir).
+    """
+
+    loaded = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.service = preview_service()
+        self.filename = None
+        self.page_count = 0
+        self._requested_page = 1
+
+        self.page_label = QLabel(self)
+        self.page_label.setFixedSize(*PANEL_SIZE)
+        self.page_label.setAlignment(Qt.AlignCenter)
+        self.previous_button = QPushButton("◀", self)
+        self.next_button = QPushButton("▶", self)
+        self.page_spin = QSpinBox(self)
+        self.page_spin.setMinimum(1)
+        self.count_label = QLabel(self)
+
+        self.previous_button.clicked.connect(
+            lambda: self.page_spin.setValue(self.page_spin.value() - 1)
+        )
+        self.next_button.clicked.connect(
+            lambda: self.page_spin.setValue(self.page_spin.value() + 1)
+        )
+        self.page_spin.valueChanged.connect(self._show_current)
+        self.service.page_ready.connect(self._on_page_ready)
+        self.service.document_ready.connect(self._on_document_ready)
+
+        navigation = QHBoxLayout()
+        navigation.addWidget(self.previous_button)
+        navigation.addWidget(self.page_spin)
+        navigation.addWidget(self.count_label)
+        navigation.addWidget(self.next_button)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.page_label)
+        layout.addLayout(navigation)
+        self.show_pdf(None)
+
+    def show_pdf(self, filename, page=1):
+        """
+        Muestra `filename` (un directorio_pdf) en la página indicada. Si aún
+        no se conoce su cantidad de páginas, se pide la primera y el resto
+        sigue en _on_document_ready.
+        """
+        self.service.cancel_pending()
+        self.filename = filename
+        self._requested_page = page
+        page_count = self.service.page_count(filename) if filename else 0
+        if page_count is None and self.service.available():
+            self.page_count = 0
+            self._set_navigation_enabled(False)
+            self.count_label.clear()
+            self.page_label.setPixmap(QPixmap())
+            self.page_label.setText("Cargando página...")
+            self.service.page(filename, 1)
+            return
+        self._show_document(page_count or 0)
+
+    def _set_navigation_enabled(self, enabled):
+        for widget in (self.previous_button, self.next_button, self.page_spin):
+            widget.setEnabled(enabled)
+
+    def _on_document_ready(self, filename, page_count):
+        if filename == self.filename and not self.page_count:
+            self._show_document(page_count)
+
+    def _show_document(self, page_count):
+        self.page_count = page_count
+        enabled = page_count > 0
+        self._set_navigation_enabled(enabled)
+        if not enabled:
+            self.count_label.clear()
+            self.page_label.setPixmap(QPixmap())
+            if self.filename and not self.service.available():
+                self.page_label.setText("Vista previa no disponible (falta PyMuPDF)")
+            else:
+                self.page_label.setText("Sin PDF")
+            self.loaded.emit(0)
+            return
+
+        self.count_label.setText(f"de {page_count}")
+        self.page_spin.blockSignals(True)
+        self.page_spin.setMaximum(page_count)
+        self.page_spin.setValue(min(max(self._requested_page, 1), page_count))
+        self.page_spin.blockSignals(False)
+        self._show_current()
+        self.loaded.emit(page_count)
+
+    def _show_current(self, *_):
+        if not self.filename or not self.page_count:
+            return
+        pixmap = self.service.page(self.filename, self.page_spin.value())
+        if pixmap is None:
+            self.page_label.setPixmap(QPixmap())
+            self.page_label.setText("Cargando página...")
+        else:
+            self.page_label.setPixmap(
+                pixmap.scaled(
+                    PANEL_SIZE[0],
+                    PANEL_SIZE[1],
+                    Qt.KeepAspectRatio,
+                    Qt.SmoothTransformation,
+                )
+            )
+
+    def _on_page_ready(self, filename, page_number):
+        if filename == self.filename and page_number == self.page_spin.value():
+            self._show_current()
+
+    def release(self):
+        """Desconecta el panel del servicio compartido (al cerrar la pantalla)"""
+        self.service.cancel_pending()
+        self.service.page_ready.disconnect(self._on_page_ready)
+        self.service.document_ready.disconnect(self._on_document_ready)
@@ -0,0 +1,299 @@
+"""
+Control de calidad automático de PDFs digitalizados (CU24).
+
+Este módulo no depende de Qt ni de la base de datos para que los procesos
+del pool arranquen rápido; la pantalla le pasa la lista de libros a revisar.
+"""
+
+import hashlib
+import json
+import os
+import statistics
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Subir este número invalida los resultados guardados en caché
+ANALYZER_VERSION = 2
+
+DEFAULT_THRESHOLDS = {
+    "min_dpi": 200,
+    "min_page_width_pt": 288,  # 4 pulgadas
+    "min_page_height_pt": 360,  # 5 pulgadas
+    "page_size_tolerance": 0.05,  # desviación relativa respecto a la mediana
+    "blank_stddev": 4.0,  # desviación de grises bajo la cual la página está vacía
+    "duplicate_distance": 3,  # bits distintos entre hashes de páginas seguidas
+    "page_count_tolerance": 0,
+}
+
+# Peso de cada tipo de problema para ordenar la cola de revisión
+ISSUE_WEIGHTS = {
+    "missing": 100,
+    "unreadable": 100,
+    "page_count": 50,
+    "duplicate": 20,
+    "low_dpi": 15,
+    "blank": 10,
+    "page_size": 5,
+}
+
+_THUMB_WIDTH = 32
+_HASH_SIZE = 8
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _issue(kind, detail, page=None):
+    return {"type": kind, "page": page, "detail": detail}
+
+
+def _page_signature(page):
+    """Media, desviación y hash promedio (aHash de 64 bits) de una miniatura gris"""
+    zoom = _THUMB_WIDTH / max(page.rect.width, 1)
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False
+    )
+    width, height, stride = pix.width, pix.height, pix.stride
+    samples = pix.samples
+    pixels = [samples[y * stride + x] for y in range(height) for x in range(width)]
+
+    mean = sum(pixels) / len(pixels)
+    stddev = statistics.pstdev(pixels, mean)
+
+    cells = []
+    for cy in range(_HASH_SIZE):
+        y0, y1 = cy * height // _HASH_SIZE, max((cy + 1) * height // _HASH_SIZE, 1)
+        for cx in range(_HASH_SIZE):
+            x0, x1 = cx * width // _HASH_SIZE, max((cx + 1) * width // _HASH_SIZE, 1)
+            block = [
+                pixels[y * width + x] for y in range(y0, y1) for x in range(x0, x1)
+            ]
+            cells.append(sum(block) / len(block) if block else mean)
+    cells_mean = sum(cells) / len(cells)
+    page_hash = 0
+    for value in cells:
+        page_hash = (page_hash << 1) | (value > cells_mean)
+
+    return mean, stddev, page_hash
+
+
+def _page_dpi(page):
+    """DPI efectivo de la imagen escaneada más grande de la página"""
+    best = None
+    for image in page.get_images(full=True):
+        image_width = image[2]
+        if page.rect.width and image_width:
+            dpi = image_width / (page.rect.width / 72.0)
+            best = dpi if best is None else max(best, dpi)
+    return best
+
+
+def analyze_pdf(path, thresholds):
+    """
+    Analiza el contenido de un PDF. El resultado depende solo de los bytes
+    del archivo y de `thresholds`, por eso se puede guardar por hash. Una
+    página que no se puede leer o renderizar queda como "unreadable" y el
+    análisis sigue con las demás.
+    """
+    issues = []
+    try:
+        document = fitz.open(path)
+    except Exception as e:
+        return {"page_count": 0, "issues": [_issue("unreadable", str(e))]}
+
+    with document:
+        sizes = []  # (página, ancho, alto) de las páginas legibles
+        previous_hash = None
+        for number in range(1, document.page_count + 1):
+            try:
+                page = document.load_page(number - 1)
+                width, height = page.rect.width, page.rect.height
+                dpi = _page_dpi(page)
+                _, stddev, page_hash = _page_signature(page)
+            except Exception as e:
+                detail = f"No se pudo leer la página: {e}"
+                issues.append(_issue("unreadable", detail, number))
+                previous_hash = None
+                continue
+            sizes.append((number, width, height))
+
+            if (
+                width < thresholds["min_page_width_pt"]
+                or height < thresholds["min_page_height_pt"]
+            ):
+                detail = f"Página pequeña: {width:.0f}x{height:.0f} pt"
+                issues.append(_issue("page_size", detail, number))
+
+            if dpi is not None and dpi < thresholds["min_dpi"]:
+                detail = f"Resolución de {dpi:.0f} DPI"
+                issues.append(_issue("low_dpi", detail, number))
+
+            if stddev < thresholds["blank_stddev"]:
+                issues.append(_issue("blank", "Página en blanco", number))
+            elif previous_hash is not None:
+                distance = bin(page_hash ^ previous_hash).count("1")
+                if distance <= thresholds["duplicate_distance"]:
+                    detail = f"Casi idéntica a la página {number - 1}"
+                    issues.append(_issue("duplicate", detail, number))
+            previous_hash = page_hash if stddev >= thresholds["blank_stddev"] else None
+
+        if sizes:
+            median_w = statistics.median(w for _, w, _ in sizes)
+            median_h = statistics.median(h for _, _, h in sizes)
+            tolerance = thresholds["page_size_tolerance"]
+            for number, w, h in sizes:
+                if (
+                    abs(w - median_w) > median_w * tolerance
+                    or abs(h - median_h) > median_h * tolerance
+                ):
+                    detail = "Tamaño distinto al resto del libro"
+                    issues.append(_issue("page_size", detail, number))
+
+        return {"page_count": document.page_count, "issues": issues}
+
+
+def _hash_job(path):
+    return path, file_sha256(path)
+
+
+def _analyze_job(args):
+    sha256, path, thresholds = args
+    return sha256, analyze_pdf(path, thresholds)
+
+
+class PdfQualityEngine:
+    """
+    Analiza PDFs en un pool de procesos y guarda los resultados por SHA-256.
+
+    Un archivo cuyo tamaño y fecha de modificación no cambiaron ni siquiera se
+    vuelve a leer; uno que cambió se re-hashea y solo se analiza si su
+    contenido es nuevo.
+    """
+
+    def __init__(self, cache_file, thresholds=None, max_workers=None):
+        self.cache_file = cache_file
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.max_workers = max_workers
+        self._cache = self._load_cache()
+
+    def _fingerprint(self):
+        return json.dumps(
+            {"version": ANALYZER_VERSION, "thresholds": self.thresholds}, sort_keys=True
+        )
+
+    def _load_cache(self):
+        empty = {"fingerprint": self._fingerprint(), "by_hash": {}, "by_path": {}}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return empty
+        if cache.get("fingerprint") != empty["fingerprint"]:
+            # Umbrales o analizador distintos: se conservan solo los hashes
+            empty["by_path"] = cache.get("by_path", {})
+            return empty
+        return cache
+
+    def _save_cache(self):
+        directory = os.path.dirname(self.cache_file) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._cache, f)
+        os.replace(tmp_path, self.cache_file)
+
+    def scan(self, books):
+        """
+        `books` es una lista de (libro_id, ruta_pdf, numero_paginas).
+        Retorna reportes ordenados de mayor a menor prioridad.
+        """
+        if fitz is None:
+            raise RuntimeError("PyMuPDF (fitz) no está instalado.")
+
+        books = list(books)
+        by_path = self._cache["by_path"]
+        by_hash = self._cache["by_hash"]
+
+        hashes = {}
+        to_hash = []
+        for _, path, _ in books:
+            if not path or not os.path.exists(path):
+                continue
+            stat = os.stat(path)
+            known = by_path.get(path)
+            if (
+                known
+                and known["size"] == stat.st_size
+                and known["mtime"] == stat.st_mtime
+            ):
+                hashes[path] = known["sha256"]
+            else:
+                to_hash.append(path)
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            for path, sha256 in pool.map(_hash_job, to_hash):
+                stat = os.stat(path)
+                by_path[path] = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "sha256": sha256,
+                }
+                hashes[path] = sha256
+
+            pending = {}
+            for path, sha256 in hashes.items():
+                if sha256 not in by_hash:
+                    pending.setdefault(sha256, path)
+            jobs = [(sha256, path, self.thresholds) for sha256, path in pending.items()]
+            for sha256, result in pool.map(_analyze_job, jobs):
+                by_hash[sha256] = result
+
+        self._save_cache()
+        reports = [self._report(book, hashes) for book in books]
+        reports.sort(key=lambda report: (-report["score"], report["book_id"]))
+        return reports
+
+    def _report(self, book, hashes):
+        book_id, path, expected_pages = book
+        sha256 = hashes.get(path)
+        if sha256 is None:
+            result = {
+                "page_count": 0,
+                "issues": [_issue("missing", "Archivo no encontrado")],
+            }
+        else:
+            result = self._cache["by_hash"][sha256]
+
+        issues = list(result["issues"])
+        page_count = result["page_count"]
+        tolerance = self.thresholds["page_count_tolerance"]
+        if (
+            expected_pages
+            and page_count
+            and abs(page_count - expected_pages) > tolerance
+        ):
+            detail = (
+                f"El PDF tiene {page_count} páginas; "
+                f"el registro indica {expected_pages}"
+            )
+            issues.append(_issue("page_count", detail))
+
+        return {
+            "book_id": book_id,
+            "path": path,
+            "sha256": sha256,
+            "page_count": page_count,
+            "expected_pages": expected_pages,
+            "issues": issues,
+            "score": sum(ISSUE_WEIGHTS.get(issue["type"], 1) for issue in issues),
+        }
@@ -0,0 +1,522 @@
+"""
+Almacén de PDFs direccionado por contenido.
+
+Cada PDF se guarda una sola vez en `pdf_store/objects/ab/cd/<sha256>.pdf`
+(junto a la carpeta de libros). El índice vive en PostgreSQL (pdf_nombres y
+pdf_objetos, migración 007) y traduce el nombre que guarda
+`libros.directorio_pdf` al SHA-256 del contenido; así todos los clientes ven
+el mismo índice aunque `books/` esté en una carpeta de red. Donde el sistema
+de archivos permite reflink (copia por referencia), el archivo de `books/`
+que repite un contenido ya guardado pasa a compartir sus bloques con el
+objeto, y las copias idénticas no ocupan espacio; el código que lee
+`books/` sigue funcionando igual.
+
+La verificación de los hashes a velocidad limitada no corre en los
+clientes: se programa en un solo equipo de mantenimiento (cron).
+
+Uso por consola (desde old_python/):
+    python -m utils.pdf_store --ingest-all     # migra books/ al almacén
+    python -m utils.pdf_store --scrub --rate 16
+"""
+
+import argparse
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from db.database import Database
+from utils.path_utils import get_books_path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl(FICLONE) de Linux: copia por referencia en btrfs/XFS
+_FICLONE = 0x40049409
+CHUNK_SIZE = 1 << 20
+DEFAULT_SCRUB_RATE_MB = 8
+# Tiempo mínimo entre dos verificaciones completas del mismo objeto
+SCRUB_INTERVAL_SECONDS = 7 * 24 * 3600
+
+
+def get_store_root():
+    """`pdf_store/` junto a `books/`; se puede reubicar con ARCHIBOX_PDF_STORE"""
+    configured = os.environ.get("ARCHIBOX_PDF_STORE")
+    if configured:
+        return configured
+    books_dir = os.path.dirname(get_books_path("libro.pdf"))
+    return os.path.join(os.path.dirname(books_dir), "pdf_store")
+
+
+class RateLimiter:
+    """Balde de fichas: consume() duerme lo necesario para no pasar el límite"""
+
+    def __init__(self, bytes_per_second):
+        self.rate = float(bytes_per_second)
+        self._allowance = self.rate
+        self._last = time.monotonic()
+
+    def consume(self, amount):
+        now = time.monotonic()
+        self._allowance = min(
+            self.rate, self._allowance + (now - self._last) * self.rate
+        )
+        self._last = now
+        self._allowance -= amount
+        if self._allowance < 0:
+            time.sleep(-self._allowance / self.rate)
+
+
+def hash_file(path, limiter=None, stop_event=None):
+    """
+    SHA-256 leyendo por bloques. Con `limiter` respeta la velocidad máxima y
+    avisa al sistema que no conserve las páginas leídas en caché, para no
+    desplazar a las lecturas de los usuarios. Retorna None si se detuvo.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        offset = 0
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            if stop_event is not None and stop_event.is_set():
+                return None
+            digest.update(chunk)
+            if limiter is not None:
+                limiter.consume(len(chunk))
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(
+                        f.fileno(), offset, len(chunk), os.POSIX_FADV_DONTNEED
+                    )
+            offset += len(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(source, destination):
+    """Copia por referencia (sin duplicar bloques) si el sistema lo permite"""
+    if fcntl is None:
+        return False
+    try:
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return True
+    except OSError:
+        if os.path.exists(destination):
+            os.remove(destination)
+        return False
+
+
+def _hardlink(source, destination):
+    try:
+        os.link(source, destination)
+        return True
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        return False
+
+
+def _share_or_copy(source, destination, allow_hardlink=True, allow_copy=True):
+    """
+    Crea `destination` con el contenido de `source` compartiendo los bloques:
+    reflink (copia por referencia: cada archivo sigue siendo independiente),
+    si no enlace duro y, como último recurso, copia. Es atómico (archivo
+    temporal + replace). Retorna "reflink", "hardlink", "copy" o None si no
+    se pudo con los métodos permitidos.
+    """
+    directory = os.path.dirname(destination)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    os.remove(tmp_path)
+    try:
+        if _reflink(source, tmp_path):
+            method = "reflink"
+        elif allow_hardlink and _hardlink(source, tmp_path):
+            method = "hardlink"
+        elif allow_copy:
+            shutil.copyfile(source, tmp_path)
+            method = "copy"
+        else:
+            return None
+        os.replace(tmp_path, destination)
+        return method
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class PdfStore:
+    """
+    Objetos por SHA-256 en directorios de dos niveles; el índice de nombres
+    está en la base de datos. Cada operación usa su propia sesión, así se
+    puede llamar desde cualquier hilo.
+    """
+
+    def __init__(self, root=None, session_factory=None):
+        self.root = root or get_store_root()
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        self._new_session = session_factory or Database().get_session
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def _session(self):
+        session = self._new_session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def object_path(self, sha256):
+        return os.path.join(
+            self.root, "objects", sha256[:2], sha256[2:4], f"{sha256}.pdf"
+        )
+
+    # ------------------------------------------------------------------
+    # Resolución
+    # ------------------------------------------------------------------
+
+    def lookup(self, name):
+        """SHA-256 del PDF guardado con ese nombre, o None"""
+        with self._session() as session:
+            return session.execute(
+                text("SELECT sha256 FROM pdf_nombres WHERE nombre = :nombre"),
+                {"nombre": name},
+            ).scalar()
+
+    def lookup_many(self, names):
+        """{nombre: sha256} de los nombres indexados, en una sola consulta"""
+        names = list(set(names))
+        if not names:
+            return {}
+        with self._session() as session:
+            return dict(
+                session.execute(
+                    text(
+                        "SELECT nombre, sha256 FROM pdf_nombres "
+                        "WHERE nombre = ANY(:nombres)"
+                    ),
+                    {"nombres": names},
+                ).all()
+            )
+
+    def _read_path(self, name, sha256):
+        if sha256 is not None:
+            path = self.object_path(sha256)
+            if os.path.exists(path):
+                return path
+        return get_books_path(name)
+
+    def resolve(self, name):
+        """
+        Ruta a leer para `directorio_pdf`: el objeto del almacén si el nombre
+        está indexado, o el archivo de `books/` si todavía no se migró.
+        """
+        return self._read_path(name, self.lookup(name))
+
+    def resolve_many(self, names):
+        """{nombre: ruta} como resolve(), con una sola consulta para todos"""
+        found = self.lookup_many(names)
+        return {name: self._read_path(name, found.get(name)) for name in names}
+
+    # ------------------------------------------------------------------
+    # Ingreso
+    # ------------------------------------------------------------------
+
+    def ingest(self, source_path, name=None):
+        """
+        Guarda `source_path` en el almacén bajo `name` (por defecto, su nombre
+        de archivo). Retorna (sha256, duplicado) donde duplicado indica que
+        el contenido ya estaba guardado.
+
+        El archivo de `books/` debe poder sobrescribirse con un nuevo escaneo,
+        así que nunca queda como enlace duro de un objeto de solo lectura:
+        el objeto solo se marca de solo lectura cuando es un archivo propio
+        (reflink o copia), y un duplicado solo se comparte por reflink.
+        """
+        name = name or os.path.basename(source_path)
+        sha256 = hash_file(source_path)
+        size = os.path.getsize(source_path)
+        object_path = self.object_path(sha256)
+        previous = self.lookup(name)
+
+        with self._write_lock:
+            stale = None
+            if previous is not None and previous != sha256:
+                stale = self.object_path(previous)
+                # Si el objeto anterior era un enlace duro de este archivo, el
+                # nuevo escaneo lo sobrescribió y ya no tiene su contenido
+                if not (os.path.exists(stale) and os.path.samefile(stale, source_path)):
+                    stale = None
+
+            duplicate = os.path.exists(object_path)
+            if not duplicate:
+                method = _share_or_copy(source_path, object_path)
+                if method != "hardlink":
+                    os.chmod(object_path, 0o444)
+            elif os.path.samefile(source_path, object_path):
+                method = "hardlink"
+            else:
+                # Mismo contenido ya guardado: el original pasa a compartirlo
+                method = (
+                    _share_or_copy(
+                        object_path, source_path, allow_hardlink=False, allow_copy=False
+                    )
+                    or "copy"
+                )
+
+            with self._session() as session:
+                session.execute(
+                    text(
+                        "INSERT INTO pdf_objetos (sha256, tamano, guardado_en) "
+                        "VALUES (:sha256, :tamano, :ahora) "
+                        "ON CONFLICT (sha256) DO NOTHING"
+                    ),
+                    {"sha256": sha256, "tamano": size, "ahora": datetime.now()},
+                )
+                session.execute(
+                    text(
+                        "INSERT INTO pdf_nombres (nombre, sha256, metodo) "
+                        "VALUES (:nombre, :sha256, :metodo) "
+                        "ON CONFLICT (nombre) DO UPDATE "
+                        "SET sha256 = excluded.sha256, metodo = excluded.metodo"
+                    ),
+                    {"nombre": name, "sha256": sha256, "metodo": method},
+                )
+                if stale is not None:
+                    os.remove(stale)
+                    # Los demás nombres de ese contenido vuelven a leer books/
+                    session.execute(
+                        text(
+                            "UPDATE pdf_objetos SET estado = 'missing' "
+                            "WHERE sha256 = :sha256"
+                        ),
+                        {"sha256": previous},
+                    )
+        return sha256, duplicate
+
+    def ingest_directory(self, directory, progress=None):
+        """Migra todos los PDFs de `directory`; retorna (nuevos, duplicados)"""
+        names = sorted(n for n in os.listdir(directory) if n.lower().endswith(".pdf"))
+        new, duplicates = 0, 0
+        for done, name in enumerate(names, start=1):
+            _, duplicate = self.ingest(os.path.join(directory, name), name)
+            if duplicate:
+                duplicates += 1
+            else:
+                new += 1
+            if progress is not None:
+                progress(done, len(names))
+        return new, duplicates
+
+    # ------------------------------------------------------------------
+    # Verificación
+    # ------------------------------------------------------------------
+
+    def names_for(self, sha256):
+        with self._session() as session:
+            return list(
+                session.execute(
+                    text(
+                        "SELECT nombre FROM pdf_nombres "
+                        "WHERE sha256 = :sha256 ORDER BY nombre"
+                    ),
+                    {"sha256": sha256},
+                ).scalars()
+            )
+
+    def due_for_scrub(self, min_interval=SCRUB_INTERVAL_SECONDS, limit=100):
+        """Objetos nunca verificados o verificados hace más de `min_interval`"""
+        with self._session() as session:
+            return list(
+                session.execute(
+                    text(
+                        "SELECT sha256 FROM pdf_objetos "
+                        "WHERE verificado_en IS NULL OR verificado_en < :limite "
+                        "ORDER BY verificado_en IS NOT NULL, verificado_en "
+                        "LIMIT :cantidad"
+                    ),
+                    {
+                        "limite": datetime.now() - timedelta(seconds=min_interval),
+                        "cantidad": limit,
+                    },
+                ).scalars()
+            )
+
+    def verify(self, sha256, limiter=None, stop_event=None):
+        """
+        Recalcula el hash del objeto y guarda el resultado: 'ok', 'corrupt' o
+        'missing'. Retorna None si se interrumpió con `stop_event`.
+        """
+        path = self.object_path(sha256)
+        if not os.path.exists(path):
+            status = "missing"
+        else:
+            actual = hash_file(path, limiter, stop_event)
+            if actual is None:
+                return None
+            status = "ok" if actual == sha256 else "corrupt"
+
+        with self._session() as session:
+            session.execute(
+                text(
+                    "UPDATE pdf_objetos SET verificado_en = :ahora, estado = :estado "
+                    "WHERE sha256 = :sha256"
+                ),
+                {"ahora": datetime.now(), "estado": status, "sha256": sha256},
+            )
+        return status
+
+    def stats(self):
+        """
+        Objetos, nombres, bytes guardados y bytes ahorrados. Solo ahorran los
+        archivos de `books/` que comparten bloques con su objeto (reflink o
+        enlace duro); con copias el almacén ocupa más y el ahorro es negativo.
+        """
+        with self._session() as session:
+            objects, stored = session.execute(
+                text("SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM pdf_objetos")
+            ).one()
+            names, shared = session.execute(
+                text(
+                    "SELECT COUNT(*), COALESCE(SUM(o.tamano) FILTER "
+                    "(WHERE n.metodo IN ('reflink', 'hardlink')), 0) "
+                    "FROM pdf_nombres n JOIN pdf_objetos o ON o.sha256 = n.sha256"
+                )
+            ).one()
+            problems = session.execute(
+                text("SELECT COUNT(*) FROM pdf_objetos WHERE estado != 'ok'")
+            ).scalar()
+        return {
+            "objects": objects,
+            "names": names,
+            "stored_bytes": stored,
+            "saved_bytes": shared - stored,
+            "problems": problems,
+        }
+
+
+_store = None
+
+
+def _report_problem(sha256, status, names):
+    print(
+        f"ADVERTENCIA: PDF {status} en el almacén ({sha256}); "
+        f"afecta a: {', '.join(names) or '-'}"
+    )
+
+
+def get_pdf_store():
+    """
+    Almacén compartido del proceso. No arranca el verificador: eso le toca
+    a un solo proceso de mantenimiento (`--scrub`), no a cada cliente.
+    """
+    global _store
+    if _store is None:
+        _store = PdfStore()
+    return _store
+
+
+def resolve_pdf(filename):
+    """Ruta de lectura de un `directorio_pdf`; ver PdfStore.resolve"""
+    if not filename:
+        return None
+    try:
+        return get_pdf_store().resolve(filename)
+    except (OSError, SQLAlchemyError) as e:
+        print(f"ADVERTENCIA: Almacén de PDFs no disponible: {e}")
+        return get_books_path(filename)
+
+
+def resolve_pdfs(filenames):
+    """{directorio_pdf: ruta de lectura} de varios libros a la vez"""
+    filenames = [filename for filename in filenames if filename]
+    try:
+        return get_pdf_store().resolve_many(filenames)
+    except (OSError, SQLAlchemyError) as e:
+        print(f"ADVERTENCIA: Almacén de PDFs no disponible: {e}")
+        return {filename: get_books_path(filename) for filename in filenames}
+
+
+def store_pdf(path, name=None):
+    """Ingresa un PDF recién digitalizado; los errores no bloquean el flujo"""
+    try:
+        return get_pdf_store().ingest(path, name)
+    except (OSError, SQLAlchemyError) as e:
+        print(f"ADVERTENCIA: No se pudo guardar {path} en el almacén: {e}")
+        return None
+
+
+class StorePdfThread(QThread):
+    """
+    Ingresa un PDF fuera del hilo de UI: calcular el SHA-256 de un escaneo
+    de cientos de MB en la carpeta de red tarda segundos.
+    """
+
+    stored = pyqtSignal(str)  # nombre
+
+    def __init__(self, path, name=None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.name = name or os.path.basename(path)
+
+    def run(self):
+        store_pdf(self.path, self.name)
+        self.stored.emit(self.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--ingest-all", action="store_true", help="migra los PDFs de books/"
+    )
+    parser.add_argument(
+        "--scrub", action="store_true", help="verifica los objetos pendientes"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_SCRUB_RATE_MB,
+        help="MB/s máximos de lectura al verificar",
+    )
+    args = parser.parse_args()
+
+    store = PdfStore()
+    if args.ingest_all:
+        books_dir = os.path.dirname(get_books_path("libro.pdf"))
+        new, duplicates = store.ingest_directory(books_dir)
+        print(f"Objetos nuevos: {new}  Duplicados enlazados: {duplicates}")
+    if args.scrub:
+        limiter = RateLimiter(args.rate * 1024 * 1024)
+        while True:
+            due = store.due_for_scrub()
+            if not due:
+                break
+            for sha256 in due:
+                status = store.verify(sha256, limiter)
+                if status != "ok":
+                    _report_problem(sha256, status, store.names_for(sha256))
+
+    stats = store.stats()
+    print(
+        f"Objetos: {stats['objects']}  Nombres: {stats['names']}  "
+        f"Guardado: {stats['stored_bytes'] / 1e6:.1f} MB  "
+        f"Ahorrado: {stats['saved_bytes'] / 1e6:.1f} MB  "
+        f"Con problemas: {stats['problems']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Índice invertido persistente del texto de los PDFs digitalizados.
+
+Como pdf_quality, no depende de Qt ni de la base de datos: recibe la lista
+de (libro_id, ruta_pdf) y mantiene un SQLite con una fila de postings por
+(término, libro) que guarda las páginas donde aparece el término.
+La extracción y tokenización corren en un pool de procesos; las escrituras
+al índice se hacen desde un solo hilo.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Subir este número obliga a reindexar todo (p. ej. si cambia el tokenizador)
+INDEX_VERSION = 1
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+COMMIT_EVERY = 20
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+CREATE TABLE IF NOT EXISTS documents (
+    libro_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    page_count INTEGER NOT NULL,
+    text_pages INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE
+);
+
+-- pages: array('I') con los números de página (desde 1), en orden
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    libro_id INTEGER NOT NULL,
+    pages BLOB NOT NULL,
+    PRIMARY KEY (term_id, libro_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS postings_libro ON postings (libro_id);
+"""
+
+
+def normalize(text):
+    """Minúsculas y sin tildes, para que 'Educación' coincida con 'educacion'"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    for token in _TOKEN_RE.findall(normalize(text)):
+        if MIN_TERM_LENGTH <= len(token) <= MAX_TERM_LENGTH:
+            yield token
+
+
+def _pack(pages):
+    return array("I", pages).tobytes()
+
+
+def _unpack(blob):
+    pages = array("I")
+    pages.frombytes(blob)
+    return pages
+
+
+def extract_terms(path):
+    """
+    Extrae el texto página por página. Retorna (cantidad de páginas,
+    páginas con texto, {término: [páginas]}). Corre en los procesos del pool.
+    """
+    postings = {}
+    text_pages = 0
+    with fitz.open(path) as document:
+        page_count = document.page_count
+        for number, page in enumerate(document, start=1):
+            terms = set(tokenize(page.get_text("text")))
+            if terms:
+                text_pages += 1
+            for term in terms:
+                postings.setdefault(term, []).append(number)
+    return page_count, text_pages, postings
+
+
+def _extract_job(args):
+    libro_id, path = args
+    try:
+        return libro_id, extract_terms(path), None
+    except Exception as e:
+        return libro_id, None, str(e)
+
+
+class PdfTextIndex:
+    """Índice de texto de PDFs; una conexión por hilo, en modo WAL"""
+
+    def __init__(self, path, max_workers=None):
+        self.path = path
+        self.max_workers = max_workers
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._term_ids = None
+
+        conn = self._connection()
+        with conn:
+            conn.executescript(_SCHEMA)
+            version = conn.execute(
+                "SELECT value FROM meta WHERE key = 'version'"
+            ).fetchone()
+            if version is None or int(version[0]) != INDEX_VERSION:
+                conn.execute("DELETE FROM postings")
+                conn.execute("DELETE FROM terms")
+                conn.execute("DELETE FROM documents")
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                    (str(INDEX_VERSION),),
+                )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def _term_ids_for(self, conn, term):
+        """Ids del término; con '*' final se expande como prefijo"""
+        if term.endswith("*"):
+            prefix = term.rstrip("*")
+            if len(prefix) < MIN_TERM_LENGTH:
+                return []
+            # Rango sobre el índice único: [prefijo, prefijo + U+FFFF)
+            rows = conn.execute(
+                "SELECT id FROM terms WHERE term >= ? AND term < ?",
+                (prefix, prefix + "\uffff"),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT id FROM terms WHERE term = ?", (term,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _pages_for(self, conn, term):
+        """{libro_id: set(páginas)} de un término de la consulta"""
+        found = {}
+        for term_id in self._term_ids_for(conn, term):
+            for libro_id, blob in conn.execute(
+                "SELECT libro_id, pages FROM postings WHERE term_id = ?", (term_id,)
+            ):
+                found.setdefault(libro_id, set()).update(_unpack(blob))
+        return found
+
+    def search(self, query):
+        """
+        Libros cuyo PDF menciona todos los términos de `query` en una misma
+        página. Retorna {libro_id: [páginas]}. Un término que termina en '*'
+        busca por prefijo ('restaur*').
+        """
+        terms = []
+        for raw in query.split():
+            tokens = list(tokenize(raw))
+            if tokens and raw.endswith("*"):
+                tokens[-1] += "*"
+            terms.extend(tokens)
+        if not terms:
+            return {}
+
+        conn = self._connection()
+        result = None
+        for term in dict.fromkeys(terms):
+            found = self._pages_for(conn, term)
+            if result is None:
+                result = found
+            else:
+                result = {
+                    libro_id: pages & found[libro_id]
+                    for libro_id, pages in result.items()
+                    if libro_id in found
+                }
+                result = {key: pages for key, pages in result.items() if pages}
+            if not result:
+                return {}
+        return {libro_id: sorted(pages) for libro_id, pages in result.items()}
+
+    def book_terms(self, libro_ids, chunk=500):
+        """{libro_id: {término: cantidad de páginas}} de los libros indicados"""
+        conn = self._connection()
+        libro_ids = list(libro_ids)
+        found = {}
+        for start in range(0, len(libro_ids), chunk):
+            part = libro_ids[start : start + chunk]
+            placeholders = ", ".join("?" * len(part))
+            for libro_id, term, blob in conn.execute(
+                "SELECT p.libro_id, t.term, p.pages FROM postings AS p "
+                "JOIN terms AS t ON t.id = p.term_id "
+                f"WHERE p.libro_id IN ({placeholders})",
+                part,
+            ):
+                found.setdefault(libro_id, {})[term] = len(_unpack(blob))
+        return found
+
+    def indexed_count(self):
+        conn = self._connection()
+        return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Actualización
+    # ------------------------------------------------------------------
+
+    def _load_term_ids(self, conn):
+        if self._term_ids is None:
+            self._term_ids = dict(conn.execute("SELECT term, id FROM terms"))
+        return self._term_ids
+
+    def _remove(self, conn, libro_id):
+        conn.execute("DELETE FROM postings WHERE libro_id = ?", (libro_id,))
+        conn.execute("DELETE FROM documents WHERE libro_id = ?", (libro_id,))
+
+    def _store(self, conn, libro_id, path, stat, extracted):
+        page_count, text_pages, postings = extracted
+        term_ids = self._load_term_ids(conn)
+        new_terms = [term for term in postings if term not in term_ids]
+        for term in new_terms:
+            cursor = conn.execute("INSERT INTO terms (term) VALUES (?)", (term,))
+            term_ids[term] = cursor.lastrowid
+
+        self._remove(conn, libro_id)
+        conn.executemany(
+            "INSERT INTO postings (term_id, libro_id, pages) VALUES (?, ?, ?)",
+            (
+                (term_ids[term], libro_id, _pack(pages))
+                for term, pages in postings.items()
+            ),
+        )
+        conn.execute(
+            "INSERT INTO documents "
+            "(libro_id, path, size, mtime, page_count, text_pages) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (libro_id, path, stat.st_size, stat.st_mtime, page_count, text_pages),
+        )
+
+    def _pending(self, conn, books):
+        """Separa los libros a (re)indexar de los documentos que sobran"""
+        known = {
+            row[0]: row[1:]
+            for row in conn.execute("SELECT libro_id, path, size, mtime FROM documents")
+        }
+        pending = []
+        stats = {}
+        for libro_id, path in books:
+            if not path or not os.path.exists(path):
+                continue
+            stat = os.stat(path)
+            if known.pop(libro_id, None) != (path, stat.st_size, stat.st_mtime):
+                pending.append((libro_id, path))
+                stats[libro_id] = stat
+        # Lo que queda en `known` ya no tiene PDF (o dejó de existir)
+        return pending, stats, list(known)
+
+    def update(self, books, progress=None, stop_event=None):
+        """
+        Sincroniza el índice con `books`, lista de (libro_id, ruta_pdf).
+        Solo se extraen los PDFs nuevos o cuyo tamaño o fecha cambió.
+        `progress(hechos, total)` se llama a medida que se indexan. Si se
+        activa `stop_event` se guarda lo ya extraído y el resto queda para
+        la próxima pasada. Retorna la lista de (libro_id, error) de los PDFs
+        que fallaron.
+        """
+        if fitz is None:
+            raise RuntimeError("PyMuPDF (fitz) no está instalado.")
+
+        with self._write_lock:
+            conn = self._connection()
+            pending, stats, removed = self._pending(conn, list(books))
+            with conn:
+                for libro_id in removed:
+                    self._remove(conn, libro_id)
+            if not pending:
+                return []
+
+            errors = []
+            paths = dict(pending)
+            done = 0
+            try:
+                with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                    futures = [pool.submit(_extract_job, job) for job in pending]
+                    for future in as_completed(futures):
+                        libro_id, extracted, error = future.result()
+                        if error is None:
+                            self._store(
+                                conn,
+                                libro_id,
+                                paths[libro_id],
+                                stats[libro_id],
+                                extracted,
+                            )
+                        else:
+                            errors.append((libro_id, error))
+                        done += 1
+                        if done % COMMIT_EVERY == 0:
+                            conn.commit()
+                        if progress is not None:
+                            progress(done, len(pending))
+                        if stop_event is not None and stop_event.is_set():
+                            for waiting in futures:
+                                waiting.cancel()
+                            break
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                # Los ids de términos insertados en la transacción se perdieron
+                self._term_ids = None
+                raise
+            return errors
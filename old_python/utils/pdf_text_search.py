@@ -0,0 +1,125 @@
+"""
+Búsqueda de texto dentro de los PDFs digitalizados (CU17/CU22).
+
+Un hilo en segundo plano mantiene el índice de utils.pdf_text_index al día:
+revisa la colección al iniciar, cada REINDEX_INTERVAL_SECONDS y cuando una
+pantalla avisa con request_indexing() (p. ej. CU04 al digitalizar un libro).
+"""
+
+import os
+import threading
+
+from PyQt5.QtCore import QCoreApplication, QThread, pyqtSignal
+from db.database import Database
+from db.models import Libro
+from utils.cache_paths import get_cache_dir
+from utils.pdf_store import resolve_pdfs
+from utils.pdf_text_index import PdfTextIndex
+
+REINDEX_INTERVAL_SECONDS = 300
+MAX_LISTED_PAGES = 12
+
+
+class PdfIndexThread(QThread):
+    """Indexa los PDFs nuevos o modificados; cada pasada solo lee los cambios"""
+
+    progress = pyqtSignal(int, int)
+    indexed = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, index, interval=REINDEX_INTERVAL_SECONDS, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def index_now(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _digitized_books(self):
+        session = Database().get_session()
+        try:
+            rows = (
+                session.query(Libro.id, Libro.directorio_pdf)
+                .filter(Libro.directorio_pdf.isnot(None))
+                .all()
+            )
+        finally:
+            session.close()
+        paths = resolve_pdfs(filename for _, filename in rows)
+        return [(libro_id, paths[filename]) for libro_id, filename in rows if filename]
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                errors = self.index.update(
+                    self._digitized_books(),
+                    progress=self.progress.emit,
+                    stop_event=self._stop,
+                )
+                for libro_id, error in errors:
+                    self.failed.emit(f"Libro {libro_id}: {error}")
+                self.indexed.emit(self.index.indexed_count())
+            except Exception as e:
+                self.failed.emit(str(e))
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+_index = None
+_index_thread = None
+
+
+def _report_index_failure(message):
+    print(f"ADVERTENCIA: Índice de texto de PDFs: {message}")
+
+
+def get_pdf_index():
+    """Índice compartido; la primera llamada arranca el hilo de indexación"""
+    global _index, _index_thread
+    if _index is None:
+        _index = PdfTextIndex(os.path.join(get_cache_dir("pdf_text"), "index.sqlite3"))
+        _index_thread = PdfIndexThread(_index)
+        _index_thread.failed.connect(_report_index_failure)
+        _index_thread.start()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_stop_indexing)
+    return _index
+
+
+def _stop_indexing():
+    """Al salir: Qt no debe destruir el hilo mientras indexa"""
+    _index_thread.stop()
+    _index_thread.wait()
+
+
+def request_indexing():
+    """Pide indexar ya los PDFs nuevos (tras digitalizar un libro)"""
+    get_pdf_index()
+    _index_thread.index_now()
+
+
+def search_pdf_text(query):
+    """
+    {libro_id: [páginas]} de los libros cuyo PDF menciona todos los términos
+    de `query` en una misma página. Vacío si el término es muy corto.
+    """
+    try:
+        return get_pdf_index().search(query)
+    except Exception as e:
+        _report_index_failure(e)
+        return {}
+
+
+def format_pages(pages, limit=MAX_LISTED_PAGES):
+    """'3, 15, 27 (+9 más)' para mostrar en tablas y detalles"""
+    listed = ", ".join(str(page) for page in pages[:limit])
+    if len(pages) > limit:
+        listed += f" (+{len(pages) - limit} más)"
+    return listed
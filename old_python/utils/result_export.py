@@ -0,0 +1,292 @@
+"""
+Exportación de resultados de búsqueda (CU17/CU18) a CSV, XLSX o Parquet.
+
+Las filas se leen con un cursor del servidor (stream_results + yield_per)
+de a EXPORT_CHUNK_ROWS y cada bloque se escribe antes de pedir el
+siguiente, así la memoria no depende del tamaño del resultado. Se leen
+columnas planas (hot_queries.book_export_query / user_export_query), no
+objetos del ORM.
+
+ExportThread hace el trabajo fuera del hilo de UI con su propia sesión;
+start_export() agrega el diálogo de archivo y la barra de progreso con
+botón de cancelar. El archivo se escribe aparte y solo reemplaza al
+destino si la exportación termina; al cancelar o fallar se borra.
+"""
+
+import csv
+import datetime
+import os
+import threading
+
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
+from sqlalchemy import func, select
+from db.database import Database
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_CHUNK_ROWS = 5000
+# Límite de filas de una hoja de Excel (contando el encabezado)
+XLSX_MAX_ROWS = 1048576
+
+FILE_FILTERS = {
+    "csv": "CSV (*.csv)",
+    "xlsx": "Excel (*.xlsx)",
+    "parquet": "Parquet (*.parquet)",
+}
+
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        # Con BOM para que Excel reconozca las tildes
+        self._file = open(path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class XlsxWriter:
+    """openpyxl en modo write_only: las filas van a disco, no a memoria"""
+
+    def __init__(self, path, columns):
+        if openpyxl is None:
+            raise RuntimeError("openpyxl no está instalado.")
+        self.path = path
+        self._book = openpyxl.Workbook(write_only=True)
+        self._sheet = self._book.create_sheet("Resultados")
+        self._sheet.append([name for name, _ in columns])
+        self._rows = 1
+
+    def write(self, rows):
+        self._rows += len(rows)
+        if self._rows > XLSX_MAX_ROWS:
+            raise RuntimeError(
+                f"Excel admite hasta {XLSX_MAX_ROWS - 1} filas; "
+                "exporte a CSV o Parquet."
+            )
+        for row in rows:
+            self._sheet.append(list(row))
+
+    def close(self):
+        self._book.save(self.path)
+
+
+def _arrow_type(python_type):
+    if python_type is bool:
+        return pyarrow.bool_()
+    if python_type is int:
+        return pyarrow.int64()
+    if python_type is float:
+        return pyarrow.float64()
+    if python_type is datetime.datetime:
+        return pyarrow.timestamp("us")
+    if python_type is datetime.date:
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+class ParquetWriter:
+    """Un row group por bloque leído"""
+
+    def __init__(self, path, columns):
+        if pyarrow is None:
+            raise RuntimeError("pyarrow no está instalado.")
+        self._schema = pyarrow.schema(
+            [(name, _arrow_type(python_type)) for name, python_type in columns]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        arrays = [
+            pyarrow.array(values, type=field.type)
+            for values, field in zip(zip(*rows), self._schema)
+        ]
+        self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter, "parquet": ParquetWriter}
+
+
+def export_format(path):
+    """'csv', 'xlsx' o 'parquet' según la extensión; None si no se reconoce"""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in WRITERS else None
+
+
+def _column_types(statement):
+    columns = []
+    for column in statement.selected_columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        columns.append((column.key, python_type))
+    return columns
+
+
+def count_rows(session, statement, params):
+    return session.execute(
+        select(func.count()).select_from(statement.order_by(None).subquery()),
+        params,
+    ).scalar()
+
+
+def export_rows(
+    session,
+    statement,
+    params,
+    path,
+    fmt=None,
+    chunk_size=EXPORT_CHUNK_ROWS,
+    progress=None,
+    cancelled=None,
+):
+    """
+    Escribe en `path` las filas de `statement` y retorna cuántas escribió, o
+    None si `cancelled()` pidió detenerse. `progress(filas)` se llama tras
+    cada bloque.
+    """
+    fmt = fmt or export_format(path)
+    if fmt not in WRITERS:
+        raise ValueError(f"Formato de exportación no soportado: {fmt}")
+
+    tmp_path = f"{path}.part"
+    writer = WRITERS[fmt](tmp_path, _column_types(statement))
+    written = 0
+    completed = False
+    result = None
+    try:
+        result = session.execute(
+            statement.execution_options(stream_results=True, yield_per=chunk_size),
+            params,
+        )
+        for chunk in result.partitions():
+            if cancelled is not None and cancelled():
+                break
+            writer.write(chunk)
+            written += len(chunk)
+            if progress is not None:
+                progress(written)
+        else:
+            completed = True
+    finally:
+        # Cierra el cursor del servidor aunque no se haya leído todo
+        if result is not None:
+            result.close()
+        writer.close()
+        if completed:
+            os.replace(tmp_path, path)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written if completed else None
+
+
+class ExportThread(QThread):
+    """Exporta con su propia sesión; cancel() se atiende entre bloques"""
+
+    progress = pyqtSignal(int, int)  # filas escritas, total (0 si no se sabe)
+    done = pyqtSignal(str, int)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, statement, params, path, parent=None):
+        super().__init__(parent)
+        self.statement = statement
+        self.params = params
+        self.path = path
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        session = Database().get_session()
+        try:
+            total = count_rows(session, self.statement, self.params)
+            self.progress.emit(0, total)
+            written = export_rows(
+                session,
+                self.statement,
+                self.params,
+                self.path,
+                progress=lambda rows: self.progress.emit(rows, total),
+                cancelled=self._cancel.is_set,
+            )
+            if written is None:
+                self.cancelled.emit()
+            else:
+                self.done.emit(self.path, written)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            session.close()
+
+
+def start_export(parent, statement, params, default_name):
+    """
+    Pide el destino, muestra el progreso y arranca la exportación.
+    Retorna el ExportThread (el llamador debe conservar la referencia) o
+    None si el usuario no eligió archivo.
+    """
+    path, selected_filter = QFileDialog.getSaveFileName(
+        parent, "Exportar resultados", default_name, ";;".join(FILE_FILTERS.values())
+    )
+    if not path:
+        return None
+    if export_format(path) is None:
+        for fmt, file_filter in FILE_FILTERS.items():
+            if file_filter == selected_filter:
+                path = f"{path}.{fmt}"
+                break
+        else:
+            path = f"{path}.csv"
+
+    dialog = QProgressDialog("Exportando resultados...", "Cancelar", 0, 0, parent)
+    dialog.setWindowTitle("Exportar")
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(300)
+
+    thread = ExportThread(statement, params, path, parent)
+
+    def on_progress(rows, total):
+        if total and dialog.maximum() != total:
+            dialog.setMaximum(total)
+        dialog.setValue(min(rows, total) if total else rows)
+        dialog.setLabelText(f"Exportando resultados... {rows} de {total} filas")
+
+    def on_done(path, rows):
+        dialog.close()
+        QMessageBox.information(
+            parent, "Exportar", f"Se exportaron {rows} filas a:\n{path}"
+        )
+
+    def on_failed(message):
+        dialog.close()
+        QMessageBox.critical(
+            parent, "Error", f"No se pudieron exportar los resultados:\n{message}"
+        )
+
+    thread.progress.connect(on_progress)
+    thread.done.connect(on_done)
+    thread.failed.connect(on_failed)
+    thread.cancelled.connect(dialog.close)
+    dialog.canceled.connect(thread.cancel)
+    thread.start()
+    return thread
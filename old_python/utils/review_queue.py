@@ -0,0 +1,501 @@
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QPixmap, QKeySequence
+from PyQt5.QtWidgets import (
+    QWidget,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QShortcut,
+    QHBoxLayout,
+    QVBoxLayout,
+    QMessageBox,
+)
+from db.database import Database
+from db.models import Libro
+from db.bulk_updates import apply_review_decisions
+from db.event_bus import publish, QA_REJECTED
+from db.warm_cache import reference_rows
+from utils.cover_cache import load_cover_thumbnail, THUMB_DETAIL
+from utils.pdf_preview import load_first_page
+
+PAGE_SIZE = (420, 560)
+
+
+def _scaled(image, size):
+    if image.isNull():
+        return None
+    return image.scaled(size[0], size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def render_first_page(filename):
+    """Primera página del PDF (desde la vista previa generada al ingresarlo)"""
+    image = load_first_page(filename)
+    return None if image is None else _scaled(image, PAGE_SIZE)
+
+
+def review_state_ids(session, *names):
+    """
+    Ids de los estados `names` (p. ej. origen, aprobación y rechazo), en el
+    mismo orden, desde la copia local de referencia. LookupError si falta
+    alguno.
+    """
+    ids_by_name = {
+        state.nombre: state.id for state in reference_rows(session, "estados_libro")
+    }
+    missing = [name for name in names if name not in ids_by_name]
+    if missing:
+        raise LookupError(f"No se encontraron los estados: {', '.join(missing)}")
+    return [ids_by_name[name] for name in names]
+
+
+class ReviewItem:
+    """Libro listo para revisar, con sus imágenes ya decodificadas"""
+
+    def __init__(self, book, cover=None, first_page=None):
+        self.book_id = book.id
+        self.titulo = book.titulo
+        self.autor = book.autor
+        self.isbn = book.isbn
+        self.numero_paginas = book.numero_paginas
+        self.estanteria = book.estanteria
+        self.espacio = book.espacio
+        self.directorio_pdf = book.directorio_pdf
+        self.cover = cover
+        self.first_page = first_page
+
+
+class ReviewPrefetcher(QThread):
+    """
+    Carga en segundo plano los siguientes libros de la cola de revisión.
+
+    Mantiene como máximo `depth` libros listos por delante del actual: cada
+    libro entregado ocupa un cupo que la UI libera con release_slot() al
+    mostrarlo. Si se indica `book_ids`, los libros se entregan en ese orden
+    (p. ej. por prioridad del análisis automático); si no, por id.
+    """
+
+    item_ready = pyqtSignal(object)
+    exhausted = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, estado_id, depth=5, with_pdf=False, book_ids=None, parent=None):
+        super().__init__(parent)
+        self.estado_id = estado_id
+        self.depth = depth
+        self.with_pdf = with_pdf
+        self.book_ids = list(book_ids) if book_ids is not None else None
+        self._slots = threading.Semaphore(depth)
+        self._stop = threading.Event()
+        self._last_id = 0
+        self._position = 0
+
+    def release_slot(self):
+        self._slots.release()
+
+    def stop(self):
+        self._stop.set()
+        self._slots.release()
+
+    def run(self):
+        # Cada hilo usa su propia sesión; las sesiones no son thread-safe
+        session = Database().get_session()
+        try:
+            while not self._stop.is_set():
+                books = self._next_batch(session)
+                if books is None:
+                    self.exhausted.emit()
+                    return
+
+                for book in books:
+                    self._slots.acquire()
+                    if self._stop.is_set():
+                        return
+                    self.item_ready.emit(self._build_item(book))
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            session.close()
+
+    def _next_batch(self, session):
+        """Siguiente grupo de libros aún en el estado de origen, o None al terminar"""
+        if self.book_ids is None:
+            books = (
+                session.query(Libro)
+                .filter(Libro.estado_id == self.estado_id, Libro.id > self._last_id)
+                .order_by(Libro.id)
+                .limit(self.depth)
+                .all()
+            )
+            if not books:
+                return None
+            self._last_id = books[-1].id
+            return books
+
+        while self._position < len(self.book_ids):
+            chunk = self.book_ids[self._position : self._position + self.depth]
+            self._position += len(chunk)
+            found = {
+                book.id: book
+                for book in session.query(Libro).filter(
+                    Libro.id.in_(chunk), Libro.estado_id == self.estado_id
+                )
+            }
+            books = [found[book_id] for book_id in chunk if book_id in found]
+            if books:
+                return books
+        return None
+
+    def _build_item(self, book):
+        cover = None
+        first_page = None
+        try:
+            cover = load_cover_thumbnail(
+                getattr(book, "directorio_img", None), THUMB_DETAIL
+            )
+            if self.with_pdf:
+                first_page = render_first_page(book.directorio_pdf)
+        except Exception as e:
+            print(
+                f"ADVERTENCIA: No se pudo preparar la vista previa "
+                f"del libro {book.id}: {e}"
+            )
+        return ReviewItem(book, cover=cover, first_page=first_page)
+
+
+class DecisionWriter(QThread):
+    """
+    Persiste las decisiones de revisión en lotes, fuera del hilo de UI.
+
+    Se hace commit cuando se acumulan `batch_size` decisiones o cuando pasan
+    `flush_interval` segundos sin nuevas decisiones. stop() guarda lo pendiente.
+    """
+
+    batch_committed = pyqtSignal(int, int)  # aplicadas, enviadas
+    batch_failed = pyqtSignal(str, int)
+
+    _FLUSH = object()
+
+    def __init__(
+        self,
+        actor_id,
+        from_estado_id,
+        reject_estado_id=None,
+        batch_size=20,
+        flush_interval=2.0,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.actor_id = actor_id
+        self.from_estado_id = from_estado_id
+        self.reject_estado_id = reject_estado_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+
+    def submit(self, decision):
+        self._queue.put(decision)
+
+    def stop(self):
+        self._queue.put(None)
+
+    def run(self):
+        session = Database().get_session()
+        pending = []
+        try:
+            while True:
+                try:
+                    decision = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    decision = self._FLUSH
+
+                if decision is None:
+                    self._flush(session, pending)
+                    return
+                if decision is not self._FLUSH:
+                    pending.append(decision)
+                if decision is self._FLUSH or len(pending) >= self.batch_size:
+                    self._flush(session, pending)
+        finally:
+            session.close()
+
+    def _flush(self, session, pending):
+        if not pending:
+            return
+        batch = list(pending)
+        pending.clear()
+        try:
+            applied = apply_review_decisions(
+                session, self.actor_id, self.from_estado_id, batch
+            )
+            rejected = [
+                decision[0]
+                for decision in batch
+                if decision[1] == self.reject_estado_id and decision[0] in applied
+            ]
+            if rejected:
+                publish(
+                    session,
+                    QA_REJECTED,
+                    ids=rejected,
+                    estado_id=self.reject_estado_id,
+                    usuario_id=self.actor_id,
+                )
+            session.commit()
+            self.batch_committed.emit(len(applied), len(batch))
+        except Exception as e:
+            session.rollback()
+            self.batch_failed.emit(str(e), len(batch))
+
+
+class ReviewQueuePanel(QWidget):
+    """
+    Modo de revisión rápida: muestra un libro a la vez y se decide con el
+    teclado (A = aprobar, R = rechazar, S = omitir). La carga del siguiente
+    libro y el guardado de decisiones ocurren en hilos de fondo.
+    """
+
+    def __init__(
+        self,
+        user,
+        source_state_id,
+        approve_state_id,
+        reject_state_id,
+        with_pdf=False,
+        depth=5,
+        observation_prefix="Control de calidad",
+        book_ids=None,
+        annotations=None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.user = user
+        self.source_state_id = source_state_id
+        self.approve_state_id = approve_state_id
+        self.reject_state_id = reject_state_id
+        self.with_pdf = with_pdf
+        self.depth = depth
+        self.observation_prefix = observation_prefix
+        self.book_ids = book_ids
+        self.annotations = annotations or {}
+
+        self._ready = deque()
+        self._current = None
+        self._current_started = None
+        self._exhausted = False
+        self._prefetcher = None
+        self._writer = None
+        self._reviewed = 0
+        self._saved = 0
+        self._in_flight = 0
+
+        self._build_ui()
+
+    def _build_ui(self):
+        self.cover_label = QLabel(self)
+        self.page_label = QLabel(self)
+        self.info_label = QLabel(self)
+        self.info_label.setWordWrap(True)
+        for label in (self.cover_label, self.page_label):
+            label.setAlignment(Qt.AlignCenter)
+
+        self.reason_input = QLineEdit(self)
+        self.reason_input.setPlaceholderText("Motivo del rechazo (opcional)")
+
+        self.approve_button = QPushButton("Aprobar (A)", self)
+        self.reject_button = QPushButton("Rechazar (R)", self)
+        self.skip_button = QPushButton("Omitir (S)", self)
+        self.approve_button.clicked.connect(self.approve_current)
+        self.reject_button.clicked.connect(self.reject_current)
+        self.skip_button.clicked.connect(self.skip_current)
+
+        for key, slot in (
+            ("A", self.approve_current),
+            ("R", self.reject_current),
+            ("S", self.skip_current),
+        ):
+            QShortcut(QKeySequence(key), self, slot)
+
+        self.status_label = QLabel(self)
+
+        images = QHBoxLayout()
+        images.addWidget(self.cover_label)
+        images.addWidget(self.page_label, 1)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.approve_button)
+        buttons.addWidget(self.reject_button)
+        buttons.addWidget(self.skip_button)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(images)
+        layout.addWidget(self.info_label)
+        layout.addWidget(self.reason_input)
+        layout.addLayout(buttons)
+        layout.addWidget(self.status_label)
+
+        self._set_buttons_enabled(False)
+
+    def start(self):
+        """Inicia los hilos de precarga y guardado"""
+        if self._prefetcher is not None:
+            return
+
+        self._prefetcher = ReviewPrefetcher(
+            self.source_state_id,
+            depth=self.depth,
+            with_pdf=self.with_pdf,
+            book_ids=self.book_ids,
+        )
+        self._prefetcher.item_ready.connect(self._on_item_ready)
+        self._prefetcher.exhausted.connect(self._on_exhausted)
+        self._prefetcher.failed.connect(self._on_prefetch_failed)
+
+        self._writer = DecisionWriter(
+            self.user.id, self.source_state_id, self.reject_state_id
+        )
+        self._writer.batch_committed.connect(self._on_batch_committed)
+        self._writer.batch_failed.connect(self._on_batch_failed)
+
+        self._writer.start()
+        self._prefetcher.start()
+        self._update_status()
+
+    def stop(self):
+        """Detiene la precarga y espera a que se guarden las decisiones pendientes"""
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            self._prefetcher.wait()
+            self._prefetcher = None
+        if self._writer is not None:
+            self._writer.stop()
+            self._writer.wait()
+            self._writer = None
+
+    def _on_item_ready(self, item):
+        self._ready.append(item)
+        if self._current is None:
+            self._show_next()
+        else:
+            self._update_status()
+
+    def _on_exhausted(self):
+        self._exhausted = True
+        if self._current is None:
+            self._show_next()
+
+    def _on_prefetch_failed(self, message):
+        QMessageBox.critical(
+            self, "Error", f"No se pudieron cargar los libros a revisar:\n{message}"
+        )
+
+    def _on_batch_committed(self, applied, sent):
+        self._in_flight -= sent
+        self._saved += applied
+        if applied < sent:
+            print(
+                f"ADVERTENCIA: {sent - applied} libro(s) cambiaron de estado "
+                "antes de guardar la revisión y se omitieron."
+            )
+        self._update_status()
+
+    def _on_batch_failed(self, message, sent):
+        self._in_flight -= sent
+        self._update_status()
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"No se pudieron guardar {sent} decisión(es); "
+            f"los libros seguirán pendientes de revisión:\n{message}",
+        )
+
+    def _show_next(self):
+        if self._ready:
+            self._current = self._ready.popleft()
+            self._current_started = datetime.now()
+            if self._prefetcher is not None:
+                self._prefetcher.release_slot()
+            self._render(self._current)
+            self._set_buttons_enabled(True)
+        else:
+            self._current = None
+            self._render(None)
+            self._set_buttons_enabled(False)
+        self._update_status()
+
+    def _render(self, item):
+        if item is None:
+            self.cover_label.clear()
+            self.page_label.clear()
+            self.info_label.setText(
+                "No hay más libros por revisar."
+                if self._exhausted
+                else "Cargando siguiente libro..."
+            )
+            return
+
+        self._set_image(self.cover_label, item.cover, "Sin portada")
+        if self.with_pdf:
+            self._set_image(self.page_label, item.first_page, "Sin vista previa")
+        self.info_label.setText(
+            f"<b>{item.titulo}</b><br>{item.autor}<br>"
+            f"ISBN: {item.isbn or 'N/A'} — "
+            f"Páginas: {item.numero_paginas or 'N/A'}<br>"
+            f"Ubicación: {item.estanteria or '-'} / {item.espacio or '-'}"
+            + (
+                f"<br><font color='#b00020'>{self.annotations[item.book_id]}</font>"
+                if item.book_id in self.annotations
+                else ""
+            )
+        )
+        self.reason_input.clear()
+
+    def _set_image(self, label, image, placeholder):
+        if image is None:
+            label.setPixmap(QPixmap())
+            label.setText(placeholder)
+        else:
+            label.setPixmap(QPixmap.fromImage(image))
+
+    def _set_buttons_enabled(self, enabled):
+        for button in (self.approve_button, self.reject_button, self.skip_button):
+            button.setEnabled(enabled)
+
+    def _decide(self, estado_id, observacion):
+        if self._current is None:
+            return
+        self._writer.submit(
+            (
+                self._current.book_id,
+                estado_id,
+                f"{self.observation_prefix}: {observacion}",
+                self._current_started,
+                datetime.now(),
+            )
+        )
+        self._reviewed += 1
+        self._in_flight += 1
+        self._show_next()
+
+    def approve_current(self):
+        self._decide(self.approve_state_id, "aprobado")
+
+    def reject_current(self):
+        reason = self.reason_input.text().strip()
+        self._decide(
+            self.reject_state_id, f"rechazado - {reason}" if reason else "rechazado"
+        )
+
+    def skip_current(self):
+        if self._current is not None:
+            self._show_next()
+
+    def _update_status(self):
+        self.status_label.setText(
+            f"Revisados: {self._reviewed} — Guardados: {self._saved} — "
+            f"Por guardar: {self._in_flight} — En cola: {len(self._ready)}"
+        )
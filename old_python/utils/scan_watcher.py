@@ -0,0 +1,362 @@
+"""
+Vinculación automática de PDFs escaneados (CU04).
+
+ScanFolderWatcher vigila la carpeta de libros (inotify a través de
+QFileSystemWatcher, o sondeo periódico si no está disponible) y avisa cuando
+un PDF terminó de copiarse: su tamaño no cambió durante `stable_seconds` y el
+archivo ya tiene el marcador %%EOF. ScanLinkWorker identifica el libro de
+cada archivo y los pasa a "Digitalizado" en lotes.
+
+Convenciones de nombre reconocidas (sin distinguir mayúsculas):
+    libro_123.pdf, libro-123 tomo 1.pdf     -> libro con id 123
+    978-84-376-0494-7.pdf, 0306406152.pdf   -> libro con ese ISBN
+Un número solo (001.pdf, 20231019.pdf) no se toma como id: los escáneres
+numeran así sus archivos. Si el nombre no sigue ninguna convención, se busca
+un ISBN en el texto del PDF.
+"""
+
+import os
+import queue
+import re
+import time
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QThread, QTimer, pyqtSignal
+from db.database import Database
+from db.models import Libro, EstadoLibro, Accion
+from db.bulk_updates import bulk_link_digitized_pdfs
+from utils.isbn import normalize_isbn, find_isbns
+from utils.path_utils import get_books_path
+from utils.pdf_store import store_pdf
+from utils.pdf_preview import build_preview_quietly
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+ELIGIBLE_STATES = ("En digitalización", "Restaurado")
+DIGITIZED_STATE = "Digitalizado"
+
+STABLE_SECONDS = 10
+CHECK_INTERVAL_MS = 2000
+POLL_INTERVAL_MS = 5000
+BATCH_SIZE = 20
+BATCH_WAIT_SECONDS = 5.0
+# Páginas donde se busca el ISBN: las primeras (créditos) y las últimas
+ISBN_FIRST_PAGES = 4
+ISBN_LAST_PAGES = 2
+
+_BOOK_ID_NAME = re.compile(r"^libro[_\- ]?(\d{1,9})(?:[_\- ].*)?$", re.I)
+
+
+def polling_forced():
+    """En carpetas de red inotify no ve cambios remotos; se fuerza el sondeo"""
+    return os.environ.get("ARCHIBOX_WATCH_POLLING") == "1"
+
+
+def _has_pdf_trailer(path):
+    """Un PDF a medio copiar todavía no termina en %%EOF"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 1024, 0))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def _isbns_in_pdf(path):
+    if fitz is None:
+        return []
+    found = []
+    try:
+        with fitz.open(path) as document:
+            count = document.page_count
+            numbers = list(range(min(ISBN_FIRST_PAGES, count)))
+            numbers += [n for n in range(count - ISBN_LAST_PAGES, count) if n >= 0]
+            for number in dict.fromkeys(numbers):
+                for isbn in find_isbns(document[number].get_text("text")):
+                    if isbn not in found:
+                        found.append(isbn)
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo leer el texto de {path}: {e}")
+    return found
+
+
+def identify_scan(path):
+    """
+    Retorna (libro_id, isbns) a partir del nombre del archivo o, si no sigue
+    la convención, de los ISBN impresos en el PDF.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0].strip()
+    isbn = normalize_isbn(stem)
+    if isbn:
+        return None, [isbn]
+    match = _BOOK_ID_NAME.match(stem)
+    if match:
+        return int(match.group(1)), []
+    return None, _isbns_in_pdf(path)
+
+
+class ScanFolderWatcher(QObject):
+    """Emite file_ready(ruta) una vez por cada PDF que terminó de escribirse"""
+
+    file_ready = pyqtSignal(str)
+
+    def __init__(
+        self, directory, stable_seconds=STABLE_SECONDS, polling=None, parent=None
+    ):
+        super().__init__(parent)
+        self.directory = directory
+        self.stable_seconds = stable_seconds
+        self.polling = polling_forced() if polling is None else polling
+        self._pending = {}  # nombre -> (tamaño, mtime, desde cuándo no cambia)
+        self._reported = set()
+        self._running = False
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._scan)
+        self._check_timer = QTimer(self)
+        self._check_timer.setInterval(CHECK_INTERVAL_MS)
+        self._check_timer.timeout.connect(self._check_pending)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(POLL_INTERVAL_MS)
+        self._poll_timer.timeout.connect(self._scan)
+
+    def start(self):
+        self._running = True
+        if not self.polling and not self._watcher.addPath(self.directory):
+            print(
+                f"ADVERTENCIA: No se puede vigilar {self.directory}; "
+                "se revisará la carpeta periódicamente."
+            )
+            self.polling = True
+        if self.polling:
+            self._poll_timer.start()
+        self._scan()
+
+    def stop(self):
+        self._running = False
+        self._poll_timer.stop()
+        self._check_timer.stop()
+        if self._watcher.directories():
+            self._watcher.removePaths(self._watcher.directories())
+
+    def _scan(self, *_):
+        try:
+            names = os.listdir(self.directory)
+        except OSError as e:
+            print(f"ADVERTENCIA: No se pudo leer {self.directory}: {e}")
+            return
+        for name in names:
+            if not name.lower().endswith(".pdf") or name in self._reported:
+                continue
+            if name not in self._pending:
+                self._pending[name] = (None, None, time.monotonic())
+        if self._pending and not self._check_timer.isActive():
+            self._check_timer.start()
+        self._check_pending()
+
+    def forget(self, paths):
+        """
+        Vuelve a vigilar archivos ya avisados (su lote no se pudo vincular):
+        se avisan de nuevo cuando pase `stable_seconds`.
+        """
+        if not self._running:
+            return
+        now = time.monotonic()
+        for path in paths:
+            name = os.path.basename(path)
+            self._reported.discard(name)
+            self._pending[name] = (None, None, now)
+        if self._pending and not self._check_timer.isActive():
+            self._check_timer.start()
+
+    def _check_pending(self):
+        now = time.monotonic()
+        for name, (size, mtime, since) in list(self._pending.items()):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._pending[name]  # se borró o se renombró
+                continue
+            if (stat.st_size, stat.st_mtime) != (size, mtime):
+                self._pending[name] = (stat.st_size, stat.st_mtime, now)
+            elif now - since >= self.stable_seconds and _has_pdf_trailer(path):
+                del self._pending[name]
+                self._reported.add(name)
+                self.file_ready.emit(path)
+        if not self._pending:
+            self._check_timer.stop()
+
+
+class ScanLinkWorker(QThread):
+    """
+    Identifica los PDFs listos y los vincula en lotes con un solo UPDATE.
+    Los archivos que ya figuran en algún libro se ignoran en silencio. Si el
+    lote falla, se emite failed(mensaje) y retry([ruta]) con sus archivos.
+    """
+
+    linked = pyqtSignal(list)  # [(archivo, libro_id)]
+    unmatched = pyqtSignal(list)  # [(archivo, motivo)]
+    failed = pyqtSignal(str)
+    retry = pyqtSignal(list)  # [ruta]
+
+    _FLUSH = object()
+
+    def __init__(
+        self,
+        actor_id,
+        batch_size=BATCH_SIZE,
+        flush_interval=BATCH_WAIT_SECONDS,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.actor_id = actor_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+
+    def submit(self, path):
+        self._queue.put(path)
+
+    def stop(self):
+        self._queue.put(None)
+
+    def run(self):
+        session = Database().get_session()
+        pending = []
+        try:
+            while True:
+                try:
+                    path = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    path = self._FLUSH
+
+                if path is None:
+                    self._flush(session, pending)
+                    return
+                if path is not self._FLUSH:
+                    pending.append(path)
+                if path is self._FLUSH or len(pending) >= self.batch_size:
+                    self._flush(session, pending)
+        finally:
+            session.close()
+
+    def _flush(self, session, pending):
+        if not pending:
+            return
+        batch = list(pending)
+        pending.clear()
+        try:
+            eligible_ids, digitized_id, accion_id = self._lookups(session)
+            links, unmatched = self._match(session, batch, eligible_ids)
+            linked_ids = set()
+            if links:
+                linked_ids = set(
+                    bulk_link_digitized_pdfs(
+                        session,
+                        self.actor_id,
+                        links,
+                        eligible_ids,
+                        digitized_id,
+                        accion_id,
+                    )
+                )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.failed.emit(str(e))
+            self.retry.emit(batch)
+            return
+
+        for book_id, filename in links:
+            if book_id not in linked_ids:
+                unmatched.append(
+                    (filename, f"El libro {book_id} ya no espera digitalización")
+                )
+        linked = [
+            (filename, book_id) for book_id, filename in links if book_id in linked_ids
+        ]
+        for filename, _ in linked:
+            store_pdf(get_books_path(filename), filename)
+            build_preview_quietly(filename)
+        if linked:
+            self.linked.emit(linked)
+        if unmatched:
+            self.unmatched.emit(unmatched)
+
+    def _lookups(self, session):
+        states = {
+            estado.nombre: estado.id
+            for estado in session.query(EstadoLibro).filter(
+                EstadoLibro.nombre.in_(ELIGIBLE_STATES + (DIGITIZED_STATE,))
+            )
+        }
+        if DIGITIZED_STATE not in states:
+            raise LookupError(f"No se encontró el estado '{DIGITIZED_STATE}'.")
+        accion = session.query(Accion).filter_by(nombre="completar tarea").first()
+        if accion is None:
+            raise LookupError("No se encontró la acción 'completar tarea'.")
+        eligible_ids = [states[name] for name in ELIGIBLE_STATES if name in states]
+        return eligible_ids, states[DIGITIZED_STATE], accion.id
+
+    def _match(self, session, paths, eligible_ids):
+        """Retorna ([(libro_id, archivo)], [(archivo, motivo)])"""
+        filenames = {os.path.basename(path): path for path in paths}
+        already_linked = {
+            row.directorio_pdf
+            for row in session.query(Libro.directorio_pdf).filter(
+                Libro.directorio_pdf.in_(list(filenames))
+            )
+        }
+
+        eligible = session.query(Libro.id, Libro.isbn).filter(
+            Libro.estado_id.in_(eligible_ids)
+        )
+        ids_by_isbn = {}
+        eligible_book_ids = set()
+        for book_id, isbn in eligible:
+            eligible_book_ids.add(book_id)
+            normalized = normalize_isbn(isbn)
+            if normalized:
+                ids_by_isbn.setdefault(normalized, set()).add(book_id)
+
+        links, unmatched = [], []
+        assigned = set()
+        for filename, path in filenames.items():
+            if filename in already_linked:
+                continue
+            book_id, isbns = identify_scan(path)
+            if book_id is not None:
+                if book_id not in eligible_book_ids:
+                    unmatched.append(
+                        (filename, f"El libro {book_id} no espera digitalización")
+                    )
+                    continue
+            else:
+                candidates = set()
+                for isbn in isbns:
+                    candidates |= ids_by_isbn.get(isbn, set())
+                if not candidates:
+                    reason = (
+                        "Ningún libro pendiente tiene ese ISBN"
+                        if isbns
+                        else "No se reconoce el nombre ni se encontró un ISBN"
+                    )
+                    unmatched.append((filename, reason))
+                    continue
+                if len(candidates) > 1:
+                    ids = ", ".join(str(i) for i in sorted(candidates))
+                    unmatched.append((filename, f"ISBN ambiguo (libros {ids})"))
+                    continue
+                book_id = candidates.pop()
+            if book_id in assigned:
+                unmatched.append(
+                    (filename, f"Otro archivo ya se asignó al libro {book_id}")
+                )
+                continue
+            assigned.add(book_id)
+            links.append((book_id, filename))
+        return links, unmatched
@@ -0,0 +1,153 @@
+"""
+Pool de pantallas para la ventana principal.
+
+Construir una pantalla (setupUi, combos, sesión) toma cientos de ms y los
+operadores cambian de pantalla cientos de veces por turno. El pool conserva
+una instancia por (clase, usuario) y, al volver a abrirla, aplica este
+protocolo de reinicio:
+
+- `_clear_form()` / `_clear_inputs()` (los que ya tienen las pantallas)
+  limpian lo que se había escrito.
+- `_refresh_data()` recarga combos y listas, solo si quedaron viejos: si
+  llegó por el bus alguno de los eventos de `REFRESH_ON` desde que se
+  ocultó, tras una reconexión (RESYNC) o cuando el bus no garantiza los
+  avisos. Sin `REFRESH_ON` se recarga siempre.
+- Al ocultarla se revierte su sesión: la conexión vuelve al pool de
+  SQLAlchemy y los objetos se releen la próxima vez que se usen.
+
+Las pantallas que reciben más argumentos que `user` (p. ej. los book_ids de
+CU12/CU13 en lote) no se reutilizan.
+"""
+
+import inspect
+
+from PyQt5.QtCore import QObject, QEvent, QTimer
+from db.event_bus import get_event_bus, RESYNC
+
+_CLEAR_METHODS = ("_clear_form", "_clear_inputs")
+
+
+def reset_screen(screen, refresh):
+    """Limpia la pantalla y, si `refresh`, recarga sus datos"""
+    for name in _CLEAR_METHODS:
+        method = getattr(screen, name, None)
+        if method is not None:
+            method()
+    if refresh and hasattr(screen, "_refresh_data"):
+        screen._refresh_data()
+
+
+def _accepts_user(screen_class):
+    try:
+        return "user" in inspect.signature(screen_class).parameters
+    except (TypeError, ValueError):
+        return True
+
+
+class ScreenPool(QObject):
+    """
+    Entrega pantallas ya construidas. Con `stack` (QStackedWidget de la
+    ventana principal) las pantallas se muestran dentro de él; sin él, como
+    ventanas independientes que se ocultan al cambiar de pantalla. Una
+    ventana que el usuario cierra sale del pool (su closeEvent ya liberó
+    sus recursos).
+    """
+
+    def __init__(self, stack=None, parent=None):
+        super().__init__(parent)
+        self.stack = stack
+        self._screens = {}  # (clase, usuario_id) -> pantalla
+        self._stale = {}  # (clase, usuario_id) -> bool
+        self._current = None
+        self.bus = get_event_bus()
+        self.bus.subscribe(self._on_event)
+
+    def acquire(self, screen_class, user=None, **kwargs):
+        """Muestra y retorna una pantalla de `screen_class` lista para usar"""
+        if kwargs:
+            return self._show(screen_class(user=user, **kwargs))
+
+        key = (screen_class, getattr(user, "id", None))
+        screen = self._screens.get(key)
+        if screen is None:
+            if _accepts_user(screen_class):
+                screen = screen_class(user=user)
+            else:
+                screen = screen_class()
+            screen.installEventFilter(self)
+            self._screens[key] = screen
+        else:
+            refresh = self._stale[key] or not self.bus.delivers_invalidations
+            reset_screen(screen, refresh)
+        self._stale[key] = False
+        return self._show(screen)
+
+    def _show(self, screen):
+        if self._current is not None and self._current is not screen:
+            self.release(self._current)
+        self._current = screen
+        if self.stack is not None:
+            if self.stack.indexOf(screen) == -1:
+                self.stack.addWidget(screen)
+            self.stack.setCurrentWidget(screen)
+        else:
+            screen.show()
+            screen.raise_()
+            screen.activateWindow()
+        return screen
+
+    def release(self, screen):
+        """Deja la pantalla en reserva y devuelve la conexión de su sesión"""
+        if not self._is_pooled(screen):
+            screen.close()
+            screen.deleteLater()
+            return
+        session = getattr(screen, "session", None)
+        if session is not None:
+            try:
+                session.rollback()
+            except Exception as e:
+                print(f"ADVERTENCIA: No se pudo liberar la sesión de la pantalla: {e}")
+        if self.stack is None:
+            screen.hide()
+
+    def _is_pooled(self, screen):
+        return any(pooled is screen for pooled in self._screens.values())
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Close and self.stack is None:
+            # El closeEvent de la pantalla puede rechazar el cierre (CU12)
+            QTimer.singleShot(0, lambda: self._forget_if_closed(watched))
+        return False
+
+    def _forget_if_closed(self, screen):
+        if screen.isVisible():
+            return
+        for key, pooled in list(self._screens.items()):
+            if pooled is screen:
+                del self._screens[key]
+                del self._stale[key]
+        if self._current is screen:
+            self._current = None
+
+    def _on_event(self, kind, _data):
+        for key in self._stale:
+            refresh_on = getattr(key[0], "REFRESH_ON", None)
+            if kind == RESYNC or refresh_on is None or kind in refresh_on:
+                self._stale[key] = True
+
+    def shutdown(self):
+        """Cierra todas las pantallas (cierre de sesión o de la aplicación)"""
+        self.bus.unsubscribe(self._on_event)
+        screens = list(self._screens.values())
+        if self._current is not None and not self._is_pooled(self._current):
+            screens.append(self._current)
+        self._screens.clear()
+        self._stale.clear()
+        self._current = None
+        for screen in screens:
+            screen.removeEventFilter(self)
+            if self.stack is not None:
+                self.stack.removeWidget(screen)
+            screen.close()
+            screen.deleteLater()
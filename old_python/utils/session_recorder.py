@@ -0,0 +1,217 @@
+"""
+Grabación de sesiones de operador para el simulador de carga.
+
+Se activa con ARCHIBOX_SESSION_RECORD=<archivo.jsonl> (ver
+use_cases/__init__.py). Cada vez que un control de entrada (un botón, un
+combo, etc.) dispara un slot de una pantalla de use_cases se agrega una
+línea con:
+
+    {"t": segundos desde el inicio, "user_id": ..., "screen": "módulo:Clase",
+     "slot": "search_books", "args": [...], "inputs": {...}}
+
+`inputs` es el estado de los campos de la pantalla en ese momento (texto,
+opción elegida, casillas, fila seleccionada), que es lo que el slot lee.
+Las contraseñas no se graban. Solo se registra la llamada externa: lo que
+el slot llama a su vez se reproduce solo al repetirla. Los slots son los de
+ui_diagnostics.connected_slot_names; las señales que no vienen de un widget
+(hilos en segundo plano, temporizadores) no son acciones del operador y se
+ignoran, porque al reproducir vuelven a llegar por su camino normal.
+
+benchmarks/replay_sessions.py reproduce los archivos grabados.
+"""
+
+import functools
+import inspect
+import json
+import threading
+import time
+
+from PyQt5.QtWidgets import (
+    QLineEdit,
+    QTextEdit,
+    QPlainTextEdit,
+    QComboBox,
+    QAbstractButton,
+    QAbstractSpinBox,
+    QSpinBox,
+    QDoubleSpinBox,
+    QDateEdit,
+    QListWidget,
+    QTableWidget,
+    QWidget,
+)
+from utils.ui_diagnostics import (
+    connected_slot_names,
+    iter_screen_classes,
+    max_positional_args,
+)
+
+_PRIMITIVES = (bool, int, float, str, type(None))
+
+
+def _is_primitive(value):
+    return isinstance(value, _PRIMITIVES)
+
+
+def input_widgets(screen):
+    """{nombre: widget} de los campos de la pantalla y de su `ui`"""
+    widgets = {}
+    for owner, prefix in ((getattr(screen, "ui", None), "ui."), (screen, "")):
+        if owner is None:
+            continue
+        for name, value in vars(owner).items():
+            if isinstance(
+                value,
+                (
+                    QLineEdit,
+                    QTextEdit,
+                    QPlainTextEdit,
+                    QComboBox,
+                    QAbstractButton,
+                    QAbstractSpinBox,
+                    QListWidget,
+                    QTableWidget,
+                ),
+            ):
+                widgets[prefix + name] = value
+    return widgets
+
+
+def widget_state(widget):
+    """Valor serializable de un campo, o None si no aplica"""
+    if isinstance(widget, QLineEdit):
+        if widget.echoMode() != QLineEdit.Normal:
+            return {"password": True}
+        return {"text": widget.text()}
+    if isinstance(widget, (QTextEdit, QPlainTextEdit)):
+        return {"text": widget.toPlainText()}
+    if isinstance(widget, QComboBox):
+        data = widget.currentData()
+        state = {"index": widget.currentIndex()}
+        if _is_primitive(data):
+            state["data"] = data
+        return state
+    if isinstance(widget, QAbstractButton):
+        return {"checked": widget.isChecked()} if widget.isCheckable() else None
+    if isinstance(widget, QDateEdit):
+        return {"date": widget.date().toString("yyyy-MM-dd")}
+    if isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+        return {"value": widget.value()}
+    if isinstance(widget, (QListWidget, QTableWidget)):
+        rows = sorted({index.row() for index in widget.selectedIndexes()})
+        return {"row": widget.currentRow(), "selected": rows}
+    return None
+
+
+def capture_inputs(screen):
+    inputs = {}
+    for name, widget in input_widgets(screen).items():
+        state = widget_state(widget)
+        if state is not None:
+            inputs[name] = state
+    return inputs
+
+
+class SessionRecorder:
+    """Escribe una línea por slot invocado desde el bucle de eventos"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._start = time.monotonic()
+        self._depth = 0
+        self._lock = threading.Lock()
+        self._ui_thread_id = threading.get_ident()
+
+    def record(self, screen, slot, args):
+        line = {
+            "t": round(time.monotonic() - self._start, 3),
+            "user_id": getattr(getattr(screen, "user", None), "id", None),
+            "screen": f"{type(screen).__module__}:{type(screen).__qualname__}",
+            "slot": slot,
+            "args": list(args),
+            "inputs": capture_inputs(screen),
+        }
+        with self._lock:
+            self._file.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+            self._file.flush()
+
+    @staticmethod
+    def _from_input(screen):
+        """El slot lo disparó una señal de un widget (no un hilo ni un timer)"""
+        try:
+            return isinstance(screen.sender(), QWidget)
+        except (AttributeError, RuntimeError):
+            return False
+
+    def wrap(self, slot, function):
+        max_args = max_positional_args(function)
+
+        @functools.wraps(function)
+        def wrapper(screen, *args, **kwargs):
+            if threading.get_ident() != self._ui_thread_id:
+                return function(screen, *args, **kwargs)
+            if max_args is not None:
+                args = args[: max_args - 1]
+            # Solo la llamada externa, y solo si sus argumentos se pueden
+            # reproducir (los objetos Qt no) y la disparó un widget
+            if (
+                self._depth == 0
+                and not kwargs
+                and all(map(_is_primitive, args))
+                and self._from_input(screen)
+            ):
+                try:
+                    self.record(screen, slot, args)
+                except Exception as e:
+                    print(f"ADVERTENCIA: No se pudo grabar {slot}: {e}")
+            self._depth += 1
+            try:
+                return function(screen, *args, **kwargs)
+            finally:
+                self._depth -= 1
+
+        wrapper.__session_recorder__ = True
+        return wrapper
+
+    def _quiet(self, function):
+        """Lo que hace el constructor (cargar combos, etc.) no se graba"""
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self._depth += 1
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._depth -= 1
+
+        wrapper.__session_recorder__ = True
+        return wrapper
+
+    def instrument_class(self, cls):
+        if not getattr(cls.__init__, "__session_recorder__", False):
+            cls.__init__ = self._quiet(cls.__init__)
+        slots = connected_slot_names(cls)
+        for attr, value in list(vars(cls).items()):
+            if attr not in slots or not inspect.isfunction(value):
+                continue
+            if getattr(value, "__session_recorder__", False):
+                continue
+            setattr(cls, attr, self.wrap(attr, value))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_recorder = None
+
+
+def start_recording(path, package_name="use_cases"):
+    """Instrumenta las pantallas de `package_name` y graba en `path`"""
+    global _recorder
+    if _recorder is None:
+        _recorder = SessionRecorder(path)
+        for cls in iter_screen_classes(package_name):
+            _recorder.instrument_class(cls)
+    return _recorder
@@ -0,0 +1,320 @@
+"""
+Modo de diagnóstico de la interfaz: latencia de slots y congelamientos.
+
+Se activa con ARCHIBOX_UI_DIAGNOSTICS=1 (ver use_cases/__init__.py):
+
+- Los slots de las pantallas de use_cases se envuelven a nivel de clase,
+  así que quedan medidos sin tocar las pantallas. Se consideran slots los
+  métodos decorados con @pyqtSlot y los que el código de la clase conecta
+  a una señal (`señal.connect(self.metodo)`, o una lambda que lo llama);
+  los demás métodos no se tocan. Las duraciones se agregan en un
+  histograma por slot.
+- Un temporizador en el hilo de UI marca un latido; un hilo vigilante
+  detecta cuando el latido se atrasa más de STALL_THRESHOLD_MS y captura la
+  pila del hilo de UI en ese momento, junto con el slot que se estaba
+  ejecutando.
+
+Al salir (o con export()) se escribe un JSON en la caché de diagnóstico.
+"""
+
+import ast
+import atexit
+import functools
+import importlib
+import inspect
+import json
+import os
+import pkgutil
+import sys
+import textwrap
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication, QWidget
+from utils.cache_paths import get_cache_dir
+
+STALL_THRESHOLD_MS = 250
+HEARTBEAT_MS = 50
+# Límites superiores (ms) de los buckets del histograma; el último es abierto
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+MAX_STALLS = 500
+
+
+def diagnostics_enabled():
+    return os.environ.get("ARCHIBOX_UI_DIAGNOSTICS") == "1"
+
+
+class SlotHistogram:
+    """Conteo, total, máximo y buckets de duración de un slot"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for index, limit in enumerate(BUCKETS_MS):
+            if elapsed_ms <= limit:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self):
+        labels = [f"<={limit}ms" for limit in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class UiProfiler:
+    """Histogramas por slot y registro de congelamientos del hilo de UI"""
+
+    def __init__(self, threshold_ms=STALL_THRESHOLD_MS):
+        self.threshold_ms = threshold_ms
+        self.histograms = {}
+        self.stalls = []
+        self._lock = threading.Lock()
+        self._ui_thread_id = None
+        self._running = []  # slots en curso en el hilo de UI (pueden anidarse)
+        self._last_beat = None
+        self._stall = None
+        self._timer = None
+        self._watchdog = None
+        self._stop = threading.Event()
+
+    # -- slots -------------------------------------------------------------
+
+    def record(self, name, elapsed_ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = SlotHistogram()
+            histogram.add(elapsed_ms)
+
+    def timed(self, name, function):
+        """Envuelve `function` midiendo cada llamada hecha desde el hilo de UI"""
+        max_args = max_positional_args(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if threading.get_ident() != self._ui_thread_id:
+                return function(*args, **kwargs)
+            # PyQt pasa todos los argumentos de la señal (p. ej. `checked` de
+            # clicked); se recortan a los que el método original acepta
+            if max_args is not None:
+                args = args[:max_args]
+            self._running.append(name)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, (time.perf_counter() - start) * 1000)
+                self._running.pop()
+
+        wrapper.__ui_diagnostics__ = True
+        return wrapper
+
+    # -- watchdog ----------------------------------------------------------
+
+    def start_watchdog(self):
+        """Inicia el latido y el hilo vigilante; requiere QApplication"""
+        if self._timer is not None or QApplication.instance() is None:
+            return
+        self._ui_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._timer = QTimer()
+        self._timer.setInterval(HEARTBEAT_MS)
+        self._timer.timeout.connect(self._beat)
+        self._timer.start()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="ui-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.stop()
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+
+    def _watch(self):
+        interval = self.threshold_ms / 4000
+        while not self._stop.wait(interval):
+            late_ms = (time.monotonic() - self._last_beat) * 1000 - HEARTBEAT_MS
+            if late_ms >= self.threshold_ms and self._stall is None:
+                self._stall = self._capture_stall()
+            elif late_ms < self.threshold_ms and self._stall is not None:
+                self._stall["duration_ms"] = round(
+                    (self._last_beat - self._stall.pop("_since")) * 1000, 1
+                )
+                with self._lock:
+                    if len(self.stalls) < MAX_STALLS:
+                        self.stalls.append(self._stall)
+                self._stall = None
+
+    def _capture_stall(self):
+        frame = sys._current_frames().get(self._ui_thread_id)
+        return {
+            "_since": self._last_beat,
+            "detected_at": datetime.now().isoformat(timespec="milliseconds"),
+            "slot": self._running[-1] if self._running else None,
+            "stack": traceback.format_stack(frame) if frame is not None else [],
+        }
+
+    # -- exportación -------------------------------------------------------
+
+    def snapshot(self):
+        with self._lock:
+            slots = {
+                name: histogram.to_dict()
+                for name, histogram in sorted(self.histograms.items())
+            }
+            stalls = list(self.stalls)
+        return {
+            "threshold_ms": self.threshold_ms,
+            "slots": slots,
+            "stalls": stalls,
+        }
+
+    def export(self, path=None):
+        """Escribe el resumen en JSON y retorna la ruta"""
+        if path is None:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(get_cache_dir("diagnostics"), f"ui_{stamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        return path
+
+
+def max_positional_args(function):
+    """Argumentos posicionales aceptados, o None si acepta *args"""
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    count = 0
+    for parameter in parameters:
+        if parameter.kind == parameter.VAR_POSITIONAL:
+            return None
+        if parameter.kind in (
+            parameter.POSITIONAL_ONLY,
+            parameter.POSITIONAL_OR_KEYWORD,
+        ):
+            count += 1
+    return count
+
+
+def connected_slot_names(cls):
+    """
+    Nombres de los métodos de `cls` que actúan como slots: decorados con
+    @pyqtSlot o usados en un `.connect(...)` del código de la clase
+    """
+    names = {
+        attr for attr, value in vars(cls).items() if hasattr(value, "__pyqtSignature__")
+    }
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(cls)))
+    except (OSError, TypeError, SyntaxError):
+        return names
+    for node in ast.walk(tree):
+        if not (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "connect"
+            and node.args
+        ):
+            continue
+        # self.metodo, o self.metodo(...) dentro de una lambda
+        for part in ast.walk(node.args[0]):
+            if (
+                isinstance(part, ast.Attribute)
+                and isinstance(part.value, ast.Name)
+                and part.value.id == "self"
+            ):
+                names.add(part.attr)
+    return names
+
+
+def instrument_class(profiler, cls):
+    """Envuelve los slots definidos en `cls` (ver connected_slot_names)"""
+    slots = connected_slot_names(cls)
+    for attr, value in list(vars(cls).items()):
+        if attr not in slots or not inspect.isfunction(value):
+            continue
+        if getattr(value, "__ui_diagnostics__", False):
+            continue
+        setattr(cls, attr, profiler.timed(f"{cls.__name__}.{attr}", value))
+
+    original_init = cls.__init__
+
+    @functools.wraps(original_init)
+    def init(self, *args, **kwargs):
+        profiler.start_watchdog()
+        original_init(self, *args, **kwargs)
+
+    init.__ui_diagnostics__ = True
+    if not getattr(original_init, "__ui_diagnostics__", False):
+        cls.__init__ = init
+
+
+def iter_screen_classes(package_name):
+    """Importa los módulos de `package_name` y produce sus clases QWidget"""
+    package = importlib.import_module(package_name)
+    for module_info in pkgutil.iter_modules(package.__path__):
+        module_name = f"{package_name}.{module_info.name}"
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            print(f"ADVERTENCIA: Diagnóstico: no se pudo importar {module_name}: {e}")
+            continue
+        for value in vars(module).values():
+            if (
+                inspect.isclass(value)
+                and value.__module__ == module_name
+                and issubclass(value, QWidget)
+            ):
+                yield value
+
+
+def instrument_package(profiler, package_name):
+    """Instrumenta todas las pantallas de `package_name`"""
+    for cls in iter_screen_classes(package_name):
+        instrument_class(profiler, cls)
+
+
+_profiler = None
+
+
+def get_profiler():
+    return _profiler
+
+
+def enable(package_name="use_cases", threshold_ms=None):
+    """Activa el diagnóstico y exporta el resultado al salir"""
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+    if threshold_ms is None:
+        threshold_ms = int(os.environ.get("ARCHIBOX_UI_STALL_MS", STALL_THRESHOLD_MS))
+    _profiler = UiProfiler(threshold_ms)
+    instrument_package(_profiler, package_name)
+    atexit.register(_export_at_exit)
+    return _profiler
+
+
+def _export_at_exit():
+    _profiler.stop()
+    path = _profiler.export()
+    print(f"Diagnóstico de interfaz guardado en {path}")
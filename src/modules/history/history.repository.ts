@@ -298,6 +298,16 @@ export class HistoryRepository {
     return result.rows[0]?.id || null;
   }
 
+  /**
+   * Create the missing monthly partitions of historial (migration 004).
+   * Returns how many were created.
+   */
+  async ensurePartitions(monthsAhead: number = 3): Promise<number> {
+    const query = 'SELECT historial_asegurar_particiones($1) AS creadas';
+    const result = await db.query<{ creadas: number }>(query, [monthsAhead]);
+    return result.rows[0].creadas;
+  }
+
   /**
    * Get recent activity (last N records)
    */
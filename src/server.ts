@@ -3,6 +3,22 @@ import config from './config';
 import { logger } from './shared/middleware/logger';
 import { db } from './shared/database/connection';
 import { lookupCache } from './shared/repositories/lookup.cache';
+import historyRepository from './modules/history/history.repository';
+
+// historial is partitioned by month; rows past the last partition fall into
+// the default one and lose pruning, so keep a few months created ahead
+const PARTITION_CHECK_INTERVAL_MS = 12 * 60 * 60 * 1000;
+
+async function ensureHistorialPartitions(): Promise<void> {
+  try {
+    const created = await historyRepository.ensurePartitions();
+    if (created > 0) {
+      logger.info('Historial partitions created', { created });
+    }
+  } catch (error) {
+    logger.error('Failed to create historial partitions', { error });
+  }
+}
 
 async function startServer() {
   try {
@@ -17,6 +33,9 @@ async function startServer() {
     await lookupCache.initialize();
     logger.info('Lookup cache initialized');
 
+    await ensureHistorialPartitions();
+    const partitionTimer = setInterval(ensureHistorialPartitions, PARTITION_CHECK_INTERVAL_MS);
+
     // Create Express app
     const app = createApp();
 
@@ -30,6 +49,7 @@ async function startServer() {
     // Graceful shutdown
     const gracefulShutdown = async (signal: string) => {
       logger.info(`${signal} received, shutting down gracefully`);
+      clearInterval(partitionTimer);
       
       server.close(async () => {
         logger.info('HTTP server closed');
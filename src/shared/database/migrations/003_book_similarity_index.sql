@@ -0,0 +1,30 @@
+-- Migration: 003_book_similarity_index.sql
+-- Description: Trigram index for fuzzy duplicate detection of books (CU01)
+-- Date: 2026-10-19
+
+-- ===========================================
+-- EXTENSIONS
+-- ===========================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- ===========================================
+-- NORMALIZATION
+-- ===========================================
+
+-- unaccent() is only STABLE; naming the dictionary explicitly makes the
+-- wrapper safe to declare IMMUTABLE so it can be used in an index.
+CREATE OR REPLACE FUNCTION libro_normalizar(valor TEXT)
+RETURNS TEXT AS $$
+    SELECT lower(public.unaccent('public.unaccent', coalesce(valor, '')));
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- ===========================================
+-- INDEXES
+-- ===========================================
+
+-- Maintained by PostgreSQL on every insert/update; serves both the
+-- similarity operator (%) and the distance ordering (<->).
+CREATE INDEX IF NOT EXISTS idx_libros_titulo_trgm
+    ON libros USING gist (libro_normalizar(titulo) gist_trgm_ops);
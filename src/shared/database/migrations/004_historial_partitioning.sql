@@ -0,0 +1,215 @@
+-- Migration: 004_historial_partitioning.sql
+-- Description: Monthly partitions, daily rollups and archive catalog for historial
+-- Date: 2026-10-19
+
+-- ===========================================
+-- PARTITIONED HISTORIAL
+-- ===========================================
+
+-- The audit log becomes a table partitioned by month on `fecha`. Queries
+-- with a date filter only touch the partitions in range, so the last 30
+-- days cost the same with one year of history or with twenty. The id
+-- sequence is kept, so ids stay monotonic for readers that use them as a
+-- watermark (local catalog replica).
+
+ALTER TABLE historial RENAME TO historial_sin_particionar;
+ALTER INDEX IF EXISTS idx_historial_usuario RENAME TO idx_historial_sin_part_usuario;
+ALTER INDEX IF EXISTS idx_historial_fecha RENAME TO idx_historial_sin_part_fecha;
+
+CREATE TABLE historial (
+    id INTEGER NOT NULL DEFAULT nextval('historial_id_seq'),
+    fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    usuario_id INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+    accion_id INTEGER REFERENCES accion(id) ON DELETE SET NULL,
+    target_type_id INTEGER REFERENCES target_type(id) ON DELETE SET NULL,
+    target_id INTEGER,
+    detalles JSONB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- The partition key has to be part of the primary key
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+-- Rows outside every monthly partition land here instead of failing the
+-- insert; historial_asegurar_particiones() keeps it empty in practice.
+CREATE TABLE historial_default PARTITION OF historial DEFAULT;
+
+CREATE INDEX idx_historial_fecha ON historial(fecha);
+CREATE INDEX idx_historial_usuario ON historial(usuario_id, fecha);
+CREATE INDEX idx_historial_target ON historial(target_type_id, target_id);
+
+-- ===========================================
+-- PARTITION MAINTENANCE
+-- ===========================================
+
+-- Creates the partition for the month containing `mes` (historial_pYYYY_MM).
+-- Rows already sitting in the default partition for that month are moved
+-- into the new one. They are inserted into the partition itself, not into
+-- historial: the statement-level rollup trigger only fires for inserts on
+-- the parent, and those rows were already counted when first written.
+CREATE OR REPLACE FUNCTION historial_crear_particion(mes DATE)
+RETURNS TEXT AS $$
+DECLARE
+    desde DATE := date_trunc('month', mes)::DATE;
+    hasta DATE := (date_trunc('month', mes) + INTERVAL '1 month')::DATE;
+    nombre TEXT := 'historial_p' || to_char(mes, 'YYYY_MM');
+BEGIN
+    IF to_regclass(nombre) IS NOT NULL THEN
+        RETURN nombre;
+    END IF;
+
+    CREATE TEMP TABLE historial_pendiente ON COMMIT DROP AS
+        SELECT * FROM historial_default WHERE fecha >= desde AND fecha < hasta;
+    DELETE FROM historial_default WHERE fecha >= desde AND fecha < hasta;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF historial FOR VALUES FROM (%L) TO (%L)',
+        nombre, desde, hasta
+    );
+    EXECUTE format('INSERT INTO %I SELECT * FROM historial_pendiente', nombre);
+    DROP TABLE historial_pendiente;
+    RETURN nombre;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Makes sure every month from the oldest row up to `meses_adelante` months
+-- from now has its partition. The API server calls it at startup and twice
+-- a day (src/server.ts); it is cheap when nothing is missing. The advisory
+-- lock serializes concurrent callers (several servers, the CLI in
+-- old_python/db/historial_archive.py).
+CREATE OR REPLACE FUNCTION historial_asegurar_particiones(
+    meses_adelante INTEGER DEFAULT 3
+)
+RETURNS INTEGER AS $$
+DECLARE
+    mes DATE;
+    ultimo DATE := (date_trunc('month', CURRENT_DATE)
+                    + make_interval(months => meses_adelante))::DATE;
+    creadas INTEGER := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('historial_asegurar_particiones'));
+
+    SELECT date_trunc('month', COALESCE(MIN(fecha), CURRENT_DATE))::DATE
+      INTO mes
+      FROM historial_default;
+    mes := LEAST(mes, date_trunc('month', CURRENT_DATE)::DATE);
+
+    WHILE mes <= ultimo LOOP
+        IF to_regclass('historial_p' || to_char(mes, 'YYYY_MM')) IS NULL THEN
+            PERFORM historial_crear_particion(mes);
+            creadas := creadas + 1;
+        END IF;
+        mes := (mes + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===========================================
+-- DAILY ROLLUPS
+-- ===========================================
+
+-- One row per day and (usuario, accion, target_type). Rows whose user,
+-- action or target type was deleted (NULL in historial) are counted under 0
+-- so the key stays usable as a primary key. Rollups are never archived:
+-- they are tiny and keep reports over old years instant.
+CREATE TABLE IF NOT EXISTS historial_resumen_diario (
+    dia DATE NOT NULL,
+    usuario_id INTEGER NOT NULL DEFAULT 0,
+    accion_id INTEGER NOT NULL DEFAULT 0,
+    target_type_id INTEGER NOT NULL DEFAULT 0,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, usuario_id, accion_id, target_type_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_historial_resumen_usuario
+    ON historial_resumen_diario(usuario_id, dia);
+
+-- Statement-level trigger: a bulk insert of N rows (write_many_to_historial)
+-- becomes one grouped upsert instead of N row updates.
+CREATE OR REPLACE FUNCTION historial_acumular_resumen()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO historial_resumen_diario AS r
+        (dia, usuario_id, accion_id, target_type_id, total)
+    SELECT fecha::DATE,
+           COALESCE(usuario_id, 0),
+           COALESCE(accion_id, 0),
+           COALESCE(target_type_id, 0),
+           COUNT(*)
+      FROM nuevas
+     GROUP BY 1, 2, 3, 4
+    ON CONFLICT (dia, usuario_id, accion_id, target_type_id)
+    DO UPDATE SET total = r.total + EXCLUDED.total;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER historial_resumen_insert
+    AFTER INSERT ON historial
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION historial_acumular_resumen();
+
+-- Rebuilds the rollups of [desde, hasta) from the live partitions, e.g.
+-- after deleting test rows by hand. Archived days are left untouched.
+CREATE OR REPLACE FUNCTION historial_recalcular_resumen(desde DATE, hasta DATE)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM historial_resumen_diario WHERE dia >= desde AND dia < hasta;
+    INSERT INTO historial_resumen_diario
+        (dia, usuario_id, accion_id, target_type_id, total)
+    SELECT fecha::DATE,
+           COALESCE(usuario_id, 0),
+           COALESCE(accion_id, 0),
+           COALESCE(target_type_id, 0),
+           COUNT(*)
+      FROM historial
+     WHERE fecha >= desde AND fecha < hasta
+     GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===========================================
+-- ARCHIVE CATALOG
+-- ===========================================
+
+-- Cold partitions are exported to compressed files and dropped by
+-- db/historial_archive.py. This table tells readers which months live on
+-- disk and where, so they can still be queried on demand.
+CREATE TABLE IF NOT EXISTS historial_archivo (
+    particion VARCHAR(64) PRIMARY KEY,
+    desde TIMESTAMP NOT NULL,
+    hasta TIMESTAMP NOT NULL,
+    archivo VARCHAR(255) NOT NULL,
+    filas INTEGER NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    min_id INTEGER,
+    max_id INTEGER,
+    archivado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_historial_archivo_rango
+    ON historial_archivo(desde, hasta);
+
+-- ===========================================
+-- DATA MIGRATION
+-- ===========================================
+
+SELECT historial_crear_particion(mes::DATE)
+  FROM generate_series(
+           date_trunc('month', (SELECT COALESCE(MIN(COALESCE(fecha, created_at)),
+                                                CURRENT_TIMESTAMP)
+                                  FROM historial_sin_particionar)),
+           date_trunc('month', CURRENT_DATE) + INTERVAL '3 months',
+           INTERVAL '1 month'
+       ) AS mes;
+
+-- The rollup trigger fills historial_resumen_diario while copying
+INSERT INTO historial
+    (id, fecha, usuario_id, accion_id, target_type_id, target_id, detalles, created_at)
+SELECT id,
+       COALESCE(fecha, created_at, CURRENT_TIMESTAMP),
+       usuario_id, accion_id, target_type_id, target_id, detalles, created_at
+  FROM historial_sin_particionar;
+
+ALTER SEQUENCE historial_id_seq OWNED BY historial.id;
+DROP TABLE historial_sin_particionar;
@@ -0,0 +1,67 @@
+-- Migration: 005_isbn13_key.sql
+-- Description: Normalized ISBN-13 key for exact ISBN lookups (CU17/CU22)
+-- Date: 2026-10-19
+
+-- ===========================================
+-- NORMALIZATION
+-- ===========================================
+
+-- Same rules as old_python/utils/isbn.py normalize_isbn(): accepts ISBN-10
+-- or ISBN-13 with any hyphenation/spacing, validates the check digit and
+-- returns the 13 digits, or NULL when the text is not a valid ISBN.
+CREATE OR REPLACE FUNCTION isbn_normalizar(valor TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    digitos TEXT := regexp_replace(upper(coalesce(valor, '')), '[^0-9X]', '', 'g');
+    total INTEGER := 0;
+    control TEXT;
+BEGIN
+    IF length(digitos) = 10 THEN
+        IF position('X' IN left(digitos, 9)) > 0 THEN
+            RETURN NULL;
+        END IF;
+        FOR i IN 1..10 LOOP
+            total := total + (11 - i) * CASE substr(digitos, i, 1)
+                WHEN 'X' THEN 10
+                ELSE substr(digitos, i, 1)::INTEGER
+            END;
+        END LOOP;
+        IF total % 11 <> 0 THEN
+            RETURN NULL;
+        END IF;
+        digitos := '978' || left(digitos, 9);
+    ELSIF NOT digitos ~ '^[0-9]{13}$' THEN
+        RETURN NULL;
+    END IF;
+
+    total := 0;
+    FOR i IN 1..12 LOOP
+        total := total
+            + substr(digitos, i, 1)::INTEGER * CASE i % 2 WHEN 1 THEN 1 ELSE 3 END;
+    END LOOP;
+    control := ((10 - total % 10) % 10)::TEXT;
+
+    IF length(digitos) = 13 THEN
+        RETURN CASE WHEN right(digitos, 1) = control THEN digitos END;
+    END IF;
+    RETURN digitos || control;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE;
+
+-- ===========================================
+-- COLUMN
+-- ===========================================
+
+-- Computed by PostgreSQL on every insert/update of isbn, so every write
+-- path (CU01, CU12 bulk edits, imports) keeps it in sync.
+ALTER TABLE libros
+    ADD COLUMN IF NOT EXISTS isbn13 CHAR(13)
+    GENERATED ALWAYS AS (isbn_normalizar(isbn)) STORED;
+
+-- ===========================================
+-- INDEXES
+-- ===========================================
+
+-- Not unique: every physical copy of an edition is its own row and shares
+-- the ISBN. A lookup is one index probe that returns all the copies.
+CREATE INDEX IF NOT EXISTS idx_libros_isbn13 ON libros(isbn13);
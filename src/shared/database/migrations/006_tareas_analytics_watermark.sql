@@ -0,0 +1,13 @@
+-- Migration: 006_tareas_analytics_watermark.sql
+-- Description: Index for incremental loads of tareas (workflow analytics)
+-- Date: 2026-10-19
+
+-- ===========================================
+-- INDEXES
+-- ===========================================
+
+-- old_python/db/workflow_analytics.py keeps a columnar copy of tareas on
+-- each client and only re-reads the rows inserted or updated since its
+-- watermark (updated_at is maintained by update_tareas_updated_at). Without
+-- this index every refresh is a sequential scan of the whole table.
+CREATE INDEX IF NOT EXISTS idx_tareas_updated_at ON tareas(updated_at);
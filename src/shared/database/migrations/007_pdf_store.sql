@@ -0,0 +1,43 @@
+-- Migration: 007_pdf_store.sql
+-- Description: Shared index of the content-addressed PDF store
+-- Date: 2026-10-19
+
+-- ===========================================
+-- PDF STORE INDEX
+-- ===========================================
+
+-- old_python/utils/pdf_store.py keeps each PDF once under
+-- pdf_store/objects/<sha256>.pdf, next to books/ on the network share. The
+-- index lives here instead of in a file on that share, so every client sees
+-- the same name -> content mapping and no SQLite database is written over
+-- the network.
+
+-- One row per stored object. estado is the result of the last scrub
+-- ('ok', 'corrupt' or 'missing'); verificado_en is NULL until the first one.
+CREATE TABLE IF NOT EXISTS pdf_objetos (
+    sha256 CHAR(64) PRIMARY KEY,
+    tamano BIGINT NOT NULL,
+    guardado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    verificado_en TIMESTAMP,
+    estado VARCHAR(10) NOT NULL DEFAULT 'ok'
+        CHECK (estado IN ('ok', 'corrupt', 'missing'))
+);
+
+-- nombre is the value stored in libros.directorio_pdf. metodo records how
+-- the books/ file relates to its object: 'reflink' or 'hardlink' when they
+-- share blocks, 'copy' when each takes its own space. Only shared names
+-- count as saved space.
+CREATE TABLE IF NOT EXISTS pdf_nombres (
+    nombre VARCHAR(500) PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL REFERENCES pdf_objetos(sha256),
+    metodo VARCHAR(10) NOT NULL DEFAULT 'copy'
+        CHECK (metodo IN ('reflink', 'hardlink', 'copy'))
+);
+
+-- ===========================================
+-- INDEXES
+-- ===========================================
+
+CREATE INDEX IF NOT EXISTS idx_pdf_nombres_sha256 ON pdf_nombres(sha256);
+CREATE INDEX IF NOT EXISTS idx_pdf_objetos_verificado_en
+    ON pdf_objetos(verificado_en NULLS FIRST);
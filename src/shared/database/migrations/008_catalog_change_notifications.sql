@@ -0,0 +1,122 @@
+-- Migration: 008_catalog_change_notifications.sql
+-- Description: NOTIFY on every write to libros, usuarios, categoria and estados_libro
+-- Date: 2026-10-19
+
+-- ===========================================
+-- CHANGE NOTIFICATIONS
+-- ===========================================
+
+-- The desktop clients (old_python/db/event_bus.py) LISTEN on the
+-- archibox_eventos channel and keep caches (CU17 search results, local
+-- replica, reference data, user lists) that are only invalidated by those
+-- events. The Python writes publish their own event, but the API server
+-- writes libros and usuarios without one, so its changes never reached the
+-- caches. These triggers publish the event from the database for every
+-- write.
+--
+-- A transaction that already published its event sets
+-- archibox.eventos_publicados (see publish() in event_bus.py); the triggers
+-- skip it to avoid a second, redundant notification. Like any NOTIFY, the
+-- event is only delivered if the transaction commits.
+
+-- Payload format matches event_bus._encode: {"tipo": ..., "ids": [...]}, with
+-- ids = null when the list does not fit in a notification. TG_ARGV[0] is the
+-- event kind for inserts and TG_ARGV[1] for updates and deletes.
+CREATE OR REPLACE FUNCTION notificar_cambios_filas()
+RETURNS TRIGGER AS $$
+DECLARE
+    ids INTEGER[];
+    tipo TEXT;
+    payload TEXT;
+BEGIN
+    IF current_setting('archibox.eventos_publicados', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        SELECT array_agg(id ORDER BY id) INTO ids FROM filas_anteriores;
+    ELSE
+        SELECT array_agg(id ORDER BY id) INTO ids FROM filas_nuevas;
+    END IF;
+    IF ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    tipo := CASE WHEN TG_OP = 'INSERT' THEN TG_ARGV[0] ELSE TG_ARGV[1] END;
+    payload := json_build_object('tipo', tipo, 'ids', ids)::text;
+    IF octet_length(payload) > 7900 THEN
+        payload := json_build_object('tipo', tipo, 'ids', NULL)::text;
+    END IF;
+    PERFORM pg_notify('archibox_eventos', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level with transition tables: a bulk UPDATE sends one
+-- notification, not one per row
+DROP TRIGGER IF EXISTS libros_notificar_insert ON libros;
+CREATE TRIGGER libros_notificar_insert
+    AFTER INSERT ON libros
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambios_filas('libros_creados', 'libros_modificados');
+
+DROP TRIGGER IF EXISTS libros_notificar_update ON libros;
+CREATE TRIGGER libros_notificar_update
+    AFTER UPDATE ON libros
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambios_filas('libros_creados', 'libros_modificados');
+
+DROP TRIGGER IF EXISTS libros_notificar_delete ON libros;
+CREATE TRIGGER libros_notificar_delete
+    AFTER DELETE ON libros
+    REFERENCING OLD TABLE AS filas_anteriores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambios_filas('libros_creados', 'libros_modificados');
+
+DROP TRIGGER IF EXISTS usuarios_notificar_insert ON usuarios;
+CREATE TRIGGER usuarios_notificar_insert
+    AFTER INSERT ON usuarios
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambios_filas('usuarios', 'usuarios');
+
+DROP TRIGGER IF EXISTS usuarios_notificar_update ON usuarios;
+CREATE TRIGGER usuarios_notificar_update
+    AFTER UPDATE ON usuarios
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambios_filas('usuarios', 'usuarios');
+
+DROP TRIGGER IF EXISTS usuarios_notificar_delete ON usuarios;
+CREATE TRIGGER usuarios_notificar_delete
+    AFTER DELETE ON usuarios
+    REFERENCING OLD TABLE AS filas_anteriores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambios_filas('usuarios', 'usuarios');
+
+-- Categories and book states: the clients reload them whole
+CREATE OR REPLACE FUNCTION catalogo_notificar_cambios()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF current_setting('archibox.eventos_publicados', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify(
+        'archibox_eventos',
+        json_build_object('tipo', 'catalogo', 'tabla', TG_TABLE_NAME)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS categoria_notificar ON categoria;
+CREATE TRIGGER categoria_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON categoria
+    FOR EACH STATEMENT EXECUTE FUNCTION catalogo_notificar_cambios();
+
+DROP TRIGGER IF EXISTS estados_libro_notificar ON estados_libro;
+CREATE TRIGGER estados_libro_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON estados_libro
+    FOR EACH STATEMENT EXECUTE FUNCTION catalogo_notificar_cambios();
@@ -0,0 +1,13 @@
+-- Migration: 009_libros_updated_at_index.sql
+-- Description: Index for incremental sync of libros (desktop local replica)
+-- Date: 2026-10-19
+
+-- ===========================================
+-- INDEXES
+-- ===========================================
+
+-- old_python/db/local_replica.py re-reads only the books whose updated_at
+-- (maintained by update_libros_updated_at) is past its watermark. It used
+-- to follow historial, which the API server does not write to. Without
+-- this index every sync is a sequential scan of libros.
+CREATE INDEX IF NOT EXISTS idx_libros_updated_at ON libros(updated_at);